@@ -1,21 +1,28 @@
 """
 Main API server for the chatbot backend.
 Flask-based REST API for interacting with the RAG chatbot.
+
+Development: python app.py (single process). Production: gunicorn -c
+gunicorn.conf.py wsgi:app, where each worker imports the app built below
+and initializes lazily from the shared index (see sync_worker_state), or
+uvicorn asgi:app to serve the query routes asynchronously.
 """
 
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+import json
 import logging
 import os
+import threading
+import time
 from datetime import datetime
 
 # Setup logging FIRST
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Flask app early
-app = Flask(__name__)
-CORS(app)
+# Routes live on a blueprint so create_app() can build one app per worker process
+api = Blueprint("api", __name__)
 
 # Import settings (lightweight, just loads env vars)
 from src.config.settings import (
@@ -26,14 +33,97 @@ from src.config.settings import (
     TARGET_WEBSITE_URL,
     CRAWL_LIMIT,
     TOP_K_RESULTS,
-    TEMPERATURE
+    TEMPERATURE,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_REQUESTS_PER_SECOND,
+    EMBEDDING_MAX_RETRIES,
+    CHUNK_LEVEL_INDEXING,
+    VECTOR_STORE_BACKEND,
+    INDEX_SNAPSHOT_ENABLED,
+    INDEX_SNAPSHOT_DIR,
+    LEXICAL_INDEX_ENABLED,
+    LEXICAL_INDEX_PATH,
+    HYBRID_RRF_K,
+    INCREMENTAL_INGEST,
+    INGEST_MANIFEST_PATH,
+    STREAMING_INGEST,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_SIMILARITY,
+    QUERY_COALESCING_ENABLED,
+    CIRCUIT_BREAKER_ENABLED,
+    CIRCUIT_FAILURE_RATE,
+    CIRCUIT_MIN_CALLS,
+    CIRCUIT_WINDOW_SECONDS,
+    CIRCUIT_OPEN_SECONDS,
+    HEDGED_REQUESTS_ENABLED,
+    HEDGE_QUANTILE,
+    HEDGE_MIN_DELAY_SECONDS,
+    SESSION_MAX_TURNS,
+    SESSION_IDLE_TTL_SECONDS,
+    SESSION_MAX_SESSIONS,
+    SESSION_STORE_PATH,
+    SESSION_READ_THROUGH,
+    SHARED_STATE_DIR,
+    INGEST_QUEUE_SIZE,
+    SCRAPE_MAX_WORKERS,
+    SCRAPE_PER_HOST_LIMIT,
+    SCRAPE_DEADLINE_SECONDS,
+    FIRECRAWL_BASE_URL,
+    OFFLINE_MODE,
+    OFFLINE_FIXTURES_PATH,
+    OFFLINE_FIRECRAWL_PORT,
+    OFFLINE_SCRAPE_LATENCY_SECONDS,
+    OFFLINE_EMBED_LATENCY_SECONDS,
+    OFFLINE_VECTOR_LATENCY_SECONDS,
+    OFFLINE_LLM_FIRST_TOKEN_SECONDS,
+    OFFLINE_LLM_TOKEN_SECONDS,
+    SERVER_TIMING_ENABLED,
+    METRICS_ENABLED
 )
 
-# Global state
+from src.modules import clients, metrics
+metrics.set_enabled(METRICS_ENABLED)
+
+# Global state (per worker process)
 chatbot = None
 embedder = None
 vector_store = None
 initialization_complete = False
+_loaded_generation = 0
+_warm_start_attempted = False
+_init_lock = threading.Lock()
+
+from src.modules.ingest_job import IngestJobManager
+ingest_jobs = IngestJobManager()
+
+_offline = None
+
+
+def offline_services():
+    """Fake Gemini/Pinecone/Firecrawl services, or None unless OFFLINE_MODE is on."""
+    global _offline
+    if not OFFLINE_MODE:
+        return None
+    if _offline is None:
+        from src.modules.offline import OfflineServices
+        _offline = OfflineServices(
+            EMBEDDING_DIMENSION,
+            fixtures_path=OFFLINE_FIXTURES_PATH,
+            firecrawl_port=OFFLINE_FIRECRAWL_PORT,
+            scrape_latency=OFFLINE_SCRAPE_LATENCY_SECONDS,
+            vector_latency=OFFLINE_VECTOR_LATENCY_SECONDS,
+            embed_latency=OFFLINE_EMBED_LATENCY_SECONDS,
+            first_token_latency=OFFLINE_LLM_FIRST_TOKEN_SECONDS,
+            token_latency=OFFLINE_LLM_TOKEN_SECONDS
+        )
+        logger.info("Offline mode: using fake Gemini, Pinecone and Firecrawl services")
+    return _offline
 
 
 def initialize_backend():
@@ -45,28 +135,86 @@ def initialize_backend():
         
         # Import heavy modules only when needed
         from src.modules.gemini_embedder import GeminiEmbedder
-        from src.modules.pinecone_store import PineconeVectorStore
-        from src.modules.rag_pipeline import create_rag_chatbot
+        from src.modules.embedding_cache import EmbeddingCache
+        from src.modules.rag_pipeline import create_rag_chatbot, create_vector_store
         
-        # Step 1: Initialize embedder
-        embedder = GeminiEmbedder(GOOGLE_API_KEY)
-        logger.info("✓ Gemini embedder initialized")
+        offline = offline_services()
+        genai_client = offline.genai_client if offline else None
         
-        # Step 2: Initialize Pinecone vector store
-        vector_store = PineconeVectorStore(
-            api_key=PINECONE_API_KEY,
-            index_name=PINECONE_INDEX_NAME
+        # Step 1: Initialize embedder (with persistent embedding cache)
+        embedder = GeminiEmbedder(
+            GOOGLE_API_KEY,
+            max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+            requests_per_second=EMBEDDING_REQUESTS_PER_SECOND,
+            max_retries=EMBEDDING_MAX_RETRIES,
+            client=genai_client,
+            upstream=upstream("embed")
         )
-        logger.info("✓ Pinecone vector store initialized")
+        if EMBEDDING_CACHE_ENABLED:
+            # Fingerprinted on the model the embedder actually calls
+            embedder.cache = EmbeddingCache(
+                EMBEDDING_CACHE_PATH,
+                model=embedder.model,
+                dimension=EMBEDDING_DIMENSION,
+                max_entries=EMBEDDING_CACHE_MAX_ENTRIES
+            )
+        logger.info("✓ Gemini embedder initialized")
         
-        # Step 3: Create RAG chatbot
+        # Step 2: Initialize vector store (Pinecone, or in-process from the latest snapshot)
+        vector_store = None
+        if VECTOR_STORE_BACKEND == "local" and INDEX_SNAPSHOT_ENABLED:
+            from src.modules.index_snapshot import load_latest_snapshot
+            vector_store = load_latest_snapshot(
+                INDEX_SNAPSHOT_DIR,
+                expected_dimension=EMBEDDING_DIMENSION
+            )
+        if vector_store is None:
+            vector_store = create_vector_store(
+                VECTOR_STORE_BACKEND,
+                pinecone_api_key=PINECONE_API_KEY,
+                pinecone_index_name=PINECONE_INDEX_NAME,
+                pinecone_index=offline.pinecone_index if offline else None,
+                upstream=upstream("vector_query")
+            )
+        logger.info(f"✓ Vector store initialized ({VECTOR_STORE_BACKEND})")
+        
+        # Ingests update the BM25 index through the store wrapper
+        lexical_index = load_lexical_index(vector_store)
+        vector_store = with_lexical_index(vector_store, lexical_index)
+        refresh_index_size()
+        
+        # Step 3: Create RAG chatbot (with response cache for repeated questions)
+        response_cache = None
+        if RESPONSE_CACHE_ENABLED:
+            from src.modules.response_cache import ResponseCache
+            response_cache = ResponseCache(
+                max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+                similarity_threshold=RESPONSE_CACHE_SIMILARITY
+            )
+        from src.modules.session_store import SessionStore
+        session_store = SessionStore(
+            max_turns=SESSION_MAX_TURNS,
+            idle_ttl_seconds=SESSION_IDLE_TTL_SECONDS,
+            max_sessions=SESSION_MAX_SESSIONS,
+            path=SESSION_STORE_PATH or None,
+            read_through=SESSION_READ_THROUGH
+        )
         chatbot = create_rag_chatbot(
             google_api_key=GOOGLE_API_KEY,
             pinecone_api_key=PINECONE_API_KEY,
             pinecone_index_name=PINECONE_INDEX_NAME,
             embedder_instance=embedder,
             top_k=TOP_K_RESULTS,
-            temperature=TEMPERATURE
+            temperature=TEMPERATURE,
+            vector_store=vector_store,
+            response_cache=response_cache,
+            session_store=session_store,
+            client=genai_client,
+            coalesce=QUERY_COALESCING_ENABLED,
+            lexical_index=lexical_index,
+            rrf_k=HYBRID_RRF_K,
+            generate_upstream=upstream("generate")
         )
         logger.info("✓ RAG chatbot initialized")
         
@@ -80,131 +228,626 @@ def initialize_backend():
         return False
 
 
-@app.before_request
+# Upstream name -> resilience.Upstream (circuit breaker and hedging state)
+upstreams = {}
+
+
+def upstream(name: str):
+    """Circuit breaker and hedging guard for an upstream, shared by everything that calls it."""
+    if name not in upstreams:
+        from src.modules.resilience import CircuitBreaker, Upstream
+        breaker = None
+        if CIRCUIT_BREAKER_ENABLED:
+            breaker = CircuitBreaker(
+                name,
+                failure_rate=CIRCUIT_FAILURE_RATE,
+                min_calls=CIRCUIT_MIN_CALLS,
+                window_seconds=CIRCUIT_WINDOW_SECONDS,
+                open_seconds=CIRCUIT_OPEN_SECONDS
+            )
+        upstreams[name] = Upstream(
+            name,
+            breaker=breaker,
+            hedge=HEDGED_REQUESTS_ENABLED,
+            hedge_quantile=HEDGE_QUANTILE,
+            hedge_min_delay=HEDGE_MIN_DELAY_SECONDS
+        )
+    return upstreams[name]
+
+
+def load_lexical_index(store=None):
+    """
+    BM25 index saved by the last ingest.
+    
+    The index is only fed by upserts, so when its file is missing (hybrid
+    retrieval just enabled, or the file was lost) an existing index would
+    never be searched lexically for pages that no longer change. It is then
+    rebuilt from the vector store's metadata when the store can list it
+    (local backend), and otherwise the ingest manifest is invalidated so the
+    next ingest upserts, and thereby indexes, every page again.
+    
+    Args:
+        store: Vector store the BM25 index belongs to
+    
+    Returns:
+        Optional[LexicalIndex]: None when hybrid retrieval is disabled
+    """
+    if not LEXICAL_INDEX_ENABLED:
+        return None
+    from src.modules.lexical_index import LexicalIndex
+    lexical_index = LexicalIndex.load(LEXICAL_INDEX_PATH)
+    if lexical_index is not None:
+        return lexical_index
+    
+    lexical_index = LexicalIndex()
+    metadata_items = getattr(store, "metadata_items", None)
+    if metadata_items is not None:
+        lexical_index.add_many((vector_id, metadata or {}) for vector_id, metadata in metadata_items())
+        if len(lexical_index):
+            logger.info(f"✓ Lexical index rebuilt from the vector store ({len(lexical_index)} documents)")
+            try:
+                lexical_index.save(LEXICAL_INDEX_PATH)
+            except Exception as e:
+                logger.warning(f"Unable to write lexical index: {e}")
+    elif CHUNK_LEVEL_INDEXING:
+        from src.modules.ingestion import IngestManifest
+        manifest = IngestManifest(INGEST_MANIFEST_PATH)
+        if len(manifest):
+            logger.warning("No lexical index for the existing vectors; the next ingest re-embeds every page")
+            manifest.invalidate()
+            manifest.save()
+    return lexical_index
+
+
+def with_lexical_index(store, lexical_index):
+    """Wrap a vector store so upserts and deletions also update the BM25 index."""
+    if lexical_index is None:
+        return store
+    from src.modules.lexical_index import LexicalIndexedStore
+    if isinstance(store, LexicalIndexedStore):
+        store = store.store
+    return LexicalIndexedStore(store, lexical_index)
+
+
+def warm_start() -> bool:
+    """
+    Initialize from the latest on-disk index snapshot, if there is one.
+    
+    Returns:
+        bool: True if the backend is ready to serve queries without /api/initialize
+    """
+    if VECTOR_STORE_BACKEND != "local" or not INDEX_SNAPSHOT_ENABLED:
+        return False
+    
+    from src.modules.index_snapshot import latest_snapshot_path
+    if not latest_snapshot_path(INDEX_SNAPSHOT_DIR):
+        return False
+    
+    start = time.perf_counter()
+    if not initialize_backend():
+        return False
+    logger.info(f"✓ Warm start from index snapshot in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return True
+
+
+_shared_state = None
+
+
+def shared_state():
+    """Initialization state and ingest lock shared with the other worker processes."""
+    global _shared_state
+    if _shared_state is None:
+        from src.modules.shared_state import SharedState
+        _shared_state = SharedState(SHARED_STATE_DIR)
+    return _shared_state
+
+
+def reload_index() -> bool:
+    """
+    Pick up an index that another worker changed: reload the latest snapshot
+    (local backend) and BM25 index, and drop cached answers.
+    
+    Returns:
+        bool: True if this worker now serves the new index
+    """
+    global vector_store
+    store = vector_store
+    if VECTOR_STORE_BACKEND == "local":
+        if not INDEX_SNAPSHOT_ENABLED:
+            return False
+        from src.modules.index_snapshot import load_latest_snapshot
+        store = load_latest_snapshot(INDEX_SNAPSHOT_DIR, expected_dimension=EMBEDDING_DIMENSION)
+        if store is None:
+            return False
+    
+    lexical_index = load_lexical_index(store)
+    vector_store = with_lexical_index(store, lexical_index)
+    chatbot.vector_store = vector_store
+    chatbot.lexical_index = lexical_index
+    
+    if chatbot.response_cache is not None:
+        chatbot.response_cache.invalidate()
+    refresh_index_size()
+    logger.info("✓ Reloaded index updated by another worker")
+    return True
+
+
+def sync_worker_state():
+    """
+    Bring this worker in line with the shared state.
+    
+    On its first request a worker warm-starts from the latest snapshot; once
+    any worker has initialized the backend, the others initialize lazily
+    (without re-scraping), and after an ingest they reload the index. Costs a
+    stat() per request when nothing changed.
+    """
+    global _loaded_generation, _warm_start_attempted
+    state = shared_state().read()
+    generation = state.get("generation", 0)
+    if _warm_start_attempted and (not state.get("initialized") or generation == _loaded_generation):
+        return
+    
+    with _init_lock:
+        if not _warm_start_attempted:
+            _warm_start_attempted = True
+            if not initialization_complete and warm_start():
+                _loaded_generation = generation
+        if not state.get("initialized") or generation == _loaded_generation:
+            return
+        
+        if not initialization_complete:
+            ready = initialize_backend()
+        else:
+            ready = reload_index()
+        if ready:
+            _loaded_generation = generation
+
+
+def index_updated():
+    """Drop cached answers and persist the index after an ingest changed it."""
+    if chatbot is not None and chatbot.response_cache is not None:
+        chatbot.response_cache.invalidate()
+    refresh_index_size()
+    save_snapshot()
+    save_lexical_index()
+
+
+def refresh_index_size():
+    """Update the index size gauge (Pinecone stats are a network call, so not done per scrape)."""
+    if vector_store is None:
+        return
+    try:
+        metrics.INDEX_VECTORS.set(vector_store.get_index_stats().get("total_vector_count", 0))
+    except Exception as e:
+        logger.warning(f"Unable to read index size: {e}")
+
+
+# Computed when /metrics is scraped
+metrics.SESSIONS.set_function(lambda: len(chatbot.sessions) if chatbot is not None else None)
+
+
+def save_snapshot():
+    """Write the local vector index to disk after a successful ingest."""
+    if VECTOR_STORE_BACKEND != "local" or not INDEX_SNAPSHOT_ENABLED or vector_store is None:
+        return
+    try:
+        from src.modules.index_snapshot import write_snapshot
+        write_snapshot(vector_store, INDEX_SNAPSHOT_DIR)
+        logger.info("✓ Index snapshot written")
+    except Exception as e:
+        logger.warning(f"Unable to write index snapshot: {e}")
+
+
+def save_lexical_index():
+    """Write the BM25 index to disk for restarts and the other workers."""
+    if chatbot is None or chatbot.lexical_index is None:
+        return
+    try:
+        chatbot.lexical_index.save(LEXICAL_INDEX_PATH)
+        logger.info(f"✓ Lexical index written ({len(chatbot.lexical_index)} documents)")
+    except Exception as e:
+        logger.warning(f"Unable to write lexical index: {e}")
+
+
+@api.before_app_request
 def log_request():
     """Log incoming requests for debugging."""
     logger.info(f"Incoming request: {request.method} {request.path}")
 
 
-@app.route("/api/health", methods=["GET"])
+@api.before_app_request
+def sync_with_other_workers():
+    """Initialize or reload lazily when another worker built or changed the index."""
+    try:
+        sync_worker_state()
+    except Exception as e:
+        logger.warning(f"Unable to sync with shared backend state: {e}")
+
+
+@api.before_app_request
+def start_stage_timings():
+    """Collect per-stage timings (security, embed, search, ...) for this request."""
+    g.request_start = time.perf_counter()
+    if SERVER_TIMING_ENABLED:
+        from src.modules import timing
+        g.stage_timings, g.stage_timings_token = timing.begin()
+
+
+@api.after_app_request
+def attach_server_timing(response):
+    """Report stage timings in a Server-Timing header and record request metrics."""
+    elapsed = time.perf_counter() - g.request_start
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.HTTP_REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+    metrics.HTTP_SECONDS.labels(endpoint).observe(elapsed)
+    
+    if "stage_timings" in g and g.stage_timings:
+        from src.modules.timing import server_timing_header
+        timings = dict(g.stage_timings)
+        timings["total"] = elapsed * 1000
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+
+@api.teardown_app_request
+def end_stage_timings(exc):
+    """Stop collecting stage timings for the finished request."""
+    if "stage_timings_token" in g:
+        from src.modules import timing
+        try:
+            timing.end(g.pop("stage_timings_token"))
+        except ValueError:
+            # Streamed responses may finish in a different context
+            pass
+
+
+SESSION_HEADER = "X-Session-ID"
+SESSION_COOKIE = "session_id"
+
+
+def current_session_id() -> str:
+    """
+    Session ID of the current request, from the X-Session-ID header or the
+    session_id cookie. A new ID is issued (and set as a cookie) if neither
+    holds a valid one.
+    """
+    from src.modules.session_store import is_valid_session_id, new_session_id
+    
+    if "session_id" not in g:
+        session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+        g.new_session = not is_valid_session_id(session_id)
+        g.session_id = new_session_id() if g.new_session else session_id
+    return g.session_id
+
+
+@api.after_app_request
+def attach_session(response):
+    """Echo the session ID back so clients can keep using it."""
+    if "session_id" in g:
+        response.headers[SESSION_HEADER] = g.session_id
+        if g.get("new_session"):
+            response.set_cookie(
+                SESSION_COOKIE,
+                g.session_id,
+                max_age=int(SESSION_IDLE_TTL_SECONDS),
+                httponly=True,
+                samesite="Lax"
+            )
+    return response
+
+
+@api.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus metrics: stage/HTTP latency histograms, fallback, block and cache counters, gauges."""
+    if not METRICS_ENABLED:
+        return jsonify({"status": "error", "message": "Metrics are disabled"}), 404
+    return Response(metrics.REGISTRY.render(), mimetype=metrics.CONTENT_TYPE)
+
+
+@api.route("/api/health", methods=["GET"])
 def health_check():
     """Health check endpoint."""
     logger.info("Health check requested")
     return jsonify({
         "status": "healthy",
         "chatbot_ready": initialization_complete,
+        "worker_pid": os.getpid(),
+        "index_generation": _loaded_generation,
         "timestamp": datetime.now().isoformat()
     }), 200
 
 
-@app.route("/api/initialize", methods=["POST"])
+# Additional URLs to scrape for comprehensive Nintendo Switch 2 information
+ADDITIONAL_URLS = [
+    # Tech specs and compatibility
+    "https://www.nintendo.com/us/gaming-systems/switch-2/tech-specs/#nintendoswitch2",
+    "https://www.nintendo.com/us/gaming-systems/switch-2/transfer-guide/compatible-games/",
+    
+    # Support documentation
+    "https://en-americas-support.nintendo.com/app/answers/detail/a_id/68426",
+    "https://en-americas-support.nintendo.com/app/answers/detail/a_id/68432",
+    "https://en-americas-support.nintendo.com/app/answers/detail/a_id/68415/p/1095/c/286",
+    "https://en-americas-support.nintendo.com/app/answers/detail/a_id/68459/p/1095/c/947",
+    
+    # Store product pages
+    "https://www.nintendo.com/us/store/products/nintendo-switch-2-system-123669/",
+    "https://www.nintendo.com/us/store/products/nintendo-switch-2-pokemon-legends-z-a-nintendo-switch-2-edition-bundle-122173/",
+    "https://www.nintendo.com/us/store/products/nintendo-switch-2-mario-kart-world-digital-bundle-122179/",
+    "https://www.nintendo.com/us/store/games/#p=1&sort=df&show=0&f=corePlatforms&corePlatforms=Nintendo+Switch+2",
+    
+    # Third-party retailers and reviews
+    "https://www.gamestop.com/consoles-hardware/nintendo-switch/consoles/products/nintendo-switch-2/424543.html",
+    "https://www.gamespot.com/gallery/all-the-nintendo-switch-2-games/2900-6128/#17",
+]
+
+
+def run_ingestion(payload: dict, job) -> dict:
+    """
+    Scrape, embed and store the website content.
+    
+    Runs inline for synchronous /api/initialize calls or on a background
+    thread for async ones; progress and cancellation go through `job`.
+    
+    Args:
+        payload (dict): /api/initialize request body (rebuild/incremental/prune)
+        job (IngestJob): Job used for progress reporting and cancellation
+        
+    Returns:
+        dict: Result body for a successful ingest
+    """
+    from src.modules.ingest_job import IngestError
+    
+    # Import locally to defer heavy imports
+    from src.modules.firecrawl_scraper import iter_nintendo_website, scrape_nintendo_website
+    from src.modules.gemini_embedder import embed_content_for_storage
+    from src.modules.pinecone_store import store_documents_in_pinecone
+    
+    # A full rebuild replaces the existing vectors (queries keep using them until
+    # then); an explicit rebuild always wins over the incremental default
+    rebuild = bool(payload.get("rebuild"))
+    # Incremental mode diffs against the ingest manifest and never clears the index
+    incremental = (
+        not rebuild
+        and bool(payload.get("incremental", INCREMENTAL_INGEST))
+        and CHUNK_LEVEL_INDEXING
+    )
+    
+    # Step 4: Scrape website (+ explicit tech-specs page and other important URLs)
+    logger.info(f"Scraping website: {TARGET_WEBSITE_URL}")
+    job.set_total("scrape", 1 + len(ADDITIONAL_URLS))
+    scrape_options = dict(
+        api_key=FIRECRAWL_API_KEY,
+        target_url=TARGET_WEBSITE_URL,
+        limit=CRAWL_LIMIT,
+        additional_urls=ADDITIONAL_URLS,
+        max_workers=SCRAPE_MAX_WORKERS,
+        per_host_limit=SCRAPE_PER_HOST_LIMIT,
+        deadline=SCRAPE_DEADLINE_SECONDS,
+        on_page=lambda url: job.advance("scrape"),
+        should_stop=lambda: job.cancel_requested,
+        base_url=offline_services().firecrawl_base_url if OFFLINE_MODE else FIRECRAWL_BASE_URL
+    )
+    
+    if CHUNK_LEVEL_INDEXING and (incremental or STREAMING_INGEST):
+        # Steps 5-6: Embed and upsert new/changed chunks, delete vanished ones
+        from src.modules.ingestion import IngestManifest, stream_ingest
+        
+        manifest = IngestManifest(INGEST_MANIFEST_PATH)
+        if not incremental:
+            # Re-embed every page in place; vectors that are not rewritten are
+            # deleted once their replacements are upserted
+            manifest.invalidate()
+        
+        if STREAMING_INGEST:
+            # Pages are embedded and upserted while the rest are still being scraped
+            def pages():
+                yield from iter_nintendo_website(**scrape_options)
+                job.finish_stage("scrape")
+        else:
+            documents = scrape_nintendo_website(**scrape_options)
+            job.finish_stage("scrape")
+            job.check_cancelled()
+            if not documents:
+                raise IngestError("Failed to scrape website")
+            logger.info(f"✓ Scraped {len(documents)} documents")
+            pages = lambda: documents
+        
+        logger.info("Running incremental ingest..." if incremental else "Running streaming ingest...")
+        ingest_stats = stream_ingest(
+            pages(),
+            embedder,
+            vector_store,
+            manifest,
+            prune_missing=rebuild or bool(payload.get("prune", False)),
+            job=job,
+            queue_size=INGEST_QUEUE_SIZE
+        )
+        
+        if not ingest_stats["pages_seen"]:
+            raise IngestError("Failed to scrape website")
+        if ingest_stats["failed_pages"] and not (
+            ingest_stats["pages_changed"] or ingest_stats["pages_unchanged"]
+        ):
+            raise IngestError("Failed to store embeddings in vector store")
+        
+        logger.info("✓ Ingest complete")
+        
+        return {
+            "status": "initialized",
+            "message": "Backend fully initialized and ready",
+            "documents_processed": ingest_stats["pages_seen"],
+            "ingest": ingest_stats,
+            "embedding_cache": embedder.cache_stats(),
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    documents = scrape_nintendo_website(**scrape_options)
+    job.finish_stage("scrape")
+    job.check_cancelled()
+    
+    if not documents:
+        raise IngestError("Failed to scrape website")
+    
+    logger.info(f"✓ Scraped {len(documents)} documents")
+    
+    # Step 5: Embed documents
+    logger.info("Embedding documents...")
+    embedded_docs = embed_content_for_storage(
+        GOOGLE_API_KEY,
+        documents,
+        embedder=embedder,
+        on_progress=lambda n: job.advance("embed", n)
+    )
+    job.finish_stage("embed")
+    job.check_cancelled()
+    
+    if not embedded_docs:
+        raise IngestError("Failed to embed documents")
+    
+    logger.info(f"✓ Embedded {len(embedded_docs)} documents")
+    
+    # Full rebuild: clear only now that the new embeddings are ready
+    if rebuild and vector_store:
+        logger.info("Rebuild requested: clearing Pinecone namespace before upsert...")
+        job.stats["namespace_cleared"] = True
+        try:
+            vector_store.clear_namespace()
+        except Exception as e:
+            logger.warning(f"Unable to clear namespace for rebuild: {e}")
+    
+    # Step 6: Store in Pinecone
+    logger.info("Storing embeddings in Pinecone...")
+    upsert_count = sum(len(d.get("chunks", [])) if CHUNK_LEVEL_INDEXING else 1 for d in embedded_docs)
+    # Recorded up front: a failed store may already have written some batches
+    job.stats["vectors_upserted"] = upsert_count
+    success = store_documents_in_pinecone(
+        api_key=PINECONE_API_KEY,
+        index_name=PINECONE_INDEX_NAME,
+        documents=embedded_docs,
+        chunk_level=CHUNK_LEVEL_INDEXING,
+        vector_store=vector_store
+    )
+    
+    if not success:
+        raise IngestError("Failed to store embeddings in Pinecone")
+    
+    job.advance("upsert", upsert_count)
+    job.finish_stage("upsert")
+    logger.info("✓ Embeddings stored in Pinecone")
+    
+    return {
+        "status": "initialized",
+        "message": "Backend fully initialized and ready",
+        "documents_processed": len(embedded_docs),
+        "embedding_cache": embedder.cache_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def ingest_changed_index(job) -> bool:
+    """True if an ingest run (finished or not) wrote to or deleted from the index."""
+    stats = job.stats
+    return bool(stats.get("vectors_upserted") or stats.get("vectors_deleted") or stats.get("namespace_cleared"))
+
+
+def ingest_and_publish(payload: dict, job) -> dict:
+    """
+    Run an ingest, persist the index and tell the other workers to reload;
+    releases the ingest lock.
+    
+    A run that fails or is cancelled part-way may already have upserted or
+    deleted vectors, so whatever it changed is persisted and published too.
+    """
+    global _loaded_generation
+    succeeded = False
+    try:
+        result = run_ingestion(payload, job)
+        succeeded = True
+        return result
+    finally:
+        try:
+            changed = ingest_changed_index(job)
+            if changed:
+                index_updated()
+            if succeeded or changed:
+                _loaded_generation = shared_state().publish(VECTOR_STORE_BACKEND)
+        finally:
+            shared_state().unlock_ingest()
+
+
+@api.route("/api/initialize", methods=["POST"])
 def initialize_endpoint():
-    """Initialize backend components and scrape website."""
+    """
+    Initialize backend components and scrape website.
+    
+    With {"async": true} the ingest runs as a background job and the response
+    (202) carries a job ID to poll at /api/jobs/<job_id>. Only one ingest runs
+    at a time; /api/query keeps serving the existing index meanwhile.
+    
+    {"rebuild": true} re-embeds every page, even when incremental ingest is
+    the default: chunk-level ingests overwrite the
+    existing vectors in place and then delete the ones that were not
+    rewritten, so queries see old or new content but never an empty index.
+    The document-level path clears the namespace once the new embeddings are
+    ready, leaving a short gap while they are stored.
+    """
     try:
         global chatbot, embedder, vector_store, initialization_complete
         
-        if initialization_complete:
+        payload = request.get_json(silent=True) or {}
+        
+        # A warm-started backend can still be rebuilt explicitly
+        if initialization_complete and not payload.get("rebuild"):
             return jsonify({
                 "status": "already_initialized",
                 "message": "Backend is already initialized"
             }), 200
         
         # Initialize components
-        if not initialize_backend():
+        if not initialization_complete and not initialize_backend():
             return jsonify({
                 "status": "error",
                 "message": "Failed to initialize backend components"
             }), 500
         
-        # Import locally to defer heavy imports
-        from src.modules.firecrawl_scraper import scrape_nintendo_website
-        from src.modules.gemini_embedder import embed_content_for_storage
-        from src.modules.pinecone_store import store_documents_in_pinecone
-        
-        # Optional: clear existing vectors if requested (rebuild)
-        try:
-            payload = request.get_json(silent=True) or {}
-            if payload.get("rebuild") and vector_store:
-                logger.info("Rebuild requested: clearing Pinecone namespace before upsert...")
-                vector_store.clear_namespace()
-        except Exception as e:
-            logger.warning(f"Unable to process rebuild flag: {e}")
-
-        # Step 4: Scrape website (+ explicit tech-specs page and other important URLs)
-        logger.info(f"Scraping website: {TARGET_WEBSITE_URL}")
-        
-        # Additional URLs to scrape for comprehensive Nintendo Switch 2 information
-        additional_urls = [
-            # Tech specs and compatibility
-            "https://www.nintendo.com/us/gaming-systems/switch-2/tech-specs/#nintendoswitch2",
-            "https://www.nintendo.com/us/gaming-systems/switch-2/transfer-guide/compatible-games/",
-            
-            # Support documentation
-            "https://en-americas-support.nintendo.com/app/answers/detail/a_id/68426",
-            "https://en-americas-support.nintendo.com/app/answers/detail/a_id/68432",
-            "https://en-americas-support.nintendo.com/app/answers/detail/a_id/68415/p/1095/c/286",
-            "https://en-americas-support.nintendo.com/app/answers/detail/a_id/68459/p/1095/c/947",
-            
-            # Store product pages
-            "https://www.nintendo.com/us/store/products/nintendo-switch-2-system-123669/",
-            "https://www.nintendo.com/us/store/products/nintendo-switch-2-pokemon-legends-z-a-nintendo-switch-2-edition-bundle-122173/",
-            "https://www.nintendo.com/us/store/products/nintendo-switch-2-mario-kart-world-digital-bundle-122179/",
-            "https://www.nintendo.com/us/store/games/#p=1&sort=df&show=0&f=corePlatforms&corePlatforms=Nintendo+Switch+2",
-            
-            # Third-party retailers and reviews
-            "https://www.gamestop.com/consoles-hardware/nintendo-switch/consoles/products/nintendo-switch-2/424543.html",
-            "https://www.gamespot.com/gallery/all-the-nintendo-switch-2-games/2900-6128/#17",
-        ]
-        
-        documents = scrape_nintendo_website(
-            api_key=FIRECRAWL_API_KEY,
-            target_url=TARGET_WEBSITE_URL,
-            limit=CRAWL_LIMIT,
-            additional_urls=additional_urls
-        )
-        
-        if not documents:
+        # Only one ingest at a time across all worker processes
+        if not shared_state().try_lock_ingest():
+            current = ingest_jobs.current()
             return jsonify({
-                "status": "error",
-                "message": "Failed to scrape website"
-            }), 500
-        
-        logger.info(f"✓ Scraped {len(documents)} documents")
+                "status": "busy",
+                "message": "An ingest is already running",
+                "job_id": current.id if current else None
+            }), 409
         
-        # Step 5: Embed documents
-        logger.info("Embedding documents...")
-        embedded_docs = embed_content_for_storage(GOOGLE_API_KEY, documents)
+        background = bool(payload.get("async", False))
+        job, started = ingest_jobs.start(
+            lambda job: ingest_and_publish(payload, job),
+            background=background
+        )
         
-        if not embedded_docs:
+        if not started:
+            shared_state().unlock_ingest()
             return jsonify({
-                "status": "error",
-                "message": "Failed to embed documents"
-            }), 500
-        
-        logger.info(f"✓ Embedded {len(embedded_docs)} documents")
+                "status": "busy",
+                "message": "An ingest is already running",
+                "job_id": job.id
+            }), 409
         
-        # Step 6: Store in Pinecone
-        logger.info("Storing embeddings in Pinecone...")
-        success = store_documents_in_pinecone(
-            api_key=PINECONE_API_KEY,
-            index_name=PINECONE_INDEX_NAME,
-            documents=embedded_docs
-        )
-        
-        if not success:
+        if background:
             return jsonify({
-                "status": "error",
-                "message": "Failed to store embeddings in Pinecone"
-            }), 500
+                "status": "accepted",
+                "message": "Ingest started in the background",
+                "job_id": job.id,
+                "progress_url": f"/api/jobs/{job.id}"
+            }), 202
         
-        logger.info("✓ Embeddings stored in Pinecone")
+        if job.status == "succeeded":
+            return jsonify(job.result), 200
         
         return jsonify({
-            "status": "initialized",
-            "message": "Backend fully initialized and ready",
-            "documents_processed": len(embedded_docs),
-            "timestamp": datetime.now().isoformat()
-        }), 200
+            "status": "error",
+            "message": job.error or f"Ingest {job.status}"
+        }), 500
         
     except Exception as e:
         logger.error(f"Error during initialization: {e}")
@@ -214,7 +857,90 @@ def initialize_endpoint():
         }), 500
 
 
-@app.route("/api/query", methods=["POST"])
+@api.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status_endpoint(job_id):
+    """Get progress of an ingest job (pages fetched, chunks embedded, vectors upserted)."""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": "Job not found"
+        }), 404
+    
+    return jsonify({
+        "status": "success",
+        "job": job.to_dict()
+    }), 200
+
+
+@api.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel_endpoint(job_id):
+    """Request cancellation of a running ingest job."""
+    if not ingest_jobs.cancel(job_id):
+        return jsonify({
+            "status": "error",
+            "message": "Job not found or already finished"
+        }), 404
+    
+    return jsonify({
+        "status": "success",
+        "message": "Cancellation requested",
+        "job_id": job_id
+    }), 200
+
+
+def security_response_body(query: str, safety_response: str, session_id: str, turn: int) -> dict:
+    """
+    /api/query body for a query rejected by security validation.
+    
+    Args:
+        query (str): Query as received
+        safety_response (str): Reply shown instead of an answer
+        session_id (str): Conversation the query was sent in
+        turn (int): Answered turns in that conversation (a rejected query
+            is not added to it)
+    """
+    return {
+        "status": "success",
+        "query": query,
+        "response": safety_response,
+        "context_documents_count": 0,
+        "context_length": 0,
+        "is_security_response": True,
+        "turn": turn,
+        "session_id": session_id,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def query_response_body(query: str, result: dict, session_id: str) -> dict:
+    """/api/query body for an answered query (post-processes the response)."""
+    from src.modules.response_processor import enhance_response
+    from src.modules.timing import stage
+    
+    with stage("postprocess"):
+        enhanced_response = enhance_response(
+            response=result["response"],
+            query=query,
+            context_docs=len(result["context_documents"]),
+            turn=result.get("conversation_turn", 1)
+        )
+    
+    return {
+        "status": "success",
+        "query": result.get("query", query),
+        "response": enhanced_response,
+        "context_documents_count": len(result.get("context_documents", [])),
+        "context_length": result.get("context_length", 0),
+        "is_security_response": False,
+        "cached": result.get("cache"),
+        "turn": result.get("conversation_turn", 1),
+        "session_id": session_id,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@api.route("/api/query", methods=["POST"])
 def query_endpoint():
     """Query the chatbot with security validation and response enhancement."""
     if not initialization_complete or not chatbot:
@@ -224,9 +950,9 @@ def query_endpoint():
         }), 400
     
     try:
-        # Import security and response processing modules
+        # Import security module
         from src.modules.security import validate_and_sanitize
-        from src.modules.response_processor import enhance_response
+        from src.modules.timing import stage
         
         data = request.get_json()
         query = data.get("query", "").strip()
@@ -239,44 +965,22 @@ def query_endpoint():
         
         # Step 1: Security validation
         logger.info(f"Validating query: {query[:60]}...")
-        is_valid, processed_query = validate_and_sanitize(query)
+        with stage("security"):
+            is_valid, processed_query = validate_and_sanitize(query)
         
+        session_id = current_session_id()
         if not is_valid:
             # Query failed security check - processed_query contains safety response
-            return jsonify({
-                "status": "success",
-                "query": query,
-                "response": processed_query,
-                "context_documents_count": 0,
-                "context_length": 0,
-                "is_security_response": True,
-                "turn": 1,
-                "timestamp": datetime.now().isoformat()
-            }), 200
+            turn = chatbot.sessions.turn_count(session_id)
+            return jsonify(security_response_body(query, processed_query, session_id, turn)), 200
         
         # Step 2: Get RAG response
         logger.info(f"Getting RAG response for validated query...")
-        result = chatbot.answer_query(processed_query)
+        result = chatbot.answer_query(processed_query, session_id=session_id)
         
         # Step 3: Enhance response quality
         logger.info(f"Enhancing response quality...")
-        enhanced_response = enhance_response(
-            response=result["response"],
-            query=query,
-            context_docs=len(result["context_documents"]),
-            turn=result.get("conversation_turn", 1)
-        )
-        
-        return jsonify({
-            "status": "success",
-            "query": result.get("query", query),
-            "response": enhanced_response,
-            "context_documents_count": len(result.get("context_documents", [])),
-            "context_length": result.get("context_length", 0),
-            "is_security_response": False,
-            "turn": result.get("conversation_turn", 1),
-            "timestamp": datetime.now().isoformat()
-        }), 200
+        return jsonify(query_response_body(query, result, session_id)), 200
         
     except Exception as e:
         logger.error(f"Error processing query: {e}")
@@ -286,9 +990,9 @@ def query_endpoint():
         }), 500
 
 
-@app.route("/api/history", methods=["GET"])
+@api.route("/api/history", methods=["GET"])
 def history_endpoint():
-    """Get conversation history."""
+    """Get the conversation history of the caller's session."""
     if not chatbot:
         return jsonify({
             "status": "error",
@@ -296,11 +1000,13 @@ def history_endpoint():
         }), 400
     
     try:
-        history = chatbot.get_conversation_history()
+        session_id = current_session_id()
+        history = chatbot.get_conversation_history(session_id)
         return jsonify({
             "status": "success",
+            "session_id": session_id,
             "history": history,
-            "turns": len(history) // 2
+            "turns": chatbot.sessions.turn_count(session_id)
         }), 200
         
     except Exception as e:
@@ -311,9 +1017,163 @@ def history_endpoint():
         }), 500
 
 
-@app.route("/api/reset", methods=["POST"])
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class AnswerStream:
+    """
+    Turns ChatbotRAG.stream_answer events into server-sent events, cleaning
+    the text up as it arrives. Shared by the WSGI and ASGI streaming routes.
+    """
+    
+    def __init__(self, query: str, session_id: str, start: float):
+        from src.modules.response_processor import StreamingResponseProcessor
+        
+        self.query = query
+        self.session_id = session_id
+        self.start = start
+        self.first_token_at = None
+        self.processor = StreamingResponseProcessor()
+    
+    def _elapsed_ms(self, since: float = None) -> float:
+        return round(((since or time.perf_counter()) - self.start) * 1000, 1)
+    
+    def security_response(self, safety_response: str, turn: int) -> list:
+        """Events for a query rejected by security validation (turn as in security_response_body)."""
+        return [
+            sse_event("token", {"text": safety_response}),
+            sse_event("done", {
+                "status": "success",
+                "query": self.query,
+                "response": safety_response,
+                "context_documents_count": 0,
+                "context_length": 0,
+                "is_security_response": True,
+                "replace": False,
+                "ttft_ms": self._elapsed_ms(),
+                "turn": turn,
+                "session_id": self.session_id,
+                "timestamp": datetime.now().isoformat()
+            })
+        ]
+    
+    def events(self, event: dict) -> list:
+        """Events to send for one stream_answer event (possibly none)."""
+        if event["type"] == "context":
+            return [sse_event("meta", {
+                "context_documents_count": len(event["context_documents"]),
+                "cached": event["cache"]
+            })]
+        
+        if event["type"] == "token":
+            text = self.processor.feed(event["text"])
+            if not text:
+                return []
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            return [sse_event("token", {"text": text})]
+        
+        if event["type"] == "done":
+            frames = []
+            rest, final, replace = self.processor.finish(
+                query=self.query,
+                context_docs=len(event["context_documents"]),
+                conversation_turn=event.get("conversation_turn", 1)
+            )
+            if rest:
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                frames.append(sse_event("token", {"text": rest}))
+            
+            ttft_ms = self._elapsed_ms(self.first_token_at)
+            total_ms = self._elapsed_ms()
+            logger.info(f"Streamed response: ttft {ttft_ms} ms, total {total_ms} ms")
+            frames.append(sse_event("done", {
+                "status": "success",
+                "query": event.get("query", self.query),
+                "response": final,
+                "context_documents_count": len(event["context_documents"]),
+                "context_length": event.get("context_length", 0),
+                "is_security_response": False,
+                "cached": event.get("cache"),
+                "replace": replace,
+                "ttft_ms": ttft_ms,
+                "total_ms": total_ms,
+                "turn": event.get("conversation_turn", 1),
+                "session_id": self.session_id,
+                "timestamp": datetime.now().isoformat()
+            }))
+            return frames
+        
+        return []
+    
+    @staticmethod
+    def error() -> str:
+        return sse_event("error", {
+            "status": "error",
+            "message": "Sorry, I encountered an error. Please try again! 🎮"
+        })
+
+
+@api.route("/api/query/stream", methods=["POST"])
+def query_stream_endpoint():
+    """
+    Query the chatbot and stream the answer as server-sent events.
+    
+    Events: 'meta' (retrieval done), 'token' ({"text": ...} cleaned text as it
+    is generated), 'done' (same fields as /api/query plus ttft_ms; 'replace'
+    is true when the final response differs from the streamed text) and
+    'error'.
+    """
+    if not initialization_complete or not chatbot:
+        return jsonify({
+            "status": "error",
+            "message": "Chatbot not initialized. Please call /api/initialize first."
+        }), 400
+    
+    from src.modules.security import validate_and_sanitize
+    
+    data = request.get_json(silent=True) or {}
+    query = (data.get("query") or "").strip()
+    
+    if not query:
+        return jsonify({
+            "status": "error",
+            "message": "Query cannot be empty"
+        }), 400
+    
+    start = time.perf_counter()
+    session_id = current_session_id()
+    
+    def generate():
+        stream = AnswerStream(query, session_id, start)
+        try:
+            # Step 1: Security validation
+            is_valid, processed_query = validate_and_sanitize(query)
+            
+            if not is_valid:
+                yield from stream.security_response(processed_query, chatbot.sessions.turn_count(session_id))
+                return
+            
+            # Step 2: Stream RAG response, cleaning it up as it arrives
+            for event in chatbot.stream_answer(processed_query, session_id=session_id):
+                yield from stream.events(event)
+        except Exception as e:
+            logger.error(f"Error streaming query: {e}")
+            yield stream.error()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@api.route("/api/reset", methods=["POST"])
 def reset_endpoint():
-    """Reset conversation."""
+    """Reset the caller's conversation."""
     if not chatbot:
         return jsonify({
             "status": "error",
@@ -321,10 +1181,12 @@ def reset_endpoint():
         }), 400
     
     try:
-        chatbot.reset_conversation()
+        session_id = current_session_id()
+        chatbot.reset_conversation(session_id)
         return jsonify({
             "status": "success",
-            "message": "Conversation reset"
+            "message": "Conversation reset",
+            "session_id": session_id
         }), 200
         
     except Exception as e:
@@ -335,7 +1197,15 @@ def reset_endpoint():
         }), 500
 
 
-@app.route("/api/stats", methods=["GET"])
+def genai_stats() -> dict:
+    """google-genai request form and response layouts detected in this process."""
+    if chatbot is None:
+        return {}
+    from src.modules import genai_compat
+    return dict(chatbot.compat.stats(), response_layouts=genai_compat.layouts())
+
+
+@api.route("/api/stats", methods=["GET"])
 def stats_endpoint():
     """Get vector store statistics."""
     if not vector_store:
@@ -348,7 +1218,20 @@ def stats_endpoint():
         stats = vector_store.get_index_stats()
         return jsonify({
             "status": "success",
-            "stats": stats
+            "stats": stats,
+            "embedding_cache": embedder.cache_stats() if embedder else {},
+            "response_cache": (
+                chatbot.response_cache.stats()
+                if chatbot and chatbot.response_cache is not None else {}
+            ),
+            "sessions": chatbot.sessions.stats() if chatbot else {},
+            "coalescing": (
+                chatbot.inflight.stats()
+                if chatbot and chatbot.inflight is not None else {}
+            ),
+            "upstreams": {name: guard.stats() for name, guard in upstreams.items()},
+            "genai": genai_stats(),
+            "clients": clients.stats()
         }), 200
         
     except Exception as e:
@@ -359,7 +1242,7 @@ def stats_endpoint():
         }), 500
 
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
     return jsonify({
@@ -368,7 +1251,7 @@ def not_found(error):
     }), 404
 
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     """Handle 500 errors."""
     logger.error(f"Internal server error: {error}")
@@ -378,14 +1261,46 @@ def internal_error(error):
     }), 500
 
 
+def create_app() -> Flask:
+    """
+    Build the Flask application.
+    
+    Backend components are not created here: each worker process initializes
+    on its first request (see sync_worker_state), so the app can be created
+    in a pre-fork master without sharing clients or sockets across forks.
+    
+    Returns:
+        Flask: Application with the API blueprint registered
+    """
+    flask_app = Flask(__name__)
+    CORS(flask_app)
+    flask_app.register_blueprint(api)
+    return flask_app
+
+
+def check_environment() -> bool:
+    """Check that the API keys needed outside offline mode are set."""
+    if not OFFLINE_MODE and (not GOOGLE_API_KEY or (VECTOR_STORE_BACKEND == "pinecone" and not PINECONE_API_KEY)):
+        logger.error("Missing required environment variables. Please set GOOGLE_API_KEY and PINECONE_API_KEY.")
+        return False
+    return True
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
     logger.info("Starting Nintendo Chatbot Backend API...")
     
-    # Check for required environment variables
-    if not GOOGLE_API_KEY or not PINECONE_API_KEY:
-        logger.error("Missing required environment variables. Please set GOOGLE_API_KEY and PINECONE_API_KEY.")
+    # Check for required environment variables (offline mode needs none)
+    if not check_environment():
         exit(1)
     
+    # Serve immediately from the last index snapshot when available
+    with _init_lock:
+        _warm_start_attempted = True
+        warm_start()
+    
     # Run Flask app
     app.run(
         host="0.0.0.0",
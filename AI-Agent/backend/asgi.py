@@ -0,0 +1,253 @@
+"""
+ASGI entry point with the async query path.
+
+    WEB_CONCURRENCY=4 uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+uvicorn starts WEB_CONCURRENCY worker processes, and with more than one this
+module shares conversations between them through SESSION_STORE_PATH (the
+same defaults as gunicorn.conf.py). Passing --workers instead leaves sessions
+per process unless SESSION_STORE_PATH and SESSION_READ_THROUGH are set.
+
+POST /api/query and /api/query/stream are served on the event loop by
+AsyncChatbotRAG: a query is validated first and embedded only after an exact
+response cache miss (blocked queries never reach Gemini), Gemini calls are
+awaited instead of holding a thread, and blocking SQLite and vector search
+work runs in worker threads, so one process keeps hundreds of queries in
+flight. Every other route
+(initialize, jobs, history, stats, metrics, ...) is the Flask app, run in a
+thread pool, sharing the same per-worker backend.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookies import SimpleCookie
+import asyncio
+import json
+import logging
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+
+# With several workers, conversations must live in a file every worker reads
+# (set before the settings are imported)
+if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+    os.environ.setdefault("SESSION_STORE_PATH", ".cache/sessions.sqlite3")
+    os.environ.setdefault("SESSION_READ_THROUGH", "true")
+
+import app as backend  # noqa: E402
+from src.config.settings import ASYNC_MAX_THREADS, SERVER_TIMING_ENABLED, SESSION_IDLE_TTL_SECONDS  # noqa: E402
+from src.modules import metrics, timing  # noqa: E402
+from src.modules.async_rag import AsyncChatbotRAG  # noqa: E402
+from src.modules.security import validate_and_sanitize  # noqa: E402
+from src.modules.session_store import is_valid_session_id, new_session_id  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+ERROR_MESSAGE = "Sorry, I encountered an error. Please try again! 🎮"
+
+
+class _Request:
+    """The parts of an ASGI HTTP request the query routes need."""
+
+    def __init__(self, scope, body: bytes):
+        self.path = scope["path"]
+        self.method = scope["method"]
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        self.body = body
+        self.start = time.perf_counter()
+
+        cookies = SimpleCookie(self.headers.get("cookie", ""))
+        session_id = self.headers.get(backend.SESSION_HEADER.lower())
+        if not session_id and backend.SESSION_COOKIE in cookies:
+            session_id = cookies[backend.SESSION_COOKIE].value
+        self.new_session = not is_valid_session_id(session_id)
+        self.session_id = new_session_id() if self.new_session else session_id
+
+    def json(self) -> dict:
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def response_headers(self, content_type: str, timings=None):
+        headers = [
+            (b"content-type", content_type.encode()),
+            (b"access-control-allow-origin", b"*"),
+            (backend.SESSION_HEADER.lower().encode(), self.session_id.encode())
+        ]
+        if self.new_session:
+            cookie = (
+                f"{backend.SESSION_COOKIE}={self.session_id}; Max-Age={int(SESSION_IDLE_TTL_SECONDS)}; "
+                "HttpOnly; Path=/; SameSite=Lax"
+            )
+            headers.append((b"set-cookie", cookie.encode()))
+        if timings:
+            timings = dict(timings, total=(time.perf_counter() - self.start) * 1000)
+            headers.append((b"server-timing", timing.server_timing_header(timings).encode()))
+        return headers
+
+    def record(self, status: int):
+        metrics.HTTP_REQUESTS.labels(self.path, self.method, status).inc()
+        metrics.HTTP_SECONDS.labels(self.path).observe(time.perf_counter() - self.start)
+
+
+_async_rag = None
+
+
+def async_chatbot():
+    """AsyncChatbotRAG over this worker's chatbot (rebuilt if the chatbot was replaced)."""
+    global _async_rag
+    if backend.chatbot is None:
+        return None
+    if _async_rag is None or _async_rag.chatbot is not backend.chatbot:
+        _async_rag = AsyncChatbotRAG(backend.chatbot)
+    return _async_rag
+
+
+async def _send_json(send, request: _Request, status: int, body: dict, timings=None):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": request.response_headers("application/json", timings)
+    })
+    await send({"type": "http.response.body", "body": json.dumps(body).encode("utf-8")})
+    request.record(status)
+
+
+async def _ready(send, request: _Request):
+    """Initialize lazily like the Flask routes; answer 400 if the chatbot is not ready."""
+    # A stat() per request, or a full (blocking) initialization on the first one
+    await asyncio.to_thread(backend.sync_worker_state)
+    rag = async_chatbot()
+    if not backend.initialization_complete or rag is None:
+        await _send_json(send, request, 400, {
+            "status": "error",
+            "message": "Chatbot not initialized. Please call /api/initialize first."
+        })
+        return None
+    return rag
+
+
+async def query_endpoint(send, request: _Request):
+    """Async /api/query; same request and response bodies as the Flask route."""
+    rag = await _ready(send, request)
+    if rag is None:
+        return
+
+    query = (request.json().get("query") or "").strip()
+    if not query:
+        await _send_json(send, request, 400, {"status": "error", "message": "Query cannot be empty"})
+        return
+
+    timings = {}
+    try:
+        with timing.collect() as timings:
+            # Validation is sub-millisecond; blocked queries are never sent upstream
+            with timing.stage("security"):
+                is_valid, processed_query = validate_and_sanitize(query)
+
+            if not is_valid:
+                turn = await asyncio.to_thread(rag.chatbot.sessions.turn_count, request.session_id)
+                body = backend.security_response_body(query, processed_query, request.session_id, turn)
+            else:
+                result = await rag.answer_query(processed_query, session_id=request.session_id)
+                body = backend.query_response_body(query, result, request.session_id)
+    except Exception as e:
+        logger.error(f"Error processing query: {e}")
+        await _send_json(send, request, 500, {"status": "error", "message": ERROR_MESSAGE})
+        return
+
+    await _send_json(send, request, 200, body, timings if SERVER_TIMING_ENABLED else None)
+
+
+async def query_stream_endpoint(send, request: _Request):
+    """Async /api/query/stream; same server-sent events as the Flask route."""
+    rag = await _ready(send, request)
+    if rag is None:
+        return
+
+    query = (request.json().get("query") or "").strip()
+    if not query:
+        await _send_json(send, request, 400, {"status": "error", "message": "Query cannot be empty"})
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": request.response_headers("text/event-stream") + [
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no")
+        ]
+    })
+
+    async def emit(frames):
+        for frame in frames:
+            await send({"type": "http.response.body", "body": frame.encode("utf-8"), "more_body": True})
+
+    stream = backend.AnswerStream(query, request.session_id, request.start)
+    try:
+        is_valid, processed_query = validate_and_sanitize(query)
+
+        if not is_valid:
+            turn = await asyncio.to_thread(rag.chatbot.sessions.turn_count, request.session_id)
+            await emit(stream.security_response(processed_query, turn))
+        else:
+            async for event in rag.stream_answer(processed_query, session_id=request.session_id):
+                await emit(stream.events(event))
+    except Exception as e:
+        logger.error(f"Error streaming query: {e}")
+        await emit([stream.error()])
+
+    await send({"type": "http.response.body", "body": b""})
+    request.record(200)
+
+
+ASYNC_ROUTES = {
+    ("POST", "/api/query"): query_endpoint,
+    ("POST", "/api/query/stream"): query_stream_endpoint
+}
+
+
+class AsyncQueryApp:
+    """ASGI app: async query routes, everything else delegated to the Flask app."""
+
+    def __init__(self, flask_app, max_threads: int = ASYNC_MAX_THREADS):
+        self.max_threads = max_threads
+        self.wsgi = WSGIMiddleware(flask_app, workers=max_threads)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Vector search and blocking SDK calls use the default executor
+                asyncio.get_running_loop().set_default_executor(
+                    ThreadPoolExecutor(self.max_threads, thread_name_prefix="async-query")
+                )
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+
+        handler = ASYNC_ROUTES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if handler is None:
+            await self.wsgi(scope, receive, send)
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        logger.info(f"Incoming request: {scope['method']} {scope['path']}")
+        await handler(send, _Request(scope, body))
+
+
+app = AsyncQueryApp(backend.app)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for the chatbot API.
+
+Starts the Flask app in offline mode (fake Gemini, Pinecone and Firecrawl,
+see src/modules/offline.py), runs /api/initialize, then drives /api/query at
+a fixed concurrency. Reports p50/p95/p99 latency and throughput overall and
+per pipeline stage (read from the Server-Timing header), writes the results
+as JSON, and optionally fails when they regress against a baseline file.
+
+Usage (from the backend directory):
+  python benchmarks/bench_e2e.py
+  python benchmarks/bench_e2e.py --concurrency 16 --requests 2000 --zero-latency
+  python benchmarks/bench_e2e.py --baseline benchmarks/results/baseline.json
+  python benchmarks/bench_e2e.py --url http://127.0.0.1:5000   # already running server
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "bench_e2e.json"
+
+# Server-side stages in pipeline order; "total" is the whole request handler
+STAGES = ["security", "cache", "retrieve", "embed", "search", "lexical", "context", "generate", "postprocess", "total"]
+
+QUERIES = [
+    "How much does the Nintendo Switch 2 cost?",
+    "Can I play my old Switch games on the Switch 2?",
+    "What are the tech specs of the Switch 2?",
+    "How long does the battery last?",
+    "Is Mario Kart World included in a bundle?",
+    "When does Pokemon Legends Z-A come out?",
+    "How do I transfer my data to the Switch 2?",
+    "Does the dock support 4K output?",
+    "What is GameChat and do I need Nintendo Switch Online?",
+    "What are game-key cards?",
+    "What comes in the box with the Switch 2?",
+    "Which microSD cards work with the Switch 2?",
+]
+
+OFFLINE_LATENCY_SETTINGS = [
+    "OFFLINE_SCRAPE_LATENCY_SECONDS",
+    "OFFLINE_EMBED_LATENCY_SECONDS",
+    "OFFLINE_VECTOR_LATENCY_SECONDS",
+    "OFFLINE_LLM_FIRST_TOKEN_SECONDS",
+    "OFFLINE_LLM_TOKEN_SECONDS",
+]
+
+
+def percentiles(values):
+    """p50/p95/p99/mean/max of a list of milliseconds (empty dict if no values)."""
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=np.float64)
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "mean": round(float(arr.mean()), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def configure_offline_environment(args, workdir):
+    """Point settings at the offline fakes and a scratch directory (before importing app)."""
+    env = {
+        "OFFLINE_MODE": "true",
+        "VECTOR_STORE_BACKEND": args.backend,
+        "INDEX_SNAPSHOT_ENABLED": "false",
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "INGEST_MANIFEST_PATH": os.path.join(workdir, "ingest_manifest.json"),
+        "SESSION_STORE_PATH": "",
+        "RESPONSE_CACHE_ENABLED": "true" if args.response_cache else "false",
+        "SERVER_TIMING_ENABLED": "true",
+        "OFFLINE_FIXTURES_PATH": str(BACKEND_DIR / "benchmarks" / "fixtures" / "firecrawl_pages.json"),
+    }
+    if args.zero_latency:
+        env.update({name: "0" for name in OFFLINE_LATENCY_SETTINGS})
+    os.environ.update(env)
+
+
+def start_server():
+    """Serve the app on a free local port; returns (base_url, server)."""
+    import logging
+    from werkzeug.serving import make_server
+
+    logging.disable(logging.INFO)
+    import app as backend
+
+    server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def run_initialize(base_url, runs):
+    """Time /api/initialize; the first run is cold, later ones hit the caches."""
+    latencies, first = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        resp = requests.post(f"{base_url}/api/initialize", json={}, timeout=600)
+        latencies.append((time.perf_counter() - start) * 1000)
+        body = resp.json()
+        if resp.status_code != 200:
+            raise RuntimeError(f"/api/initialize failed ({resp.status_code}): {body}")
+        first = first or body
+    return {
+        "runs_ms": [round(ms, 3) for ms in latencies],
+        "latency_ms": percentiles(latencies),
+        "documents_processed": first.get("documents_processed"),
+        "ingest": first.get("ingest"),
+    }
+
+
+def run_queries(base_url, queries, total, concurrency, warmup):
+    """Drive /api/query from `concurrency` clients, each with its own session."""
+    from src.modules.timing import parse_server_timing
+
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.headers["X-Session-ID"] = uuid.uuid4().hex
+        return local.session
+
+    def one(n):
+        start = time.perf_counter()
+        try:
+            resp = client().post(f"{base_url}/api/query", json={"query": queries[n % len(queries)]}, timeout=120)
+            ok = resp.status_code == 200 and resp.json().get("status") == "success"
+            timings = parse_server_timing(resp.headers.get("Server-Timing"))
+        except requests.RequestException:
+            ok, timings = False, {}
+        return (time.perf_counter() - start) * 1000, ok, timings
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        list(pool.map(one, range(warmup)))
+        start = time.perf_counter()
+        results = list(pool.map(one, range(total)))
+        duration = time.perf_counter() - start
+
+    latencies = [ms for ms, ok, _ in results if ok]
+    stages = {
+        name: percentiles([t[name] for _, ok, t in results if ok and name in t])
+        for name in STAGES
+    }
+    return {
+        "requests": total,
+        "errors": sum(not ok for _, ok, _ in results),
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 3) if duration else 0.0,
+        "latency_ms": percentiles(latencies),
+        "stages_ms": {name: values for name, values in stages.items() if values},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def find_regressions(result, baseline, max_regression, min_delta_ms, keys=("p50", "p95")):
+    """
+    Compare latency percentiles and throughput against a baseline result.
+
+    A metric regresses when it is worse by more than `max_regression`
+    (fraction) and, for latencies, by more than `min_delta_ms` in absolute
+    terms, so sub-millisecond stages don't trip on noise. Only the
+    percentiles in `keys` are compared; p99 of a few hundred requests is
+    mostly noise.
+    """
+    regressions = []
+
+    def check(label, old, new):
+        if old is None or new is None:
+            return
+        if new - old > max(old * max_regression, min_delta_ms):
+            regressions.append(f"{label}: {old:.2f} -> {new:.2f} ms")
+
+    old_query, new_query = baseline.get("query", {}), result.get("query", {})
+    for key in keys:
+        check(f"query latency {key}", old_query.get("latency_ms", {}).get(key), new_query.get("latency_ms", {}).get(key))
+        for name, values in new_query.get("stages_ms", {}).items():
+            check(f"stage {name} {key}", old_query.get("stages_ms", {}).get(name, {}).get(key), values.get(key))
+    check(
+        "initialize p50",
+        baseline.get("initialize", {}).get("latency_ms", {}).get("p50"),
+        result.get("initialize", {}).get("latency_ms", {}).get("p50")
+    )
+
+    old_rps, new_rps = old_query.get("throughput_rps"), new_query.get("throughput_rps")
+    if old_rps and new_rps is not None and new_rps < old_rps * (1 - max_regression):
+        regressions.append(f"query throughput: {old_rps:.2f} -> {new_rps:.2f} req/s")
+    return regressions
+
+
+def print_report(result):
+    query = result["query"]
+    init = result.get("initialize") or {}
+    if init:
+        print(f"initialize: {', '.join(f'{ms:.0f}' for ms in init['runs_ms'])} ms "
+              f"({init.get('documents_processed')} documents)")
+    print(f"query: {query['requests']} requests, concurrency {query['concurrency']}, "
+          f"{query['errors']} errors, {query['throughput_rps']:.1f} req/s")
+    print(f"{'':>12} | {'p50 ms':>9} | {'p95 ms':>9} | {'p99 ms':>9} | {'mean ms':>9}")
+    print("-" * 60)
+    rows = [("client", query["latency_ms"])] + list(query["stages_ms"].items())
+    for name, values in rows:
+        if values:
+            print(f"{name:>12} | {values['p50']:>9.2f} | {values['p95']:>9.2f} | "
+                  f"{values['p99']:>9.2f} | {values['mean']:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one (must already be offline)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=400, help="Measured /api/query requests")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests before timing")
+    parser.add_argument("--init-runs", type=int, default=1, help="/api/initialize runs (0 skips; needs an indexed server)")
+    parser.add_argument("--backend", choices=["pinecone", "local"], default="pinecone",
+                        help="Vector store (pinecone uses the in-memory fake index)")
+    parser.add_argument("--response-cache", action="store_true", help="Keep the response cache on (off by default)")
+    parser.add_argument("--zero-latency", action="store_true", help="No simulated service latency (measures our own overhead)")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results to compare against; exit 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="Allowed slowdown as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore latency changes smaller than this")
+    parser.add_argument("--check", nargs="+", default=["p50", "p95"], choices=["p50", "p95", "p99", "mean"],
+                        help="Latency percentiles compared against the baseline")
+    args = parser.parse_args(argv)
+
+    server = None
+    workdir = tempfile.TemporaryDirectory(prefix="bench_e2e_")
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            configure_offline_environment(args, workdir.name)
+            base_url, server = start_server()
+
+        result = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+                "offline_latencies": {name: os.environ.get(name) for name in OFFLINE_LATENCY_SETTINGS},
+            }
+        }
+        if args.init_runs:
+            result["initialize"] = run_initialize(base_url, args.init_runs)
+        result["query"] = run_queries(base_url, QUERIES, args.requests, args.concurrency, args.warmup)
+    finally:
+        if server is not None:
+            server.shutdown()
+        workdir.cleanup()
+
+    print_report(result)
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2) + "\n")
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = find_regressions(result, baseline, args.max_regression, args.min_delta_ms, args.check)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.baseline}")
+    return 0 if not result["query"]["errors"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for BM25 (lexical index) search.
+
+Indexes synthetic chunks of random words and times search as the corpus
+grows. Searches only touch the postings of the query terms, so a few
+thousand chunks should stay well under a millisecond per query.
+
+Usage (from the backend directory):
+  python benchmarks/bench_lexical_index.py
+  python benchmarks/bench_lexical_index.py --sizes 2000 20000 --max-ms 1.0
+"""
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.modules.lexical_index import LexicalIndex  # noqa: E402
+
+
+def build_index(size, vocab, words_per_chunk, rng):
+    index = LexicalIndex()
+    for n in range(size):
+        words = " ".join(rng.choice(vocab) for _ in range(words_per_chunk))
+        index.add(f"doc{n}", {"title": "Nintendo Switch 2", "content": words})
+    return index
+
+
+def ms_per_search(index, queries, repeat):
+    index.search(queries[0])
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            index.search(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 10000],
+                        help="Chunks indexed per measurement")
+    parser.add_argument("--vocab", type=int, default=3000, help="Distinct words in the corpus")
+    parser.add_argument("--words", type=int, default=120, help="Words per chunk")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the queries")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="Exit with status 1 if any size exceeds this many ms per search")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    vocab = ["".join(rng.choice(string.ascii_lowercase) for _ in range(6)) for _ in range(args.vocab)]
+    queries = [f"Does the Switch 2 support {rng.choice(vocab)} and {rng.choice(vocab)}?" for _ in range(20)]
+
+    print(f"{'chunks':>8} | {'terms':>8} | {'ms/search':>10}")
+    print("-" * 32)
+    too_slow = False
+    for size in args.sizes:
+        index = build_index(size, vocab, args.words, rng)
+        ms = ms_per_search(index, queries, args.repeat)
+        too_slow = too_slow or (args.max_ms is not None and ms > args.max_ms)
+        print(f"{size:>8} | {index.stats()['terms']:>8} | {ms:>10.3f}")
+    return 1 if too_slow else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for response post-processing.
+
+Runs a set of representative Gemini-style responses through the legacy
+ResponseProcessor (regexes compiled per call, a new instance per request) and
+the current one (precompiled patterns, shared instance), checks that both
+produce identical output, and reports time per response and peak allocation
+for the blocking and the streaming paths.
+
+Usage (from the backend directory):
+  python benchmarks/bench_response_processor.py
+  python benchmarks/bench_response_processor.py --repeat 500 --chunk 12
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.modules.response_processor import (  # noqa: E402
+    ResponseProcessor,
+    StreamingResponseProcessor,
+    enhance_response
+)
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "gemini_responses.json"
+
+
+class LegacyResponseProcessor(ResponseProcessor):
+    """The processing passes as they were before patterns were precompiled."""
+
+    def _clean_response(self, response):
+        response = re.sub(r'```.*?```', '', response, flags=re.DOTALL)
+        response = re.sub(r'\n\n\n+', '\n\n', response)
+        return response.strip()
+
+    def _improve_formatting(self, response):
+        response = re.sub(r'\*\*(.*?)\*\*', r'\1', response)
+        response = re.sub(r'__(.*?)__', r'\1', response)
+        response = re.sub(r'^\s*[\*\-]\s+', '• ', response, flags=re.MULTILINE)
+        response = re.sub(r'(\n•.*?)\n(?!\n|•)', r'\1\n', response)
+        response = re.sub(r'^\s*(\d+)\.\s+', r'\1. ', response, flags=re.MULTILINE)
+        return response
+
+    def _add_personality(self, response, turn):
+        if any(word in response.lower() for word in ["switch", "game", "play", "nintendo", "pokemon"]):
+            if "🎮" not in response:
+                response += " 🎮"
+        return response
+
+
+class LegacyStreamingProcessor(StreamingResponseProcessor):
+    """Streaming as it was before: reprocess the whole stable prefix on every chunk."""
+
+    def feed(self, text):
+        self.raw += text
+        end = self._stable_end()
+        if not end:
+            return ""
+        processed = self.processor._improve_formatting(
+            self.processor._clean_response(self.raw[:end])
+        )
+        if len(processed) > self.max_length or not processed.startswith(self.emitted):
+            return ""
+        delta = processed[len(self.emitted):]
+        self.emitted = processed
+        return delta
+
+
+def legacy_enhance(response):
+    # The old enhance_response built a new processor for every call
+    return LegacyResponseProcessor().process_response(response)
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def run_stream(streaming_cls, processor, chunks):
+    stream = streaming_cls(processor)
+    shown = "".join(stream.feed(chunk) for chunk in chunks)
+    remainder, final, replace = stream.finish()
+    return final, (shown + remainder) if not replace else final
+
+
+def measure(func, items, repeat):
+    """Return (microseconds per item, peak bytes allocated during one pass)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    per_item = (time.perf_counter() - start) / (repeat * len(items)) * 1e6
+
+    tracemalloc.start()
+    for item in items:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_item, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fixtures", default=str(FIXTURES), help="JSON list of raw responses")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the fixtures per measurement")
+    parser.add_argument("--chunk", type=int, default=8, help="Characters per simulated stream chunk")
+    args = parser.parse_args(argv)
+
+    with open(args.fixtures, encoding="utf-8") as f:
+        responses = json.load(f)
+
+    legacy = LegacyResponseProcessor()
+    shared = ResponseProcessor()
+    streams = [chunked(r, args.chunk) for r in responses]
+
+    # Both implementations must agree before timing means anything
+    for response, chunks in zip(responses, streams):
+        assert legacy_enhance(response) == enhance_response(response), response
+        assert run_stream(LegacyStreamingProcessor, legacy, chunks) == \
+            run_stream(StreamingResponseProcessor, shared, chunks), response
+
+    rows = [
+        ("blocking", measure(legacy_enhance, responses, args.repeat),
+         measure(enhance_response, responses, args.repeat)),
+        ("streaming", measure(lambda c: run_stream(LegacyStreamingProcessor, legacy, c), streams, args.repeat),
+         measure(lambda c: run_stream(StreamingResponseProcessor, shared, c), streams, args.repeat)),
+    ]
+
+    print(f"{len(responses)} responses, {args.repeat} passes, {args.chunk}-char stream chunks")
+    print(f"{'path':>9} | {'legacy us/resp':>14} | {'new us/resp':>11} | {'speedup':>7} | "
+          f"{'legacy peak B':>13} | {'new peak B':>10}")
+    print("-" * 80)
+    for name, (old_us, old_peak), (new_us, new_peak) in rows:
+        print(f"{name:>9} | {old_us:>14.1f} | {new_us:>11.1f} | {old_us / new_us:>6.2f}x | "
+              f"{old_peak:>13} | {new_peak:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for query security validation.
+
+Compares the single-pass matcher (Aho-Corasick + combined regex) with a
+per-keyword substring scan as the keyword and topic lists grow, to show that
+the cost per query stays flat.
+
+Usage (from the backend directory):
+  python benchmarks/bench_security.py
+  python benchmarks/bench_security.py --sizes 0 1000 5000 --queries 2000
+"""
+
+import argparse
+import random
+import re
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config.system_prompt import (  # noqa: E402
+    JAILBREAK_KEYWORDS,
+    SUSPICIOUS_PATTERNS,
+    OUTSIDE_SCOPE_TOPICS
+)
+from src.modules.security import SecurityValidator, build_threat_matcher  # noqa: E402
+
+
+SAMPLE_QUERIES = [
+    "How much does the Nintendo Switch 2 cost?",
+    "Can I play my old Switch games on the Switch 2?",
+    "What are the tech specs of the new console?",
+    "Is Mario Kart World included in the bundle?",
+    "When does Pokemon Legends Z-A come out and what editions are there?",
+    "How do I transfer my save data from my old system to the new one?",
+    "Does the dock support 4K output at 60 frames per second?",
+    "Where can I buy extra Joy-Con controllers and how much are they?",
+]
+
+
+class NaiveValidator:
+    """Per-keyword scan, as validation worked before the single-pass matcher."""
+
+    def __init__(self, jailbreak, patterns, topics):
+        self.jailbreak_keywords = [kw.lower() for kw in jailbreak]
+        self.suspicious_patterns = [re.compile(p) for p in patterns]
+        self.outside_scope_topics = [t.lower() for t in topics]
+
+    def validate_query(self, query):
+        query_lower = query.lower().strip()
+        for keyword in self.jailbreak_keywords:
+            if keyword in query_lower:
+                return False, "jailbreak_detected"
+        for pattern in self.suspicious_patterns:
+            if pattern.search(query):
+                return False, "suspicious_pattern_detected"
+        for topic in self.outside_scope_topics:
+            if topic in query_lower:
+                return False, "outside_scope"
+        return True, None
+
+
+def synthetic_keywords(count, rng):
+    """Random multi-letter phrases that never occur in the sample queries."""
+    words = set()
+    while len(words) < count:
+        words.add("zq" + "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))))
+    return sorted(words)
+
+
+def time_per_query(validate, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            validate(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 100, 1000, 5000],
+                        help="Extra synthetic keywords added to each list")
+    parser.add_argument("--queries", type=int, default=1000, help="Queries per measurement")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    queries = [rng.choice(SAMPLE_QUERIES) for _ in range(args.queries)]
+
+    print(f"{'extra keywords':>14} | {'total literals':>14} | {'naive us/query':>14} | {'single-pass us/query':>20}")
+    print("-" * 72)
+    for size in args.sizes:
+        extra = synthetic_keywords(size, rng)
+        jailbreak = JAILBREAK_KEYWORDS + extra[: size // 2]
+        topics = OUTSIDE_SCOPE_TOPICS + extra[size // 2:]
+
+        naive = NaiveValidator(jailbreak, SUSPICIOUS_PATTERNS, topics)
+        fast = SecurityValidator(build_threat_matcher(jailbreak, SUSPICIOUS_PATTERNS, topics))
+
+        # Both must agree before timing means anything
+        for query in SAMPLE_QUERIES:
+            assert naive.validate_query(query) == fast.validate_query(query), query
+
+        naive_us = time_per_query(naive.validate_query, queries, repeat=3)
+        fast_us = time_per_query(fast.validate_query, queries, repeat=3)
+        print(f"{size:>14} | {len(jailbreak) + len(topics):>14} | {naive_us:>14.1f} | {fast_us:>20.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Benchmark and quality check for local vector index layouts.
+
+Compares the float32 index with truncated, int8 and prefix-search layouts
+(see src/modules/local_store.py) on two workloads:
+  scale    synthetic embeddings with a Matryoshka-like spectrum: memory,
+           query latency and recall@k against the exact float32 index
+  golden   the fixture pages and golden queries: share of questions that
+           retrieve an expected page (offline hashed embeddings, or real
+           Gemini embeddings with --live)
+
+Exits with status 1 when the configured layout (LOCAL_INDEX_* settings, or
+--quantization/--truncate/--search) loses more than --max-drop golden hit
+rate or falls below --min-recall.
+
+Hashed offline embeddings are not Matryoshka-trained, so truncated layouts
+only score fairly on the golden set with --live.
+
+Usage (from the backend directory):
+  python benchmarks/bench_vector_index.py
+  python benchmarks/bench_vector_index.py --vectors 100000 --quantization int8 --search 256
+  python benchmarks/bench_vector_index.py --live --truncate 512
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.config.settings import (  # noqa: E402
+    EMBEDDING_DIMENSION,
+    GOOGLE_API_KEY,
+    LOCAL_INDEX_DIMENSION,
+    LOCAL_INDEX_QUANTIZATION,
+    LOCAL_INDEX_RESCORE_MULTIPLIER,
+    LOCAL_INDEX_SEARCH_DIMENSION
+)
+from src.modules.gemini_embedder import GeminiEmbedder  # noqa: E402
+from src.modules.local_store import LocalVectorStore  # noqa: E402
+from src.modules.offline import hashed_embedding  # noqa: E402
+from src.modules.pinecone_store import chunk_metadata, chunk_vector_id  # noqa: E402
+from src.modules.retrieval_eval import golden_hit_rate, load_golden_queries, recall_at_k  # noqa: E402
+
+FIXTURES = BACKEND_DIR / "benchmarks" / "fixtures"
+
+LAYOUTS = {
+    "float32": {},
+    "int8": {"quantization": "int8"},
+    "float32 / 256 dims": {"truncate_dimension": 256},
+    "float32 / search 256": {"search_dimension": 256},
+    "int8 / search 256": {"quantization": "int8", "search_dimension": 256},
+}
+
+
+def store_for(dimension, layout, rescore_multiplier):
+    options = {
+        "truncate_dimension": 0,
+        "quantization": "none",
+        "search_dimension": 0,
+        "rescore_multiplier": rescore_multiplier,
+    }
+    options.update(layout)
+    return LocalVectorStore(dimension=dimension, **options)
+
+
+def synthetic_embeddings(count, dimension, queries, rng):
+    """Clustered vectors whose variance falls off with the dimension index, like Matryoshka embeddings."""
+    spectrum = (1.0 + np.arange(dimension)) ** -0.5
+    centers = rng.standard_normal((max(count // 100, 1), dimension)) * spectrum
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors = vectors + 0.5 * rng.standard_normal((count, dimension)) * spectrum
+    probes = vectors[rng.integers(0, count, queries)] + 0.3 * rng.standard_normal((queries, dimension)) * spectrum
+    return vectors.astype(np.float32), probes.astype(np.float32)
+
+
+def fill(store, vectors, batch=5000):
+    for start in range(0, len(vectors), batch):
+        store.upsert_embeddings([
+            (str(n), vectors[n], {}) for n in range(start, min(start + batch, len(vectors)))
+        ])
+    return store
+
+
+def median_query_ms(store, queries, top_k):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        store.query_similar(query, top_k=top_k, include_metadata=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def scale_benchmark(args, layouts):
+    rng = np.random.default_rng(0)
+    vectors, queries = synthetic_embeddings(args.vectors, args.dimension, args.queries, rng)
+    reference = fill(store_for(args.dimension, {}, args.rescore_multiplier), vectors)
+    base_bytes = reference.get_index_stats()["memory_bytes"]
+    base_ms = median_query_ms(reference, queries, args.top_k)
+
+    print(f"Scale: {args.vectors} x {args.dimension} synthetic vectors, {args.queries} queries, top_k={args.top_k}")
+    print(f"{'layout':>22} | {'memory MB':>9} | {'vs float32':>10} | {'p50 ms':>7} | {'speedup':>7} | {'recall':>6}")
+    print("-" * 78)
+    results = {}
+    for name, layout in layouts.items():
+        store = reference if not layout else fill(store_for(args.dimension, layout, args.rescore_multiplier), vectors)
+        memory = store.get_index_stats()["memory_bytes"]
+        ms = median_query_ms(store, queries, args.top_k)
+        recall = recall_at_k(store, reference, queries, top_k=args.top_k)
+        results[name] = recall
+        print(f"{name:>22} | {memory / 2**20:>9.1f} | {memory / base_bytes:>10.2f} | {ms:>7.2f} | "
+              f"{base_ms / ms:>7.1f} | {recall:>6.3f}")
+    return results
+
+
+def golden_benchmark(args, layouts):
+    pages = json.loads((FIXTURES / "firecrawl_pages.json").read_text(encoding="utf-8"))
+    golden = load_golden_queries(str(args.golden))
+
+    if args.live:
+        embedder = GeminiEmbedder(GOOGLE_API_KEY)
+        embed = embedder.embed_text
+        dimension = len(embed("dimension probe"))
+    else:
+        dimension = args.dimension
+
+        def embed(text):
+            return hashed_embedding(text, dimension)
+
+    vectors = []
+    for url, page in pages.items():
+        doc = {"url": url, "title": page.get("title", "")}
+        for n, chunk in enumerate(GeminiEmbedder._chunk_text(page.get("markdown", ""))):
+            vectors.append((
+                chunk_vector_id(url, n),
+                embed(f"{doc['title']}\n{chunk}"),
+                chunk_metadata(doc, url, n, chunk, 0)
+            ))
+
+    source = "Gemini" if args.live else "hashed offline"
+    print(f"\nGolden set: {len(golden)} queries over {len(vectors)} chunks ({source} embeddings), top_k={args.golden_top_k}")
+    print(f"{'layout':>22} | {'hit rate':>8} | {'MRR':>5}")
+    print("-" * 42)
+    results = {}
+    for name, layout in layouts.items():
+        store = store_for(dimension, layout, args.rescore_multiplier)
+        store.upsert_embeddings(vectors)
+        quality = golden_hit_rate(store, embed, golden, top_k=args.golden_top_k)
+        results[name] = quality["hit_rate"]
+        print(f"{name:>22} | {quality['hit_rate']:>8.3f} | {quality['mrr']:>5.3f}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=50000, help="Synthetic index size")
+    parser.add_argument("--dimension", type=int, default=EMBEDDING_DIMENSION)
+    parser.add_argument("--queries", type=int, default=50, help="Synthetic queries")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--golden", type=Path, default=FIXTURES / "golden_queries.json")
+    parser.add_argument("--golden-top-k", type=int, default=3)
+    parser.add_argument("--live", action="store_true", help="Embed the golden set with Gemini (GOOGLE_API_KEY)")
+    parser.add_argument("--truncate", type=int, default=LOCAL_INDEX_DIMENSION, help="Configured layout: kept dims")
+    parser.add_argument("--quantization", choices=["none", "int8"], default=LOCAL_INDEX_QUANTIZATION)
+    parser.add_argument("--search", type=int, default=LOCAL_INDEX_SEARCH_DIMENSION, help="Configured layout: search dims")
+    parser.add_argument("--rescore-multiplier", type=int, default=LOCAL_INDEX_RESCORE_MULTIPLIER)
+    parser.add_argument("--max-drop", type=float, default=0.05, help="Allowed golden hit-rate loss")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Required synthetic recall@k")
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+
+    configured = {"truncate_dimension": args.truncate, "quantization": args.quantization, "search_dimension": args.search}
+    layouts = dict(LAYOUTS, configured=configured)
+
+    recalls = scale_benchmark(args, layouts)
+    hit_rates = golden_benchmark(args, layouts)
+
+    failures = []
+    if hit_rates["configured"] < hit_rates["float32"] - args.max_drop:
+        failures.append(
+            f"golden hit rate {hit_rates['configured']:.3f} vs float32 {hit_rates['float32']:.3f}"
+        )
+    if recalls["configured"] < args.min_recall:
+        failures.append(f"recall@{args.top_k} {recalls['configured']:.3f} < {args.min_recall}")
+
+    print(f"\nConfigured layout {configured}: " + ("FAIL (" + "; ".join(failures) + ")" if failures else "OK"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,6 +5,7 @@ Simple CLI client for the Nintendo RAG Chatbot backend.
 Usage:
   python cli_chat.py                  # interactive mode
   python cli_chat.py --once "Your question here"   # one-shot question
+  python cli_chat.py --stream         # print answers token by token
 
 Environment variables:
   CHATBOT_BASE_URL   Base URL for the backend (default: http://127.0.0.1:5002)
@@ -14,11 +15,17 @@ import os
 import sys
 import json
 import argparse
+import time
+import uuid
 from typing import Optional
 
 import requests
 
 
+# One conversation per CLI run
+SESSION_HEADERS = {"X-Session-ID": uuid.uuid4().hex}
+
+
 def get_base_url() -> str:
     return os.environ.get("CHATBOT_BASE_URL", "http://127.0.0.1:5002")
 
@@ -33,28 +40,91 @@ def health(base_url: str) -> dict:
 
 
 def initialize(base_url: str, rebuild: bool = False) -> dict:
+    """Start an ingest job and poll it, printing progress, until it finishes."""
     try:
-        payload = {"rebuild": bool(rebuild)}
-        r = requests.post(f"{base_url}/api/initialize", json=payload, timeout=300)
-        r.raise_for_status()
-        return r.json()
+        payload = {"rebuild": bool(rebuild), "async": True}
+        r = requests.post(f"{base_url}/api/initialize", json=payload, timeout=30)
+        data = r.json()
+        if r.status_code == 200:
+            return data
+        if r.status_code not in (202, 409) or not data.get("job_id"):
+            r.raise_for_status()
+            return data
+        return wait_for_job(base_url, data["job_id"])
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+def wait_for_job(base_url: str, job_id: str, interval: float = 2.0) -> dict:
+    while True:
+        r = requests.get(f"{base_url}/api/jobs/{job_id}", timeout=10)
+        r.raise_for_status()
+        job = r.json().get("job", {})
+        stages = job.get("stages", {})
+        parts = []
+        for name in ("scrape", "embed", "upsert"):
+            info = stages.get(name, {})
+            total = info.get("total")
+            parts.append(f"{name} {info.get('done', 0)}/{total if total is not None else '?'}")
+        eta = job.get("eta_seconds")
+        suffix = f" (eta {eta:.0f}s)" if eta is not None else ""
+        print(f"  [{job.get('status')}] " + ", ".join(parts) + suffix)
+
+        if job.get("status") == "succeeded":
+            return job.get("result") or {"status": "initialized"}
+        if job.get("status") in ("failed", "cancelled"):
+            return {"status": "error", "message": job.get("error") or job.get("status")}
+        time.sleep(interval)
+
+
 def query(base_url: str, text: str) -> dict:
     try:
         payload = {"query": text}
-        r = requests.post(f"{base_url}/api/query", json=payload, timeout=60)
+        r = requests.post(f"{base_url}/api/query", json=payload, headers=SESSION_HEADERS, timeout=60)
         r.raise_for_status()
         return r.json()
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+def query_stream(base_url: str, text: str, on_text=None) -> dict:
+    """POST to /api/query/stream and call on_text with each piece of the answer."""
+    try:
+        payload = {"query": text}
+        with requests.post(
+            f"{base_url}/api/query/stream", json=payload, headers=SESSION_HEADERS, stream=True, timeout=60
+        ) as r:
+            if r.status_code != 200:
+                return r.json()
+            event = None
+            for line in r.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event == "token" and on_text:
+                        on_text(data.get("text", ""))
+                    elif event in ("done", "error"):
+                        return data
+        return {"status": "error", "message": "Stream ended without a response"}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+def print_streamed(base_url: str, text: str, prefix: str = "") -> dict:
+    print(prefix, end="", flush=True)
+    res = query_stream(base_url, text, on_text=lambda t: print(t, end="", flush=True))
+    print()
+    if res.get("status") == "success":
+        if res.get("replace"):
+            print(prefix + res.get("response", ""))
+        print(f"  (first token {res.get('ttft_ms')} ms, total {res.get('total_ms', '-')} ms)")
+    return res
+
+
 def reset(base_url: str) -> dict:
     try:
-        r = requests.post(f"{base_url}/api/reset", timeout=10)
+        r = requests.post(f"{base_url}/api/reset", headers=SESSION_HEADERS, timeout=10)
         r.raise_for_status()
         return r.json()
     except Exception as e:
@@ -76,7 +146,7 @@ def ensure_initialized(base_url: str, auto_init: bool = True) -> None:
         # Don't exit; query endpoint will still report clear error.
 
 
-def interactive_loop(base_url: str) -> int:
+def interactive_loop(base_url: str, stream: bool = False) -> int:
     print("\nNintendo RAG Chatbot CLI")
     print("Type your question and press Enter")
     print("Commands: /reset to clear conversation, /exit to quit\n")
@@ -100,6 +170,12 @@ def interactive_loop(base_url: str) -> int:
             print("Bot:", res.get("message", res))
             continue
 
+        if stream:
+            res = print_streamed(base_url, text, prefix="Bot: ")
+            if res.get("status") != "success":
+                print("Bot:", res.get("message", res))
+            continue
+
         res = query(base_url, text)
         if res.get("status") == "success":
             print("Bot:", res.get("response", ""))
@@ -109,8 +185,14 @@ def interactive_loop(base_url: str) -> int:
     return 0
 
 
-def one_shot(base_url: str, question: str) -> int:
+def one_shot(base_url: str, question: str, stream: bool = False) -> int:
     ensure_initialized(base_url, auto_init=True)
+    if stream:
+        res = print_streamed(base_url, question)
+        if res.get("status") == "success":
+            return 0
+        print(json.dumps(res, indent=2))
+        return 1
     res = query(base_url, question)
     if res.get("status") == "success":
         print(res.get("response", ""))
@@ -122,13 +204,14 @@ def one_shot(base_url: str, question: str) -> int:
 def main(argv: Optional[list] = None) -> int:
     parser = argparse.ArgumentParser(description="Nintendo RAG Chatbot CLI")
     parser.add_argument("--once", metavar="QUESTION", help="Ask a single question and exit")
+    parser.add_argument("--stream", action="store_true", help="Print answers as they are generated")
     args = parser.parse_args(argv)
 
     base_url = get_base_url()
 
     if args.once:
-        return one_shot(base_url, args.once)
-    return interactive_loop(base_url)
+        return one_shot(base_url, args.once, stream=args.stream)
+    return interactive_loop(base_url, stream=args.stream)
 
 
 if __name__ == "__main__":
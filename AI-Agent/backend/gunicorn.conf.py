@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration for the chatbot backend.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Workers are separate processes, so CPU-bound work (security checks, local
+vector search, response post-processing) scales across cores; threads within
+a worker overlap the I/O-bound Gemini and Pinecone calls. Workers coordinate
+through SHARED_STATE_DIR and the index snapshot (see src/modules/shared_state.py).
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = "gthread"
+
+# Synchronous /api/initialize calls scrape and embed the whole site
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = 30
+keepalive = 5
+
+# Load the app in each worker rather than the master: clients (Gemini,
+# Pinecone, SQLite connections) must not be shared across fork()
+preload_app = False
+
+# With several workers, conversations must live in a file every worker reads
+if workers > 1:
+    os.environ.setdefault("SESSION_STORE_PATH", ".cache/sessions.sqlite3")
+    os.environ.setdefault("SESSION_READ_THROUGH", "true")
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
@@ -17,22 +17,82 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")  # Set this in .env
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT", "us-east-1")  # Adjust if needed
 
 # ===== Models & Services =====
-FIRECRAWL_BASE_URL = "https://api.firecrawl.dev/v2"
+FIRECRAWL_BASE_URL = os.getenv("FIRECRAWL_BASE_URL", "https://api.firecrawl.dev/v2")
 GEMINI_MODEL_NAME = "gemini-2.5-flash"
 GEMINI_EMBEDDING_MODEL = "gemini-embedding-001"
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "nintendo-chatbot")
 PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE", "default")
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")  # "pinecone" or "local" (in-process NumPy)
+INDEX_SNAPSHOT_ENABLED = os.getenv("INDEX_SNAPSHOT_ENABLED", "true").lower() == "true"  # Local backend only
+INDEX_SNAPSHOT_DIR = os.getenv("INDEX_SNAPSHOT_DIR", ".cache/index_snapshots")
+LOCAL_INDEX_DIMENSION = int(os.getenv("LOCAL_INDEX_DIMENSION", "0"))  # Local backend: keep the first N dims (Matryoshka), 0 = all
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "none")  # Local backend: "none" (float32) or "int8"
+LOCAL_INDEX_SEARCH_DIMENSION = int(os.getenv("LOCAL_INDEX_SEARCH_DIMENSION", "0"))  # Leading dims scanned for candidates, 0 = one full pass
+LOCAL_INDEX_RESCORE_MULTIPLIER = int(os.getenv("LOCAL_INDEX_RESCORE_MULTIPLIER", "4"))  # Candidates rescored on the full vector per result
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"  # BM25 index fused with vector search
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", ".cache/lexical_index.json")
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))  # Reciprocal-rank fusion constant
+
+# ===== Offline Mode =====
+# Fakes for Gemini, Pinecone and Firecrawl so the app runs without network or quota (load testing)
+OFFLINE_MODE = os.getenv("OFFLINE_MODE", "false").lower() == "true"
+OFFLINE_FIXTURES_PATH = os.getenv("OFFLINE_FIXTURES_PATH", "benchmarks/fixtures/firecrawl_pages.json")
+OFFLINE_FIRECRAWL_PORT = int(os.getenv("OFFLINE_FIRECRAWL_PORT", "0"))  # 0 picks a free port
+OFFLINE_SCRAPE_LATENCY_SECONDS = float(os.getenv("OFFLINE_SCRAPE_LATENCY_SECONDS", "0.5"))  # Per page
+OFFLINE_EMBED_LATENCY_SECONDS = float(os.getenv("OFFLINE_EMBED_LATENCY_SECONDS", "0.1"))  # Per embed request
+OFFLINE_VECTOR_LATENCY_SECONDS = float(os.getenv("OFFLINE_VECTOR_LATENCY_SECONDS", "0.03"))  # Per index call
+OFFLINE_LLM_FIRST_TOKEN_SECONDS = float(os.getenv("OFFLINE_LLM_FIRST_TOKEN_SECONDS", "0.5"))
+OFFLINE_LLM_TOKEN_SECONDS = float(os.getenv("OFFLINE_LLM_TOKEN_SECONDS", "0.02"))  # Per streamed chunk
 
 # ===== Website Configuration =====
 TARGET_WEBSITE_URL = "https://www.nintendo.com/us/"
 CRAWL_LIMIT = 10
 INCLUDE_SITEMAP = True
 CRAWL_ENTIRE_DOMAIN = False
+SCRAPE_MAX_WORKERS = int(os.getenv("SCRAPE_MAX_WORKERS", "6"))  # Concurrent page fetches
+SCRAPE_PER_HOST_LIMIT = int(os.getenv("SCRAPE_PER_HOST_LIMIT", "3"))  # Concurrent fetches per target host
+SCRAPE_DEADLINE_SECONDS = float(os.getenv("SCRAPE_DEADLINE_SECONDS", "120"))  # Overall scrape time budget
 
 # ===== Embedding Configuration =====
 EMBEDDING_DIMENSION = 1024  # Pinecone index configured for 1024-dim vectors
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))  # LRU eviction beyond this
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))  # Batch requests in flight
+EMBEDDING_REQUESTS_PER_SECOND = float(os.getenv("EMBEDDING_REQUESTS_PER_SECOND", "5"))  # Token-bucket rate
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))  # Retries on 429/quota errors
 
 # ===== RAG Configuration =====
+CHUNK_LEVEL_INDEXING = os.getenv("CHUNK_LEVEL_INDEXING", "true").lower() == "true"  # One vector per chunk
+INCREMENTAL_INGEST = os.getenv("INCREMENTAL_INGEST", "true").lower() == "true"  # Only re-embed changed chunks
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", ".cache/ingest_manifest.json")
+STREAMING_INGEST = os.getenv("STREAMING_INGEST", "true").lower() == "true"  # Scrape/embed/upsert as a pipeline
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))  # Pages buffered between pipeline stages
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"  # Skip the LLM for repeated questions
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))  # LRU eviction beyond this
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))  # Cosine threshold for semantic hits
+QUERY_COALESCING_ENABLED = os.getenv("QUERY_COALESCING_ENABLED", "true").lower() == "true"  # Concurrent identical queries share one run
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"  # Fail fast to fallbacks during outages
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))  # Failed fraction of recent calls that opens a circuit
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))  # Calls in the window before the rate counts
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "30"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "15"))  # Time open before a half-open probe
+HEDGED_REQUESTS_ENABLED = os.getenv("HEDGED_REQUESTS_ENABLED", "false").lower() == "true"  # Duplicate slow upstream calls
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))  # Latency quantile after which a call is hedged
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.05"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))  # Keep-alive connections per host for Gemini, Pinecone and Firecrawl
+GEMINI_REQUEST_TIMEOUT_SECONDS = float(os.getenv("GEMINI_REQUEST_TIMEOUT_SECONDS", "60"))  # 0 = no timeout
+PINECONE_INDEX_HOST = os.getenv("PINECONE_INDEX_HOST", "")  # Skips the describe_index lookup at startup when set
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "20"))  # Turns kept per conversation
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))  # Evict idle sessions
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))  # Sessions kept in memory
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "")  # SQLite file to persist sessions (empty = memory only)
+SESSION_READ_THROUGH = os.getenv("SESSION_READ_THROUGH", "false").lower() == "true"  # Several workers share SESSION_STORE_PATH
+ASYNC_MAX_THREADS = int(os.getenv("ASYNC_MAX_THREADS", "64"))  # ASGI mode: threads for vector search and blocking calls
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", ".cache/state")  # Initialization state and ingest lock shared by workers
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # Prometheus /metrics endpoint
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"  # Per-stage Server-Timing header
 TOP_K_RESULTS = 3  # Number of documents to retrieve for context (lower to reduce token usage)
 MAX_CONTEXT_LENGTH = 2000  # Max chars of context to send to LLM
 TEMPERATURE = 0.3  # Gemini generation temperature
@@ -0,0 +1,325 @@
+"""
+Async RAG pipeline.
+asyncio counterpart of ChatbotRAG, so one process can keep hundreds of
+queries in flight without a thread each. Gemini embedding and generation go
+through the genai client's async (`.aio`) surface; vector search runs in a
+worker thread because the Pinecone SDK has no asyncio client and the local
+index is CPU-bound NumPy. It wraps an existing ChatbotRAG and shares its
+vector store, embedder, response cache and sessions.
+"""
+
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple, Union
+import asyncio
+import inspect
+import logging
+
+from .metrics import GENERATION_FALLBACK_DEPTH
+from .genai_compat import generate_request, is_request_error
+from .rag_pipeline import ChatbotRAG, DEFAULT_SESSION
+from .response_cache import normalize_query
+from .singleflight import AsyncSingleFlight
+from .timing import stage
+
+logger = logging.getLogger(__name__)
+
+# A query embedding, or a task (started by the caller) that produces one
+EmbeddingSource = Union[List[float], Awaitable[List[float]], None]
+
+
+class AsyncChatbotRAG:
+    """Async query path over a ChatbotRAG's components."""
+
+    def __init__(self, chatbot: ChatbotRAG):
+        """
+        Initialize async RAG chatbot.
+
+        Args:
+            chatbot (ChatbotRAG): Synchronous chatbot whose client, vector
+                store, embedder, response cache and sessions are used
+        """
+        self.chatbot = chatbot
+        self.inflight = AsyncSingleFlight() if chatbot.inflight is not None else None
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a query without blocking the event loop."""
+        with stage("embed"):
+            embedder = self.chatbot.embedder
+            if hasattr(embedder, "aembed_text"):
+                return await embedder.aembed_text(query)
+            return await asyncio.to_thread(embedder.embed_text, query)
+
+    def start_embedding(self, query: str) -> asyncio.Task:
+        """
+        Start embedding `query` in the background and pass the task to
+        answer_query. The request goes out immediately, so only use this for
+        a query that is already validated and certain to need an embedding;
+        otherwise let answer_query embed after the exact cache lookup.
+        """
+        return asyncio.ensure_future(self.embed_query(query))
+
+    @staticmethod
+    async def _resolve(embedding: EmbeddingSource) -> Optional[List[float]]:
+        if embedding is None or isinstance(embedding, list):
+            return embedding
+        return await embedding
+
+    async def retrieve_context(
+        self,
+        query: str,
+        query_embedding: EmbeddingSource = None
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Retrieve relevant documents from the vector store.
+
+        Args:
+            query (str): User query
+            query_embedding: Precomputed embedding or embedding task (embedded here if None)
+
+        Returns:
+            Tuple[List, str]: (retrieved documents, combined context)
+        """
+        chatbot = self.chatbot
+        try:
+            with stage("retrieve"):
+                embedding = await self._resolve(query_embedding)
+                if embedding is None:
+                    embedding = await self.embed_query(query)
+                if not embedding and chatbot.lexical_index is None:
+                    logger.error("Failed to embed query")
+                    return [], ""
+
+                # Vector search (and BM25 fusion, see ChatbotRAG._search)
+                documents = await asyncio.to_thread(chatbot._search, query, embedding)
+
+                with stage("context"):
+                    documents, combined_context = chatbot._assemble_context(documents)
+
+            logger.info(f"Retrieved {len(documents)} documents for query: {query[:50]}...")
+            return documents, combined_context
+
+        except Exception as e:
+            logger.error(f"Error retrieving context: {e}")
+            return [], ""
+
+    async def _generate(self, query: str, context: str) -> Tuple[str, bool]:
+        """Generate a response; the flag is False when a fallback answer was returned."""
+        from src.config.system_prompt import SYSTEM_PROMPT
+
+        chatbot = self.chatbot
+        user_message = chatbot._user_message(query, context)
+        with stage("generate"):
+            try:
+                # Same request-form handling as ChatbotRAG._generate
+                shapes = chatbot.compat.generate_shapes()
+                bad_request = False
+                for depth, shape in enumerate(shapes):
+                    try:
+                        response = await self._generate_content(**generate_request(
+                            shape, chatbot.model, user_message, SYSTEM_PROMPT, chatbot.temperature
+                        ))
+                    except Exception as e:
+                        if is_request_error(e, bad_request) and depth + 1 < len(shapes):
+                            bad_request = bad_request or not isinstance(e, TypeError)
+                            continue
+                        raise
+                    chatbot.compat.remember(shape)
+                    break
+
+                text = chatbot._response_text(response)
+                if text:
+                    logger.info(f"Generated response for query: {query[:50]}...")
+                    GENERATION_FALLBACK_DEPTH.labels(str(depth)).inc()
+                    return text, True
+                logger.error("No response generated from Gemini")
+                GENERATION_FALLBACK_DEPTH.labels("failed").inc()
+                return "Sorry, I couldn't generate a response. Please try again. 🎮", False
+
+            except Exception as e:
+                logger.error(f"Error generating response with Gemini: {e}. Using fallback answer.")
+                GENERATION_FALLBACK_DEPTH.labels("failed").inc()
+                return chatbot._fallback_answer(context), False
+
+    async def _generate_content(self, **kwargs):
+        """Async generate_content through the generation circuit breaker (if any)."""
+        models = self.chatbot.client.aio.models
+        upstream = self.chatbot.generate_upstream
+        if upstream is None:
+            return await models.generate_content(**kwargs)
+        return await upstream.acall(models.generate_content, **kwargs)
+
+    async def _generate_stream(self, query: str, context: str) -> AsyncIterator[str]:
+        """Yield response text chunks from Gemini's async streaming API."""
+        from src.config.system_prompt import SYSTEM_PROMPT
+
+        chatbot = self.chatbot
+        upstream = chatbot.generate_upstream
+        with upstream.attempt() if upstream is not None else nullcontext():
+            stream = chatbot.client.aio.models.generate_content_stream(**generate_request(
+                chatbot.compat.generate_shape,
+                chatbot.model,
+                chatbot._user_message(query, context),
+                SYSTEM_PROMPT,
+                chatbot.temperature
+            ))
+            # Newer SDK versions return the iterator from a coroutine
+            if inspect.isawaitable(stream):
+                stream = await stream
+            async for chunk in stream:
+                text = getattr(chunk, "text", None)
+                if text:
+                    yield text
+
+    async def _cached_answer(
+        self,
+        query: str,
+        query_embedding: EmbeddingSource
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], EmbeddingSource]:
+        """
+        Look the query up in the response cache (exact, then semantic).
+
+        Returns:
+            Tuple: (cached entry or None, cache tier, embedding or embedding task)
+        """
+        cache = self.chatbot.response_cache
+        if cache is None:
+            return None, None, query_embedding
+
+        cached = cache.lookup_exact(query)
+        if cached is not None:
+            if isinstance(query_embedding, asyncio.Future):
+                query_embedding.cancel()
+            return cached, "exact", None
+
+        embedding = await self._resolve(query_embedding)
+        if embedding is None:
+            embedding = await self.embed_query(query)
+        cached = cache.lookup_similar(embedding)
+        return cached, ("semantic" if cached is not None else None), embedding
+
+    def _store(self, query: str, response: str, documents, context_length: int, embedding, generated: bool):
+        # Fallback answers are never cached
+        cache = self.chatbot.response_cache
+        if cache is not None:
+            cache.store_answer(query, response, documents, context_length, embedding, generated)
+
+    async def answer_query(
+        self,
+        query: str,
+        session_id: str = DEFAULT_SESSION,
+        query_embedding: EmbeddingSource = None
+    ) -> Dict[str, Any]:
+        """
+        Full RAG pipeline; same result as ChatbotRAG.answer_query.
+
+        Args:
+            query (str): User query
+            session_id (str): Conversation the turn belongs to
+            query_embedding: Embedding of `query`, or a task from
+                start_embedding (cancelled on an exact cache hit or when a
+                concurrent identical query's answer is shared)
+
+        Returns:
+            Dict: Same fields as ChatbotRAG.answer_query
+        """
+        # The session store may be SQLite-backed, so it runs off the event loop
+        sessions = self.chatbot.sessions
+        await asyncio.to_thread(sessions.append, session_id, "user", query)
+
+        # Identical questions asked at the same time share one pipeline run
+        coalesced = False
+        if self.inflight is not None:
+            answer, coalesced = await self.inflight.do(
+                normalize_query(query),
+                lambda: self._answer(query, query_embedding)
+            )
+            if coalesced and isinstance(query_embedding, asyncio.Future):
+                query_embedding.cancel()
+        else:
+            answer = await self._answer(query, query_embedding)
+        documents, context_length, response, cache_tier = answer
+
+        await asyncio.to_thread(sessions.append, session_id, "assistant", response)
+
+        return {
+            "query": query,
+            "response": response,
+            "context_documents": documents,
+            "context_length": context_length,
+            "conversation_turn": await asyncio.to_thread(sessions.turn_count, session_id),
+            "cache": cache_tier,
+            "coalesced": coalesced
+        }
+
+    async def _answer(
+        self,
+        query: str,
+        query_embedding: EmbeddingSource
+    ) -> Tuple[List[Dict[str, Any]], int, str, Optional[str]]:
+        """Async ChatbotRAG._answer: (context documents, context length, response, cache tier)."""
+        cached, cache_tier, query_embedding = await self._cached_answer(query, query_embedding)
+        if cached is not None:
+            logger.info(f"Response cache hit ({cache_tier}) for query: {query[:50]}...")
+            return cached["context_documents"], cached["context_length"], cached["response"], cache_tier
+
+        documents, context = await self.retrieve_context(query, query_embedding=query_embedding)
+        context_length = len(context)
+        response, generated = await self._generate(query, context)
+        self._store(query, response, documents, context_length, query_embedding, generated)
+        return documents, context_length, response, None
+
+    async def stream_answer(
+        self,
+        query: str,
+        session_id: str = DEFAULT_SESSION,
+        query_embedding: EmbeddingSource = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of answer_query; yields the same events as
+        ChatbotRAG.stream_answer ("context", "token", "done").
+        """
+        sessions = self.chatbot.sessions
+        await asyncio.to_thread(sessions.append, session_id, "user", query)
+
+        cached, cache_tier, query_embedding = await self._cached_answer(query, query_embedding)
+        if cached is not None:
+            documents = cached["context_documents"]
+            context_length = cached["context_length"]
+            yield {"type": "context", "context_documents": documents, "cache": cache_tier}
+            response = cached["response"]
+            yield {"type": "token", "text": response}
+        else:
+            documents, context = await self.retrieve_context(query, query_embedding=query_embedding)
+            context_length = len(context)
+            yield {"type": "context", "context_documents": documents, "cache": None}
+
+            parts: List[str] = []
+            generated = True
+            try:
+                async for text in self._generate_stream(query, context):
+                    parts.append(text)
+                    yield {"type": "token", "text": text}
+            except Exception as e:
+                logger.error(f"Error streaming response from Gemini: {e}")
+                if parts:
+                    generated = False
+
+            if not parts:
+                # Nothing streamed: fall back to a regular (non-streaming) call
+                text, generated = await self._generate(query, context)
+                parts.append(text)
+                yield {"type": "token", "text": text}
+            response = "".join(parts)
+            self._store(query, response, documents, context_length, query_embedding, generated)
+
+        await asyncio.to_thread(sessions.append, session_id, "assistant", response)
+
+        yield {
+            "type": "done",
+            "query": query,
+            "response": response,
+            "context_documents": documents,
+            "context_length": context_length,
+            "conversation_turn": await asyncio.to_thread(sessions.turn_count, session_id),
+            "cache": cache_tier
+        }
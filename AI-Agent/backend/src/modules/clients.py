@@ -0,0 +1,213 @@
+"""
+Shared client registry module.
+Hands out process-wide, thread-safe clients for Gemini, Pinecone and plain
+HTTP (Firecrawl), created lazily on first use and kept for the life of the
+process. Every module gets its clients here, so connections (and their TLS
+sessions) are reused through keep-alive pools sized for the server's
+concurrency, and the Pinecone index host is resolved once instead of with a
+describe_index call per store.
+"""
+
+from typing import Any, Callable, Dict, Hashable, Optional
+import json
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config.settings import (
+    GEMINI_REQUEST_TIMEOUT_SECONDS,
+    HTTP_POOL_SIZE,
+    PINECONE_ENVIRONMENT,
+    PINECONE_INDEX_HOST
+)
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[Hashable, Any] = {}
+_lock = threading.RLock()  # factories may fetch other shared clients
+
+
+def _shared(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """The client registered under `key`, created by `factory` on first use."""
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+                logger.info(f"Created shared client: {key[0]}")
+    return client
+
+
+def create_http_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """
+    Create a requests session with a keep-alive connection pool.
+
+    Args:
+        pool_size (int): Max pooled connections per host
+
+    Returns:
+        requests.Session: Session with keep-alive connection pooling
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def http_session(name: str = "default", pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """
+    Shared pooled requests session.
+
+    Args:
+        name (str): Pool name (e.g. "firecrawl"); each name gets its own session
+        pool_size (int): Max pooled connections per host (used when the
+            session is created)
+
+    Returns:
+        requests.Session: Process-wide session (requests sessions are safe
+            to share between threads for plain requests)
+    """
+    return _shared(("http", name), lambda: create_http_session(pool_size))
+
+
+def _pool_genai_transport(client, session: requests.Session, timeout: Optional[float]) -> bool:
+    """
+    Send a genai client's API-key requests through `session`.
+
+    google-genai 0.x opens a new requests.Session (and TLS connection) for
+    every call and sets no timeout. Where the installed SDK still has that
+    transport, replace it on this client's ApiClient with one that reuses
+    the pooled session; newer SDKs manage their own pool and are left alone.
+
+    Returns:
+        bool: True if the pooled transport was installed
+    """
+    try:
+        from google.genai import _api_client, errors
+    except ImportError:
+        return False
+    api_client = getattr(client, "_api_client", None)
+    if (
+        api_client is None
+        or not hasattr(api_client, "_request_unauthorized")
+        or not hasattr(_api_client, "HttpResponse")
+        or not hasattr(_api_client, "RequestJsonEncoder")
+    ):
+        return False
+
+    def request_unauthorized(http_request, stream: bool = False):
+        data = http_request.data
+        if data and not isinstance(data, bytes):
+            data = json.dumps(data, cls=_api_client.RequestJsonEncoder)
+        response = session.request(
+            http_request.method,
+            http_request.url,
+            headers=http_request.headers,
+            data=data or None,
+            stream=stream,
+            timeout=timeout
+        )
+        errors.APIError.raise_for_response(response)
+        return _api_client.HttpResponse(response.headers, response if stream else [response.text])
+
+    api_client._request_unauthorized = request_unauthorized
+    return True
+
+
+def genai_client(api_key: Optional[str]):
+    """
+    Shared google-genai client for an API key (used by the embedder and the
+    chatbot, sync and async).
+
+    Args:
+        api_key (str): Google API key
+
+    Returns:
+        genai.Client: Process-wide client
+    """
+    from google import genai
+
+    def create():
+        client = genai.Client(api_key=api_key)
+        if _pool_genai_transport(client, http_session("gemini"), GEMINI_REQUEST_TIMEOUT_SECONDS or None):
+            logger.info("Gemini requests use the pooled HTTP session")
+        return client
+
+    # Keyed by the class too, so a patched genai.Client (tests) gets its own client
+    return _shared(("genai", genai.Client, api_key), create)
+
+
+def pinecone_client(api_key: Optional[str], environment: str = PINECONE_ENVIRONMENT):
+    """
+    Shared Pinecone control-plane client.
+
+    Args:
+        api_key (str): Pinecone API key
+        environment (str): Pinecone environment
+
+    Returns:
+        Pinecone: Process-wide client whose data-plane connection pool holds
+            HTTP_POOL_SIZE connections
+    """
+    from pinecone import Pinecone
+
+    def create():
+        pc = Pinecone(api_key=api_key, environment=environment)
+        # Default is 5 x CPUs, fewer than the threads serving queries in one worker
+        openapi_config = getattr(pc, "openapi_config", None)
+        if openapi_config is not None:
+            openapi_config.connection_pool_maxsize = HTTP_POOL_SIZE
+        return pc
+
+    return _shared(("pinecone", Pinecone, api_key, environment), create)
+
+
+def pinecone_index(
+    api_key: Optional[str],
+    index_name: str,
+    environment: str = PINECONE_ENVIRONMENT,
+    host: str = PINECONE_INDEX_HOST
+):
+    """
+    Shared Pinecone index (data-plane) client.
+
+    Args:
+        api_key (str): Pinecone API key
+        index_name (str): Index name
+        environment (str): Pinecone environment
+        host (str): Index host; skips the describe_index lookup when set
+
+    Returns:
+        pinecone.Index: Process-wide index client
+    """
+    pc = pinecone_client(api_key, environment)
+
+    def create():
+        if host:
+            return pc.Index(host=host)
+        # Resolves the host with one describe_index call per process
+        return pc.Index(index_name)
+
+    return _shared(("pinecone_index", pc, index_name), create)
+
+
+def reset():
+    """Forget every shared client and close pooled sessions (tests, reconfiguration)."""
+    with _lock:
+        for client in _clients.values():
+            if isinstance(client, requests.Session):
+                client.close()
+        _clients.clear()
+
+
+def stats() -> Dict[str, int]:
+    """Number of shared clients by kind."""
+    with _lock:
+        counts: Dict[str, int] = {}
+        for key in _clients:
+            counts[key[0]] = counts.get(key[0], 0) + 1
+        return counts
@@ -0,0 +1,232 @@
+"""
+Persistent embedding cache module.
+Stores Gemini embeddings on disk (SQLite) keyed by a content hash so that
+unchanged chunks are never sent to the embedding API twice.
+"""
+
+from array import array
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Disk-backed, content-addressed cache of embedding vectors."""
+
+    def __init__(
+        self,
+        path: str,
+        model: str,
+        dimension: int,
+        max_entries: int = 50000
+    ):
+        """
+        Open (or create) an embedding cache.
+
+        Args:
+            path (str): SQLite database file (":memory:" for a process-local cache)
+            model (str): Embedding model name, part of the cache fingerprint
+            dimension (int): Embedding dimension, part of the cache fingerprint
+            max_entries (int): Maximum cached vectors before the least recently
+                used entries are evicted
+        """
+        self.path = path
+        self.model = model
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if path != ":memory:" and directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._check_fingerprint()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Content address of a text for a given model (sha256 hex digest)."""
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _fingerprint(self) -> str:
+        return f"{self.model}:{self.dimension}"
+
+    def _check_fingerprint(self):
+        """Drop every cached vector if the model or dimension has changed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'fingerprint'"
+            ).fetchone()
+            current = self._fingerprint()
+            if row and row[0] == current:
+                return
+            if row:
+                logger.info(
+                    f"Embedding settings changed ({row[0]} -> {current}); invalidating cache"
+                )
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)",
+                (current,)
+            )
+            self._conn.commit()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Look up embeddings for several texts.
+
+        Args:
+            model (str): Model the embeddings were produced with
+            texts (Sequence[str]): Texts to look up
+
+        Returns:
+            List: One entry per text, the cached vector or None on a miss
+        """
+        if not texts:
+            return []
+
+        keys = [self.make_key(model, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # SQLite limits the number of bound parameters per statement
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        CACHE_LOOKUPS.labels("embedding", "hit").inc(hit_count)
+        CACHE_LOOKUPS.labels("embedding", "miss").inc(len(results) - hit_count)
+        return results
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Look up a single embedding; returns None on a miss."""
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, items: Sequence[Tuple[str, List[float]]]):
+        """
+        Store embeddings for several texts and evict old entries if needed.
+
+        Args:
+            model (str): Model the embeddings were produced with
+            items (Sequence[Tuple]): (text, embedding) pairs
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (self.make_key(model, text), array("f", embedding).tobytes(), now)
+            for text, embedding in items
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                rows
+            )
+            self._evict_locked()
+            self._conn.commit()
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        """Store a single embedding."""
+        self.put_many(model, [(text, embedding)])
+
+    def _evict_locked(self):
+        """Remove least recently used entries beyond max_entries."""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+            (excess,)
+        )
+        self.evictions += excess
+        logger.info(f"Evicted {excess} embeddings from cache")
+
+    def invalidate(self):
+        """Delete every cached embedding (e.g. after a model change)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+        logger.info("Embedding cache invalidated")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dict: hits, misses, hit_rate, entries, evictions and size in bytes
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model,
+                "dimension": self.dimension,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "size_bytes": page_count * page_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -4,9 +4,15 @@ Fetches and processes HTML/markdown from the target website.
 """
 
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple
 import json
-from typing import List, Dict, Any
 import logging
+import threading
+import time
+
+from .clients import http_session
 
 logger = logging.getLogger(__name__)
 
@@ -14,16 +20,24 @@ logger = logging.getLogger(__name__)
 class FirecrawlScraper:
     """Manages website scraping using Firecrawl API."""
     
-    def __init__(self, api_key: str, base_url: str = "https://api.firecrawl.dev/v2"):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.firecrawl.dev/v2",
+        session: Optional[requests.Session] = None
+    ):
         """
         Initialize Firecrawl scraper.
         
         Args:
             api_key (str): Firecrawl API key
             base_url (str): Firecrawl API base URL
+            session (requests.Session): Session for connection pooling (the
+                process-wide "firecrawl" session if None)
         """
         self.api_key = api_key
         self.base_url = base_url
+        self.session = session or http_session("firecrawl")
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
@@ -33,7 +47,8 @@ class FirecrawlScraper:
         self,
         target_url: str,
         only_main_content: bool = False,
-        include_pdf: bool = True
+        include_pdf: bool = True,
+        timeout: float = 60
     ) -> Dict[str, Any]:
         """
         Scrape a single page using Firecrawl /v2/scrape endpoint.
@@ -42,6 +57,7 @@ class FirecrawlScraper:
             target_url (str): URL to scrape
             only_main_content (bool): Only extract main content
             include_pdf (bool): Include PDF parsing
+            timeout (float): Request timeout in seconds
             
         Returns:
             Dict: Scraped page content
@@ -55,11 +71,11 @@ class FirecrawlScraper:
         }
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/scrape",
                 json=payload,
                 headers=self.headers,
-                timeout=60
+                timeout=timeout
             )
             response.raise_for_status()
             
@@ -135,9 +151,11 @@ class FirecrawlScraper:
         extracted = []
         
         for page in pages:
+            metadata = page.get("metadata", {}) or {}
             doc = {
-                "url": page.get("url", ""),
-                "title": page.get("metadata", {}).get("title", ""),
+                # Firecrawl v2 reports the page URL in metadata only
+                "url": page.get("url") or metadata.get("sourceURL") or metadata.get("url", ""),
+                "title": metadata.get("title", ""),
                 "content": page.get("markdown", page.get("content", "")),
                 "html": page.get("html", "")
             }
@@ -149,91 +167,285 @@ class FirecrawlScraper:
         return extracted
 
 
+def _fetch_additional_url(
+    scraper: FirecrawlScraper,
+    url: str,
+    timeout: float = 60
+) -> Optional[Dict[str, str]]:
+    """
+    Fetch one additional URL via Firecrawl, falling back to a plain HTTP GET.
+    
+    Args:
+        scraper (FirecrawlScraper): Scraper (its session is reused for the fallback)
+        url (str): URL to fetch
+        timeout (float): Upper bound for each request in seconds
+        
+    Returns:
+        Optional[Dict]: Extracted document, or None if both attempts failed
+    """
+    try:
+        result = scraper.scrape_single_page(url, only_main_content=False, timeout=timeout)
+        
+        if result:
+            # Handle various response formats
+            data = result.get("data", result) if isinstance(result, dict) else result
+            
+            # If data is a list, take first item
+            if isinstance(data, list) and data:
+                data = data[0]
+            
+            if isinstance(data, dict):
+                doc = {
+                    "url": url,
+                    "title": (data.get("metadata", {}) or {}).get("title", ""),
+                    "content": data.get("markdown", data.get("content", "")),
+                    "html": data.get("html", "")
+                }
+                if doc["content"]:
+                    logger.info(f"✓ Added URL via Firecrawl /scrape: {url}")
+                    return doc
+        
+        # Fallback: simple HTTP GET
+        http = scraper.session.get(url, timeout=min(20, timeout))
+        http.raise_for_status()
+        logger.info(f"✓ Added URL via HTTP fallback: {url}")
+        return {
+            "url": url,
+            "title": "Additional Page",
+            "content": http.text,
+            "html": http.text
+        }
+        
+    except Exception as e:
+        logger.warning(f"Failed to fetch additional URL {url}: {e}")
+        return None
+
+
+def _http_fallback(target_url: str) -> List[Dict[str, str]]:
+    """Fetch the main URL with a plain HTTP GET when Firecrawl returned nothing."""
+    try:
+        logger.warning("Firecrawl returned no pages; attempting simple HTTP GET fallback")
+        resp = http_session("firecrawl").get(target_url, timeout=20)
+        resp.raise_for_status()
+        logger.info("✓ Fallback fetch succeeded; created 1 document from homepage HTML")
+        return [{
+            "url": target_url,
+            "title": "Nintendo Homepage (HTTP Fallback)",
+            "content": resp.text,
+            "html": resp.text
+        }]
+    except Exception as e:
+        logger.error(f"✗ Fallback fetch failed: {e}")
+        return []
+
+
+def _iter_scrape(
+    api_key: str,
+    target_url: str,
+    limit: int,
+    urls: List[str],
+    max_workers: int,
+    per_host_limit: int,
+    deadline: Optional[float],
+    on_page: Optional[Callable[[str], None]],
+    should_stop: Optional[Callable[[], bool]],
+    base_url: str
+) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+    Yield (position, document) pairs as fetches finish.
+    
+    Position 0 is the main page, position i the i-th additional URL. In
+    concurrent mode at most 2 x max_workers fetches are submitted ahead of the
+    consumer, so a slow consumer holds back fetching instead of buffering pages.
+    """
+    start = time.monotonic()
+    
+    def stopped() -> bool:
+        return bool(should_stop and should_stop())
+    
+    def report(url: str):
+        if on_page:
+            on_page(url)
+    
+    def remaining() -> float:
+        """Seconds left before the deadline (per-request timeouts are capped by it)."""
+        if deadline is None:
+            return 60.0
+        return max(0.0, deadline - (time.monotonic() - start))
+    
+    scraper = FirecrawlScraper(api_key, base_url=base_url)
+    
+    def fetch_main() -> List[Dict[str, str]]:
+        # Main URL scraping using /v2/scrape endpoint
+        pages = scraper.crawl_website(
+            target_url,
+            limit=limit,
+            include_sitemap=False,
+            crawl_entire_domain=False,
+            only_main_content=False
+        )
+        report(target_url)
+        return scraper.extract_text_from_pages(pages)
+    
+    if max_workers <= 1:
+        for doc in fetch_main():
+            yield 0, doc
+        # Scrape additional specific URLs
+        for position, url in enumerate(urls, start=1):
+            if stopped():
+                break
+            if remaining() <= 0:
+                logger.warning(f"Scrape deadline reached; skipping {url}")
+                continue
+            doc = _fetch_additional_url(scraper, url, timeout=min(60, remaining()))
+            report(url)
+            if doc:
+                yield position, doc
+        return
+    
+    host_limits: Dict[str, threading.BoundedSemaphore] = {}
+    host_lock = threading.Lock()
+    
+    def fetch(url: str) -> List[Dict[str, str]]:
+        host = urlparse(url).netloc
+        with host_lock:
+            semaphore = host_limits.setdefault(host, threading.BoundedSemaphore(per_host_limit))
+        with semaphore:
+            if remaining() <= 0 or stopped():
+                return []
+            doc = _fetch_additional_url(scraper, url, timeout=min(60, remaining()))
+            report(url)
+            return [doc] if doc else []
+    
+    tasks = iter([(0, fetch_main, ())] + [
+        (position, fetch, (url,)) for position, url in enumerate(urls, start=1)
+    ])
+    window = max_workers * 2
+    pending: Dict[Any, int] = {}
+    finished = 0
+    
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape")
+    try:
+        def fill():
+            while len(pending) < window and not stopped():
+                task = next(tasks, None)
+                if task is None:
+                    return
+                position, fn, args = task
+                pending[pool.submit(fn, *args)] = position
+        
+        fill()
+        # Wait in short slices so cancellation and the deadline are honoured
+        while pending and not stopped():
+            if deadline is not None and remaining() <= 0:
+                break
+            timeout = 0.25 if deadline is None else min(0.25, remaining())
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                position = pending.pop(future)
+                finished += 1
+                if future.exception():
+                    logger.warning(f"Scrape task failed: {future.exception()}")
+                    continue
+                for doc in future.result():
+                    yield position, doc
+            fill()
+        
+        if pending and not stopped():
+            logger.warning(
+                f"Scrape deadline of {deadline}s reached; keeping {finished} "
+                f"finished of {len(urls) + 1} fetches"
+            )
+    finally:
+        # Don't block on stragglers; queued fetches are cancelled
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_nintendo_website(
+    api_key: str,
+    target_url: str = "https://www.nintendo.com/us/",
+    limit: int = 10,
+    additional_urls: List[str] | None = None,
+    max_workers: int = 1,
+    per_host_limit: int = 2,
+    deadline: Optional[float] = None,
+    on_page: Optional[Callable[[str], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    keep_html: bool = False,
+    base_url: str = "https://api.firecrawl.dev/v2"
+) -> Iterator[Dict[str, str]]:
+    """
+    Stream scraped pages in completion order instead of building a list.
+    
+    Takes the same arguments as scrape_nintendo_website. Raw HTML is dropped
+    unless keep_html is set, since nothing downstream of ingestion uses it.
+    
+    Yields:
+        Dict: Extracted page with 'url', 'title' and 'content'
+    """
+    produced = False
+    for _, doc in _iter_scrape(
+        api_key, target_url, limit, list(additional_urls or []),
+        max_workers, per_host_limit, deadline, on_page, should_stop, base_url
+    ):
+        produced = True
+        if not keep_html:
+            doc.pop("html", None)
+        yield doc
+    
+    # Fallback: if no content scraped, try simple HTTP GET on main URL
+    if not produced and not (should_stop and should_stop()):
+        for doc in _http_fallback(target_url):
+            if not keep_html:
+                doc.pop("html", None)
+            yield doc
+
+
 def scrape_nintendo_website(
     api_key: str,
     target_url: str = "https://www.nintendo.com/us/",
     limit: int = 10,
-    additional_urls: List[str] | None = None
+    additional_urls: List[str] | None = None,
+    max_workers: int = 1,
+    per_host_limit: int = 2,
+    deadline: Optional[float] = None,
+    on_page: Optional[Callable[[str], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    base_url: str = "https://api.firecrawl.dev/v2"
 ) -> List[Dict[str, str]]:
     """
     Convenience function to scrape Nintendo website using Firecrawl /v2/scrape endpoint.
     
+    With max_workers > 1 the main page and all additional URLs are fetched
+    concurrently over one pooled session. Results keep input order, and pages
+    that have not finished when the deadline passes are dropped instead of
+    holding up the rest.
+    
     Args:
         api_key (str): Firecrawl API key
         target_url (str): URL to scrape (default: Nintendo US)
         limit (int): Max pages to scrape (note: currently scrapes one page at a time)
         additional_urls (List[str]): Additional URLs to scrape
+        max_workers (int): Concurrent fetches (1 keeps the sequential behaviour)
+        per_host_limit (int): Max concurrent fetches per target host
+        deadline (float): Overall time budget in seconds (None for no limit)
+        on_page (Callable): Called with each URL once its fetch has finished
+        should_stop (Callable): Polled between fetches; True abandons the rest
+        base_url (str): Firecrawl API base URL (e.g. a local stub)
         
     Returns:
         List[Dict]: List of extracted pages with content
     """
-    scraper = FirecrawlScraper(api_key)
-    
-    # Main URL scraping using /v2/scrape endpoint
-    pages = scraper.crawl_website(
-        target_url,
-        limit=limit,
-        include_sitemap=False,
-        crawl_entire_domain=False,
-        only_main_content=False
-    )
-    extracted = scraper.extract_text_from_pages(pages)
-
-    # Scrape additional specific URLs
-    if additional_urls:
-        for url in additional_urls:
-            try:
-                result = scraper.scrape_single_page(url, only_main_content=False)
-                
-                if result:
-                    # Handle various response formats
-                    data = result.get("data", result) if isinstance(result, dict) else result
-                    
-                    # If data is a list, take first item
-                    if isinstance(data, list) and data:
-                        data = data[0]
-                    
-                    if isinstance(data, dict):
-                        doc = {
-                            "url": url,
-                            "title": (data.get("metadata", {}) or {}).get("title", ""),
-                            "content": data.get("markdown", data.get("content", "")),
-                            "html": data.get("html", "")
-                        }
-                        if doc["content"]:
-                            extracted.append(doc)
-                            logger.info(f"✓ Added URL via Firecrawl /scrape: {url}")
-                            continue
-                
-                # Fallback: simple HTTP GET
-                http = requests.get(url, timeout=20)
-                http.raise_for_status()
-                extracted.append({
-                    "url": url,
-                    "title": "Additional Page",
-                    "content": http.text,
-                    "html": http.text
-                })
-                logger.info(f"✓ Added URL via HTTP fallback: {url}")
-                
-            except Exception as e:
-                logger.warning(f"Failed to fetch additional URL {url}: {e}")
-
+    results = list(_iter_scrape(
+        api_key, target_url, limit, list(additional_urls or []),
+        max_workers, per_host_limit, deadline, on_page, should_stop, base_url
+    ))
+    # Collect in input order; main page results first
+    results.sort(key=lambda item: item[0])
+    extracted = [doc for _, doc in results]
+    
     # Fallback: if no content scraped, try simple HTTP GET on main URL
     if not extracted:
-        try:
-            logger.warning("Firecrawl returned no pages; attempting simple HTTP GET fallback")
-            resp = requests.get(target_url, timeout=20)
-            resp.raise_for_status()
-            extracted = [{
-                "url": target_url,
-                "title": "Nintendo Homepage (HTTP Fallback)",
-                "content": resp.text,
-                "html": resp.text
-            }]
-            logger.info("✓ Fallback fetch succeeded; created 1 document from homepage HTML")
-        except Exception as e:
-            logger.error(f"✗ Fallback fetch failed: {e}")
-            extracted = []
-
+        extracted = _http_fallback(target_url)
+    
     return extracted
@@ -3,31 +3,85 @@ Gemini embeddings module for converting text to vector embeddings.
 Uses Google Gemini API to create embeddings for documents and queries.
 """
 
-from google import genai
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional
+import asyncio
 import hashlib
 import random
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
 from src.config.settings import EMBEDDING_DIMENSION
+from src.modules.rate_limiter import TokenBucket, is_rate_limit_error
+from src.modules.metrics import EMBEDDING_FALLBACKS
+from src.modules.clients import genai_client
+from src.modules.genai_compat import response_embeddings
+
+
+class FallbackEmbedding(list):
+    """
+    Hash-based embedding returned when the API is unavailable. It has the
+    right shape but no meaning, so retrieval relies on the lexical index.
+    """
+
+
+def is_fallback_embedding(embedding: Any) -> bool:
+    """True if `embedding` came from the hash fallback rather than Gemini."""
+    return isinstance(embedding, FallbackEmbedding)
 
 
 class GeminiEmbedder:
     """Manages text embedding using Google Gemini API."""
     
-    def __init__(self, api_key: str, model: str = "embedding-001"):
+    # Gemini allows at most 100 texts per embed_content request
+    BATCH_LIMIT = 100
+    # Document chunking (characters)
+    CHUNK_SIZE = 1000
+    CHUNK_OVERLAP = 100
+    
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "embedding-001",
+        cache=None,
+        max_concurrency: int = 1,
+        requests_per_second: Optional[float] = None,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        client=None,
+        upstream=None
+    ):
         """
         Initialize Gemini embedder.
         
         Args:
             api_key (str): Google API key
             model (str): Embedding model name
+            cache: Optional EmbeddingCache consulted before calling the API
+            max_concurrency (int): Max batch requests in flight at once
+            requests_per_second (float): Token-bucket rate limit (None disables it)
+            max_retries (int): Retries for a batch rejected with 429/quota errors
+            retry_backoff (float): Base delay in seconds for exponential backoff
+            client: Pre-built genai client (e.g. an offline fake); the
+                process-wide client for api_key if None
+            upstream: Optional resilience.Upstream guarding embed calls
+                (circuit breaker, hedging); an open circuit means fallback embeddings
         """
-        self.client = genai.Client(api_key=api_key)
+        self.client = client or genai_client(api_key)
         self.model = model
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.upstream = upstream
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get embedding cache hit/miss counters (empty if caching is disabled)."""
+        return self.cache.stats() if self.cache else {}
 
     
     def _fallback_embedding(self, text: str, dim: int = EMBEDDING_DIMENSION) -> List[float]:
@@ -41,7 +95,98 @@ class GeminiEmbedder:
         vec = [rng.uniform(-1.0, 1.0) for _ in range(dim)]
         # Optional: normalize to unit length to keep scale consistent
         norm = sum(v*v for v in vec) ** 0.5 or 1.0
-        return [v / norm for v in vec]
+        return FallbackEmbedding(v / norm for v in vec)
+
+    def _embed_content(self, batch: List[str]) -> Any:
+        """embed_content through the circuit breaker; only single-text (query) calls are hedged."""
+        if self.upstream is None:
+            return self.client.models.embed_content(model=self.model, contents=batch)
+        return self.upstream.call(
+            self.client.models.embed_content,
+            model=self.model,
+            contents=batch,
+            hedge=len(batch) == 1
+        )
+
+    async def _aembed_content(self, batch: List[str]) -> Any:
+        """Async _embed_content."""
+        if self.upstream is None:
+            return await self.client.aio.models.embed_content(model=self.model, contents=batch)
+        return await self.upstream.acall(
+            self.client.aio.models.embed_content,
+            model=self.model,
+            contents=batch,
+            hedge=len(batch) == 1
+        )
+
+    def _request_embeddings(self, batch: List[str]) -> Optional[List[List[float]]]:
+        """
+        Call the API for a batch and parse embeddings robustly.
+        
+        Returns:
+            Optional[List]: One embedding per text, or None if the call failed
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            try:
+                res = self._embed_content(batch)
+                break
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    # Network failures and other errors go straight to fallback
+                    logger.error(f"Error embedding batch with Gemini: {e}")
+                    return None
+                if self.rate_limiter:
+                    self.rate_limiter.throttle()
+                if attempt >= self.max_retries:
+                    logger.error(f"Gemini quota exhausted after {attempt + 1} attempts: {e}")
+                    return None
+                delay = self.retry_backoff * (2 ** attempt) * random.uniform(0.8, 1.2)
+                logger.warning(f"Gemini rate limited; retrying batch in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+        if self.rate_limiter:
+            self.rate_limiter.reward()
+        return self._parse_embeddings(res, batch)
+
+    async def _arequest_embeddings(self, batch: List[str]) -> Optional[List[List[float]]]:
+        """Async variant of _request_embeddings using the client's `.aio` surface."""
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async()
+            try:
+                res = await self._aembed_content(batch)
+                break
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    logger.error(f"Error embedding batch with Gemini: {e}")
+                    return None
+                if self.rate_limiter:
+                    self.rate_limiter.throttle()
+                if attempt >= self.max_retries:
+                    logger.error(f"Gemini quota exhausted after {attempt + 1} attempts: {e}")
+                    return None
+                delay = self.retry_backoff * (2 ** attempt) * random.uniform(0.8, 1.2)
+                logger.warning(f"Gemini rate limited; retrying batch in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        if self.rate_limiter:
+            self.rate_limiter.reward()
+        return self._parse_embeddings(res, batch)
+
+    @staticmethod
+    def _parse_embeddings(res: Any, batch: List[str]) -> Optional[List[List[float]]]:
+        """Parse an embed_content response; None unless there is one embedding per text."""
+        # The response layout is detected once per response class (see genai_compat)
+        parsed = response_embeddings(res, len(batch))
+        if parsed is None:
+            logger.warning("Gemini returned no embeddings for batch")
+        return parsed
 
     def embed_text(self, text: str) -> List[float]:
         """
@@ -53,86 +198,128 @@ class GeminiEmbedder:
         Returns:
             List[float]: Embedding vector
         """
-        try:
-            result = self.client.models.embed_content(
-                model=self.model,
-                contents=[text]
-            )
-            # Try multiple likely response shapes
-            embedding = None
-            if hasattr(result, "embeddings") and result.embeddings:
-                emb0 = result.embeddings[0]
-                # Some SDKs return objects with .values
-                embedding = getattr(emb0, "values", emb0)
-            elif isinstance(result, dict):
-                data = result.get("embeddings") or result.get("data") or []
-                if data:
-                    emb0 = data[0]
-                    embedding = emb0.get("values") if isinstance(emb0, dict) else emb0
-
-            if embedding and isinstance(embedding, list):
-                logger.debug(f"Generated embedding of dimension {len(embedding)}")
-                return embedding
-            else:
-                logger.warning("Gemini returned no embeddings; using fallback")
-                return self._fallback_embedding(text)
-        except Exception as e:
-            # Common when API quotas are exhausted or network fails
-            logger.error(f"Error embedding text with Gemini, using fallback: {e}")
+        if self.cache:
+            cached = self.cache.get(self.model, text)
+            if cached is not None:
+                return cached
+
+        parsed = self._request_embeddings([text])
+        if not parsed:
+            logger.warning("Using fallback embedding for text")
+            EMBEDDING_FALLBACKS.inc()
+            return self._fallback_embedding(text)
+
+        embedding = parsed[0]
+        logger.debug(f"Generated embedding of dimension {len(embedding)}")
+        if self.cache:
+            self.cache.put(self.model, text, embedding)
+        return embedding
+    
+    async def aembed_text(self, text: str) -> List[float]:
+        """
+        Async variant of embed_text (cache, rate limit, retries and fallback
+        behave the same); the API call is awaited instead of blocking a thread.
+        
+        Args:
+            text (str): Text to embed
+        
+        Returns:
+            List[float]: Embedding vector
+        """
+        # The SQLite cache blocks, so it is read and written off the event loop
+        if self.cache:
+            cached = await asyncio.to_thread(self.cache.get, self.model, text)
+            if cached is not None:
+                return cached
+
+        parsed = await self._arequest_embeddings([text])
+        if not parsed:
+            logger.warning("Using fallback embedding for text")
+            EMBEDDING_FALLBACKS.inc()
             return self._fallback_embedding(text)
+
+        embedding = parsed[0]
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, self.model, text, embedding)
+        return embedding
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def embed_texts(
+        self,
+        texts: List[str],
+        on_progress: Optional[Callable[[int], None]] = None
+    ) -> List[List[float]]:
         """
         Convert multiple texts to embeddings. Automatically batches to respect
-        API limits (Gemini allows at most 100 requests per batch).
+        API limits (Gemini allows at most 100 requests per batch). Texts already
+        in the embedding cache are not sent to the API, and up to
+        `max_concurrency` batches are in flight at once.
         
         Args:
             texts (List[str]): List of texts to embed
+            on_progress (Callable): Called with the number of texts completed
+                (cache hits first, then once per batch)
         """
-        def _embed_batch(batch: List[str]) -> List[List[float]]:
-            """Call the API for a batch and parse embeddings robustly."""
-            try:
-                res = self.client.models.embed_content(
-                    model=self.model,
-                    contents=batch
-                )
-                parsed: List[List[float]] = []
-                if hasattr(res, "embeddings") and res.embeddings:
-                    for emb in res.embeddings:
-                        parsed.append(getattr(emb, "values", emb))
-                elif isinstance(res, dict):
-                    data = res.get("embeddings") or res.get("data") or []
-                    for emb in data:
-                        parsed.append(emb.get("values") if isinstance(emb, dict) else emb)
-                # If nothing parsed, fall back per text in this batch
-                if not parsed:
-                    logger.warning("Gemini returned no embeddings for batch; using fallback per text")
-                    parsed = [self._fallback_embedding(t) for t in batch]
-                return parsed
-            except Exception as e:
-                logger.error(f"Error embedding batch with Gemini, using fallback: {e}")
-                return [self._fallback_embedding(t) for t in batch]
+        if self.cache:
+            all_embeddings = self.cache.get_many(self.model, texts)
+        else:
+            all_embeddings = [None] * len(texts)
+        missing = [i for i, emb in enumerate(all_embeddings) if emb is None]
+        if on_progress and len(texts) > len(missing):
+            on_progress(len(texts) - len(missing))
+        batches = [
+            missing[i:i + self.BATCH_LIMIT]
+            for i in range(0, len(missing), self.BATCH_LIMIT)
+        ]
 
-        # Batch by at most 100 to satisfy API constraint
-        BATCH_LIMIT = 100
-        all_embeddings: List[List[float]] = []
-        for i in range(0, len(texts), BATCH_LIMIT):
-            batch = texts[i:i + BATCH_LIMIT]
-            all_embeddings.extend(_embed_batch(batch))
+        def _embed_batch(batch_idx: List[int]) -> List[List[float]]:
+            batch = [texts[j] for j in batch_idx]
+            parsed = self._request_embeddings(batch)
+            if parsed is None:
+                # Fallback embeddings are never cached
+                logger.warning("Using fallback embeddings for batch")
+                EMBEDDING_FALLBACKS.inc(len(batch))
+                parsed = [self._fallback_embedding(t) for t in batch]
+            elif self.cache:
+                self.cache.put_many(self.model, list(zip(batch, parsed)))
+            if on_progress:
+                on_progress(len(batch))
+            return parsed
 
-        logger.info(f"Prepared embeddings for {len(texts)} texts (batched)")
+        workers = min(self.max_concurrency, len(batches))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+                results = list(pool.map(_embed_batch, batches))
+        else:
+            results = [_embed_batch(batch_idx) for batch_idx in batches]
+
+        for batch_idx, parsed in zip(batches, results):
+            for j, emb in zip(batch_idx, parsed):
+                all_embeddings[j] = emb
+
+        logger.info(
+            f"Prepared embeddings for {len(texts)} texts "
+            f"({len(texts) - len(missing)} cached, {len(missing)} requested "
+            f"in {len(batches)} batches)"
+        )
         return all_embeddings
-    def embed_documents(self, documents: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+
+    def embed_documents(
+        self,
+        documents: List[Dict[str, str]],
+        on_progress: Optional[Callable[[int], None]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Convert document contents to embeddings.
         
         Args:
             documents (List[Dict]): List of documents with 'content' field
+            on_progress (Callable): Called with the number of chunks embedded
             
         Returns:
             List[Dict]: Documents with added 'embedding' field
         """
         embedded_docs = []
+        doc_chunks = []
         
         for doc in documents:
             content = doc.get("content", "")
@@ -141,16 +328,28 @@ class GeminiEmbedder:
                 continue
             
             # Chunk large documents to avoid API limits
-            chunks = self._chunk_text(content, chunk_size=1000)
-            
-            # Embed each chunk
-            chunk_embeddings = self.embed_texts(chunks)
+            doc_chunks.append((
+                doc,
+                self._chunk_text(content, chunk_size=self.CHUNK_SIZE, overlap=self.CHUNK_OVERLAP)
+            ))
+        
+        # Embed chunks of all documents together so batches are always full
+        all_chunks = [chunk for _, chunks in doc_chunks for chunk in chunks]
+        all_embeddings = self.embed_texts(all_chunks, on_progress=on_progress)
+        
+        offset = 0
+        for doc, chunks in doc_chunks:
+            chunk_embeddings = all_embeddings[offset:offset + len(chunks)]
+            offset += len(chunks)
             
             # Use first chunk's embedding as document embedding (could also average)
             if chunk_embeddings:
                 embedded_doc = doc.copy()
                 embedded_doc["embedding"] = chunk_embeddings[0]
                 embedded_doc["chunks"] = chunks
+                embedded_doc["chunk_offsets"] = self._chunk_offsets(
+                    len(chunks), chunk_size=self.CHUNK_SIZE, overlap=self.CHUNK_OVERLAP
+                )
                 embedded_doc["chunk_embeddings"] = chunk_embeddings
                 embedded_docs.append(embedded_doc)
         
@@ -180,10 +379,18 @@ class GeminiEmbedder:
         
         return chunks if chunks else [text]
 
+    @staticmethod
+    def _chunk_offsets(num_chunks: int, chunk_size: int = 1000, overlap: int = 100) -> List[int]:
+        """Character offset of each chunk produced by `_chunk_text`."""
+        stride = chunk_size - overlap
+        return [i * stride for i in range(num_chunks)]
+
 
 def embed_content_for_storage(
     api_key: str,
-    documents: List[Dict[str, str]]
+    documents: List[Dict[str, str]],
+    embedder: Optional[GeminiEmbedder] = None,
+    on_progress: Optional[Callable[[int], None]] = None
 ) -> List[Dict[str, Any]]:
     """
     Convenience function to embed documents for storage in vector DB.
@@ -191,9 +398,12 @@ def embed_content_for_storage(
     Args:
         api_key (str): Google API key
         documents (List[Dict]): Documents to embed
+        embedder (GeminiEmbedder): Existing embedder to reuse (keeps its cache)
+        on_progress (Callable): Called with the number of chunks embedded
         
     Returns:
         List[Dict]: Documents with embeddings
     """
-    embedder = GeminiEmbedder(api_key)
-    return embedder.embed_documents(documents)
+    if embedder is None:
+        embedder = GeminiEmbedder(api_key)
+    return embedder.embed_documents(documents, on_progress=on_progress)
@@ -0,0 +1,286 @@
+"""
+google-genai compatibility module.
+SDK versions differ in how generate_content takes the system instruction and
+temperature, and in the shape of generation and embedding responses. Rather
+than trying every request form and probing every response layout on each
+call, this module works out once per process what the installed SDK accepts
+and returns, remembers it, and sends later calls straight to the working
+form. A remembered choice is only revisited when it stops working.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import inspect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# generate_content request forms, most capable first:
+#   config - config={"system_instruction", "temperature"} (google-genai >= 0.3)
+#   kwargs - system_instruction= and generation_config= keywords (older SDKs)
+#   inline - system instruction prepended to the message, default temperature
+#   plain  - the message alone
+GENERATE_SHAPES = ("config", "kwargs", "inline", "plain")
+
+
+def _user_content(message: str) -> List[Dict[str, Any]]:
+    return [{"role": "user", "parts": [{"text": message}]}]
+
+
+def generate_request(
+    shape: str,
+    model: str,
+    message: str,
+    system_instruction: str,
+    temperature: float
+) -> Dict[str, Any]:
+    """
+    Keyword arguments for generate_content (or generate_content_stream) in a given form.
+
+    Args:
+        shape (str): One of GENERATE_SHAPES
+        model (str): Gemini model name
+        message (str): User message (context and question)
+        system_instruction (str): System prompt
+        temperature (float): Generation temperature
+
+    Returns:
+        Dict: Keyword arguments for the call
+    """
+    if shape == "config":
+        return {
+            "model": model,
+            "contents": message,
+            "config": {"system_instruction": system_instruction, "temperature": temperature}
+        }
+    if shape == "kwargs":
+        return {
+            "model": model,
+            "contents": _user_content(message),
+            "system_instruction": system_instruction,
+            "generation_config": {"temperature": temperature}
+        }
+    if shape == "inline":
+        return {"model": model, "contents": f"{system_instruction}\n\n{message}"}
+    if shape == "plain":
+        return {"model": model, "contents": _user_content(message)}
+    raise ValueError(f"Unknown generate_content shape: {shape}")
+
+
+def is_request_error(error: Exception, rejected: bool = False) -> bool:
+    """
+    True if a generate_content call failed because of how it was made, so
+    another request form may work. An unsupported argument (TypeError) always
+    counts. A 400 Bad Request may just as well be about the prompt itself, so
+    it only counts once per call: when a second form is rejected with a 400
+    too, the content is at fault and the call fails without trying (or
+    remembering) a less capable form. Outages and timeouts are not retried
+    with other forms.
+
+    Args:
+        error (Exception): What the call raised
+        rejected (bool): An earlier form of the same call got a 400
+    """
+    if isinstance(error, TypeError):
+        return True
+    return getattr(error, "code", None) == 400 and not rejected
+
+
+def detect_generate_shape(generate_content: Callable[..., Any]) -> str:
+    """
+    Best request form according to generate_content's signature (no API call).
+
+    Returns:
+        str: "config" or "kwargs" when the signature names them, otherwise
+            the first form (confirmed or corrected by the first real call)
+    """
+    try:
+        params = inspect.signature(generate_content).parameters
+    except (TypeError, ValueError):
+        return GENERATE_SHAPES[0]
+    if "config" in params:
+        return "config"
+    if "system_instruction" in params:
+        return "kwargs"
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values()):
+        return GENERATE_SHAPES[0]
+    return "inline"
+
+
+class GenaiCompat:
+    """The generate_content request form that works with one SDK client class."""
+
+    def __init__(self, generate_content: Callable[..., Any]):
+        """
+        Args:
+            generate_content (Callable): The client's models.generate_content
+        """
+        self.generate_shape = detect_generate_shape(generate_content)
+        self.detected_shape = self.generate_shape
+        self.shape_changes = 0
+        self._lock = threading.Lock()
+        logger.info(f"Gemini generate_content request form: {self.generate_shape}")
+
+    def generate_shapes(self) -> Tuple[str, ...]:
+        """Request forms to try for a call: the remembered one, then the less capable ones."""
+        return GENERATE_SHAPES[GENERATE_SHAPES.index(self.generate_shape):]
+
+    def remember(self, shape: str):
+        """Record that `shape` worked, so later calls start with it."""
+        if shape == self.generate_shape:
+            return
+        with self._lock:
+            if shape != self.generate_shape:
+                logger.warning(f"Gemini rejected the {self.generate_shape!r} request form; using {shape!r} from now on")
+                self.generate_shape = shape
+                self.shape_changes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generate_shape": self.generate_shape,
+            "detected_shape": self.detected_shape,
+            "shape_changes": self.shape_changes
+        }
+
+
+_compat: Dict[type, GenaiCompat] = {}
+_compat_lock = threading.Lock()
+
+
+def compat_for(client) -> GenaiCompat:
+    """
+    Process-wide GenaiCompat for a genai client's SDK (shared by its sync
+    and async surfaces, and by every client of the same class).
+    """
+    models = client.models
+    key = type(models)
+    compat = _compat.get(key)
+    if compat is None:
+        with _compat_lock:
+            compat = _compat.get(key)
+            if compat is None:
+                compat = _compat[key] = GenaiCompat(models.generate_content)
+    return compat
+
+
+# ----- Response layouts -----
+
+def _text_attr(response: Any) -> Optional[str]:
+    return getattr(response, "text", None) if not isinstance(response, dict) else None
+
+
+def _dict_text(response: Any) -> Optional[str]:
+    return response.get("text") if isinstance(response, dict) else None
+
+
+def _dict_candidates(response: Any) -> Optional[str]:
+    # candidates[0].content.parts[0].text
+    if not isinstance(response, dict):
+        return None
+    candidates = response.get("candidates") or []
+    if not candidates:
+        return None
+    content = (candidates[0] or {}).get("content") or {}
+    parts = content.get("parts") or []
+    if parts and isinstance(parts[0], dict):
+        return parts[0].get("text")
+    return None
+
+
+TEXT_LAYOUTS: Dict[str, Callable[[Any], Optional[str]]] = {
+    "text_attr": _text_attr,
+    "dict_text": _dict_text,
+    "dict_candidates": _dict_candidates
+}
+
+
+def _embedding_values(res: Any) -> Optional[List[Any]]:
+    embeddings = getattr(res, "embeddings", None) if not isinstance(res, dict) else None
+    # Some SDKs return objects with .values
+    return [getattr(emb, "values", None) for emb in embeddings] if embeddings else None
+
+
+def _embedding_lists(res: Any) -> Optional[List[Any]]:
+    embeddings = getattr(res, "embeddings", None) if not isinstance(res, dict) else None
+    return list(embeddings) if embeddings else None
+
+
+def _embedding_dict(res: Any) -> Optional[List[Any]]:
+    if not isinstance(res, dict):
+        return None
+    data = res.get("embeddings") or res.get("data") or []
+    return [emb.get("values") if isinstance(emb, dict) else emb for emb in data] or None
+
+
+EMBEDDING_LAYOUTS: Dict[str, Callable[[Any], Optional[List[Any]]]] = {
+    "values": _embedding_values,
+    "lists": _embedding_lists,
+    "dict": _embedding_dict
+}
+
+# Response class -> layout name that last worked for it
+_text_layouts: Dict[type, str] = {}
+_embedding_layouts: Dict[type, str] = {}
+
+
+def _extract(
+    response: Any,
+    layouts: Dict[str, Callable[[Any], Any]],
+    known: Dict[type, str],
+    valid: Callable[[Any], bool]
+) -> Any:
+    key = type(response)
+    name = known.get(key)
+    if name is not None:
+        try:
+            value = layouts[name](response)
+        except Exception:
+            value = None
+        if valid(value):
+            return value
+
+    # Unknown response class (or the remembered layout no longer fits): probe
+    for candidate, extract in layouts.items():
+        if candidate == name:
+            continue
+        try:
+            value = extract(response)
+        except Exception:
+            continue
+        if valid(value):
+            known[key] = candidate
+            return value
+    return None
+
+
+def response_text(response: Any) -> Optional[str]:
+    """Generated text of a generate_content response, or None if it has none."""
+    return _extract(response, TEXT_LAYOUTS, _text_layouts, lambda text: isinstance(text, str) and bool(text))
+
+
+def response_embeddings(res: Any, count: int) -> Optional[List[List[float]]]:
+    """
+    Embeddings in an embed_content response.
+
+    Args:
+        res: embed_content response
+        count (int): Number of texts embedded
+
+    Returns:
+        Optional[List]: One embedding per text, or None if the response has
+            no usable embeddings for every text
+    """
+    return _extract(
+        res,
+        EMBEDDING_LAYOUTS,
+        _embedding_layouts,
+        lambda parsed: bool(parsed) and len(parsed) == count and all(isinstance(e, list) and e for e in parsed)
+    )
+
+
+def layouts() -> Dict[str, Dict[str, str]]:
+    """Response layouts learned so far, by response class name."""
+    return {
+        "text": {cls.__name__: name for cls, name in _text_layouts.items()},
+        "embeddings": {cls.__name__: name for cls, name in _embedding_layouts.items()}
+    }
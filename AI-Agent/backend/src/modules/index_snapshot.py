@@ -0,0 +1,270 @@
+"""
+On-disk index snapshot module.
+Writes the local vector index in a layout that can be memory-mapped at
+startup without parsing, so a restarted process (or several worker
+processes sharing the OS page cache) can serve queries immediately.
+
+Snapshot layout (one directory per snapshot):
+    manifest.json      count, dimensions, quantization, id width, format version
+    vectors.f32        count x search dimension float32, row-major
+                       (vectors.i8 for int8 indexes)
+    tail.f32           count x remaining stored dimensions, when searching on
+                       a prefix (tail.i8 for int8 indexes)
+    norms.f32          count float32 vector norms
+    scales.f32         count float32 dequantization scales (int8 only)
+    search_norms.f32   count float32 norms of the searched columns (prefix only)
+    ids.bin            count fixed-width, NUL-padded UTF-8 IDs
+    meta.bin           concatenated UTF-8 JSON metadata records
+    meta_offsets.u64   count + 1 uint64 offsets into meta.bin
+
+The snapshot root holds a CURRENT file naming the latest snapshot directory.
+"""
+
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+
+from src.modules.local_store import LocalVectorStore
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 2
+# Version 1 snapshots (float32, full dimension, no tail) load unchanged
+READABLE_FORMAT_VERSIONS = (1, 2)
+
+# Array file suffix by dtype
+_SUFFIXES = {"float32": "f32", "int8": "i8"}
+_DTYPES = {"f32": "<f4", "i8": "i1"}
+CURRENT_POINTER = "CURRENT"
+
+
+class _SnapshotMetadata:
+    """Read-only sequence that decodes metadata records on demand."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, pos: int) -> Dict[str, Any]:
+        if pos < 0:
+            pos += len(self)
+        start, end = int(self._offsets[pos]), int(self._offsets[pos + 1])
+        return json.loads(self._blob[start:end].tobytes().decode("utf-8"))
+
+    def __iter__(self):
+        for pos in range(len(self)):
+            yield self[pos]
+
+
+def latest_snapshot_path(root: str) -> Optional[str]:
+    """
+    Resolve the latest snapshot directory under `root`.
+
+    Args:
+        root (str): Snapshot root directory
+
+    Returns:
+        Optional[str]: Path of the latest snapshot, or None if there is none
+    """
+    try:
+        with open(os.path.join(root, CURRENT_POINTER), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    path = os.path.join(root, name)
+    return path if name and os.path.isdir(path) else None
+
+
+def write_snapshot(store: LocalVectorStore, root: str, keep: int = 2) -> str:
+    """
+    Persist a local vector store as a new snapshot and make it current.
+
+    Args:
+        store (LocalVectorStore): Store to persist
+        root (str): Snapshot root directory
+        keep (int): Number of most recent snapshots to keep on disk
+
+    Returns:
+        str: Path of the written snapshot directory
+    """
+    exported = store.export_arrays()
+    ids, metadata = exported["ids"], exported["metadata"]
+    count = len(ids)
+
+    os.makedirs(root, exist_ok=True)
+    name = f"snapshot-{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{os.getpid()}"
+    tmp_path = os.path.join(root, f".{name}.tmp")
+    os.makedirs(tmp_path)
+
+    encoded_ids = [vector_id.encode("utf-8") for vector_id in ids]
+    id_width = max([len(b) for b in encoded_ids] + [1])
+    id_table = np.array(encoded_ids, dtype=f"S{id_width}") if count else np.zeros(0, dtype="S1")
+
+    records = [json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+               for meta in metadata]
+    offsets = np.zeros(count + 1, dtype="<u8")
+    if records:
+        offsets[1:] = np.cumsum([len(r) for r in records])
+
+    suffix = _SUFFIXES[exported["vectors"].dtype.name]
+    exported["vectors"].astype(_DTYPES[suffix]).tofile(os.path.join(tmp_path, f"vectors.{suffix}"))
+    if exported["tail"].shape[1]:
+        exported["tail"].astype(_DTYPES[suffix]).tofile(os.path.join(tmp_path, f"tail.{suffix}"))
+    for array in ("norms", "scales", "search_norms"):
+        if exported[array] is not None:
+            exported[array].astype("<f4").tofile(os.path.join(tmp_path, f"{array}.f32"))
+    id_table.tofile(os.path.join(tmp_path, "ids.bin"))
+    with open(os.path.join(tmp_path, "meta.bin"), "wb") as f:
+        for record in records:
+            f.write(record)
+    offsets.tofile(os.path.join(tmp_path, "meta_offsets.u64"))
+
+    manifest = {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "count": count,
+        "dimension": exported["dimension"],
+        "stored_dimension": exported["stored_dimension"],
+        "search_dimension": exported["search_dimension"],
+        "quantization": exported["quantization"],
+        "id_width": id_width,
+        "namespace": store.namespace,
+        "created_at": datetime.now().isoformat()
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    final_path = os.path.join(root, name)
+    os.replace(tmp_path, final_path)
+
+    # Atomically repoint CURRENT so readers never see a half-written snapshot
+    pointer_tmp = os.path.join(root, f".{CURRENT_POINTER}.{os.getpid()}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(pointer_tmp, os.path.join(root, CURRENT_POINTER))
+
+    _prune_snapshots(root, keep)
+    logger.info(f"Wrote index snapshot with {count} vectors to {final_path}")
+    return final_path
+
+
+def _prune_snapshots(root: str, keep: int):
+    """Delete all but the `keep` newest snapshots (mapped files stay valid on POSIX)."""
+    names = sorted(
+        name for name in os.listdir(root)
+        if name.startswith("snapshot-") and os.path.isdir(os.path.join(root, name))
+    )
+    for name in names[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def load_snapshot(
+    path: str,
+    expected_dimension: Optional[int] = None,
+    **layout
+) -> Optional[LocalVectorStore]:
+    """
+    Memory-map a snapshot into a LocalVectorStore.
+
+    Vectors, norms and metadata stay on disk and are paged in by the OS on
+    demand; only the ID table is decoded up front. A snapshot written with a
+    different index layout (LOCAL_INDEX_* settings) is converted in memory.
+
+    Args:
+        path (str): Snapshot directory (see latest_snapshot_path)
+        expected_dimension (int): Reject snapshots with a different dimension
+        **layout: LocalVectorStore layout options (defaults from settings)
+
+    Returns:
+        Optional[LocalVectorStore]: Read-mostly store, or None if unusable
+    """
+    try:
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if manifest.get("version") not in READABLE_FORMAT_VERSIONS:
+            logger.warning(f"Unsupported snapshot version in {path}: {manifest.get('version')}")
+            return None
+
+        count = int(manifest["count"])
+        dimension = int(manifest["dimension"])
+        stored_dimension = int(manifest.get("stored_dimension", dimension))
+        search_dimension = int(manifest.get("search_dimension", stored_dimension))
+        suffix = "i8" if manifest.get("quantization", "none") == "int8" else "f32"
+        if expected_dimension is not None and dimension != expected_dimension:
+            logger.warning(
+                f"Snapshot dimension {dimension} does not match expected {expected_dimension}"
+            )
+            return None
+
+        if count == 0:
+            return LocalVectorStore(dimension=dimension, namespace=manifest.get("namespace", "default"), **layout)
+
+        def mapped(name: str, dtype: str, *shape: int) -> Optional[np.ndarray]:
+            file_path = os.path.join(path, name)
+            if not os.path.exists(file_path):
+                return None
+            return np.memmap(file_path, dtype=dtype, mode="r", shape=(count,) + shape)
+
+        vectors = mapped(f"vectors.{suffix}", _DTYPES[suffix], search_dimension)
+        tail = None
+        if stored_dimension > search_dimension:
+            tail = mapped(f"tail.{suffix}", _DTYPES[suffix], stored_dimension - search_dimension)
+        norms = mapped("norms.f32", "<f4")
+        id_table = np.fromfile(os.path.join(path, "ids.bin"), dtype=f"S{manifest['id_width']}")
+        ids: List[str] = [raw.decode("utf-8") for raw in id_table.tolist()]
+        offsets = np.memmap(
+            os.path.join(path, "meta_offsets.u64"), dtype="<u8", mode="r", shape=(count + 1,)
+        )
+        if offsets[-1] > 0:
+            blob = np.memmap(os.path.join(path, "meta.bin"), dtype=np.uint8, mode="r")
+        else:
+            blob = np.zeros(0, dtype=np.uint8)
+
+        store = LocalVectorStore.from_arrays(
+            vectors,
+            norms,
+            ids,
+            _SnapshotMetadata(blob, offsets),
+            namespace=manifest.get("namespace", "default"),
+            tail=tail,
+            scales=mapped("scales.f32", "<f4"),
+            search_norms=mapped("search_norms.f32", "<f4"),
+            dimension=dimension,
+            **layout
+        )
+        logger.info(f"Loaded index snapshot with {count} vectors from {path}")
+        return store
+
+    except Exception as e:
+        logger.error(f"Error loading index snapshot from {path}: {e}")
+        return None
+
+
+def load_latest_snapshot(
+    root: str,
+    expected_dimension: Optional[int] = None,
+    **layout
+) -> Optional[LocalVectorStore]:
+    """
+    Convenience function to load the current snapshot under `root`.
+
+    Args:
+        root (str): Snapshot root directory
+        expected_dimension (int): Reject snapshots with a different dimension
+        **layout: LocalVectorStore layout options (defaults from settings)
+
+    Returns:
+        Optional[LocalVectorStore]: Loaded store, or None if there is no usable snapshot
+    """
+    path = latest_snapshot_path(root)
+    if not path:
+        return None
+    return load_snapshot(path, expected_dimension=expected_dimension, **layout)
@@ -0,0 +1,252 @@
+"""
+Background ingestion job module.
+Runs scrape -> embed -> upsert outside the HTTP request, tracks per-stage
+progress (throughput and ETA), supports cancellation and guarantees that
+only one ingest runs at a time.
+"""
+
+from typing import Callable, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class IngestError(Exception):
+    """Raised by an ingest run with a user-facing failure message."""
+
+
+class JobCancelled(Exception):
+    """Raised inside an ingest run once cancellation has been requested."""
+
+
+class IngestJob:
+    """State and progress of one ingestion run."""
+
+    STAGES = ("scrape", "embed", "upsert")
+
+    def __init__(self, job_id: Optional[str] = None):
+        """
+        Initialize job.
+
+        Args:
+            job_id (str): Job identifier (random if omitted)
+        """
+        self.id = job_id or uuid.uuid4().hex
+        self.status = "pending"
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        # Counters of the running ingest; kept when it fails or is cancelled
+        self.stats: Dict[str, Any] = {}
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Any]] = {
+            stage: {"done": 0, "total": None, "started": None, "finished": None}
+            for stage in self.STAGES
+        }
+
+    # ----- progress reporting (called from the ingest run) -----
+
+    def set_total(self, stage: str, total: int):
+        """Declare how many units a stage will process."""
+        with self._lock:
+            info = self._stages[stage]
+            info["total"] = total
+            if info["started"] is None:
+                info["started"] = time.monotonic()
+
+    def add_total(self, stage: str, amount: int):
+        """Grow a stage's total as streamed work is discovered."""
+        with self._lock:
+            info = self._stages[stage]
+            info["total"] = (info["total"] or 0) + amount
+            if info["started"] is None:
+                info["started"] = time.monotonic()
+
+    def advance(self, stage: str, amount: int = 1):
+        """Record progress on a stage (safe to call from worker threads)."""
+        with self._lock:
+            info = self._stages[stage]
+            if info["started"] is None:
+                info["started"] = time.monotonic()
+            info["done"] += amount
+
+    def finish_stage(self, stage: str):
+        """Mark a stage as complete."""
+        with self._lock:
+            info = self._stages[stage]
+            if info["started"] is None:
+                info["started"] = time.monotonic()
+            info["finished"] = time.monotonic()
+            if info["total"] is None:
+                info["total"] = info["done"]
+
+    def cancel(self):
+        """Request cancellation; the run stops at its next progress check."""
+        self._cancel_event.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested."""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("pending", "running")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Snapshot of job state for the progress endpoint.
+
+        Returns:
+            Dict: status, timings, per-stage done/total/throughput/ETA and
+                the ingest counters so far
+        """
+        now = time.monotonic()
+        with self._lock:
+            stages = {}
+            eta_total = 0.0
+            eta_known = False
+            for stage, info in self._stages.items():
+                started, finished = info["started"], info["finished"]
+                elapsed = ((finished or now) - started) if started is not None else 0.0
+                throughput = info["done"] / elapsed if elapsed > 0 else 0.0
+                eta = None
+                if info["total"] is not None and finished is None and started is not None:
+                    remaining = max(0, info["total"] - info["done"])
+                    eta = remaining / throughput if throughput > 0 else None
+                    if eta is not None:
+                        eta_total += eta
+                        eta_known = True
+                stages[stage] = {
+                    "done": info["done"],
+                    "total": info["total"],
+                    "elapsed_seconds": round(elapsed, 3),
+                    "throughput_per_second": round(throughput, 3),
+                    "eta_seconds": round(eta, 1) if eta is not None else None,
+                    "complete": finished is not None
+                }
+
+        elapsed_total = None
+        if self.started_at is not None:
+            elapsed_total = round((self.finished_at or now) - self.started_at, 3)
+
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "elapsed_seconds": elapsed_total,
+            "eta_seconds": round(eta_total, 1) if eta_known and self.is_active else None,
+            "cancel_requested": self.cancel_requested,
+            "stages": stages,
+            "ingest": dict(self.stats),
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class IngestJobManager:
+    """Starts ingest jobs one at a time and keeps a short history."""
+
+    def __init__(self, max_history: int = 20):
+        """
+        Initialize job manager.
+
+        Args:
+            max_history (int): Finished jobs kept for status lookups
+        """
+        self.max_history = max_history
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._current: Optional[IngestJob] = None
+        self._lock = threading.Lock()
+
+    def start(
+        self,
+        target: Callable[[IngestJob], Dict[str, Any]],
+        background: bool = True
+    ) -> Tuple[IngestJob, bool]:
+        """
+        Start an ingest run unless one is already active.
+
+        Args:
+            target (Callable): Function performing the ingest; receives the job
+                for progress reporting and returns the result dict
+            background (bool): Run in a daemon thread (False runs inline)
+
+        Returns:
+            Tuple[IngestJob, bool]: (job, started) - the active job and False
+                if another ingest was already running
+        """
+        with self._lock:
+            if self._current is not None and self._current.is_active:
+                return self._current, False
+            job = IngestJob()
+            self._current = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+
+        if background:
+            thread = threading.Thread(
+                target=self._run, args=(job, target), name=f"ingest-{job.id[:8]}", daemon=True
+            )
+            thread.start()
+        else:
+            self._run(job, target)
+        return job, True
+
+    def _run(self, job: IngestJob, target: Callable[[IngestJob], Dict[str, Any]]):
+        job.status = "running"
+        job.started_at = time.monotonic()
+        logger.info(f"Ingest job {job.id} started")
+        try:
+            job.check_cancelled()
+            job.result = target(job)
+            job.status = "succeeded"
+        except JobCancelled:
+            job.status = "cancelled"
+            logger.info(f"Ingest job {job.id} cancelled")
+        except IngestError as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Ingest job {job.id} failed: {e}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.exception(f"Ingest job {job.id} crashed")
+        finally:
+            job.finished_at = time.monotonic()
+            logger.info(f"Ingest job {job.id} finished with status {job.status}")
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """Look up a job by ID."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def current(self) -> Optional[IngestJob]:
+        """Most recently started job."""
+        return self._current
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Request cancellation of an active job.
+
+        Returns:
+            bool: True if the job exists and was still active
+        """
+        job = self.get(job_id)
+        if job is None or not job.is_active:
+            return False
+        job.cancel()
+        return True
@@ -0,0 +1,471 @@
+"""
+Incremental ingestion module.
+Keeps a manifest of URL -> content hash -> vector IDs so that a rebuild only
+re-embeds and re-upserts chunks that changed, and only deletes chunks that
+disappeared. The live index is never cleared. The first time a page is
+ingested its page-level vector from before chunk-level indexing is deleted,
+so an existing index migrates without a rebuild.
+
+Pages stream through three concurrent stages connected by bounded queues
+(plan -> embed -> upsert) and are dropped once upserted, so peak memory
+depends on the queue size rather than on the number of pages scraped.
+"""
+
+from typing import Iterable, List, Dict, Any, Optional
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+
+from src.modules.gemini_embedder import GeminiEmbedder, is_fallback_embedding
+from src.modules.pinecone_store import chunk_vector_id, chunk_metadata, document_vector_id
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(*parts: str) -> str:
+    """sha256 hex digest of the given strings (NUL-separated)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """Tracks which vectors were produced from which page content."""
+
+    # Version 1 manifests predate the cleanup of page-level vectors
+    VERSION = 2
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Load (or start) an ingest manifest.
+
+        Args:
+            path (str): JSON file the manifest is persisted to (None keeps it in memory)
+        """
+        self.path = path
+        # url -> {"content_hash": str, "chunks": {vector_id: chunk_hash}}
+        self.pages: Dict[str, Dict[str, Any]] = {}
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == self.VERSION:
+                    self.pages = data.get("pages", {})
+                elif data.get("version") == 1:
+                    self.pages = data.get("pages", {})
+                    self._track_legacy_vectors()
+                else:
+                    logger.warning("Ignoring ingest manifest with unsupported version")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Unable to read ingest manifest, starting fresh: {e}")
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def vector_count(self) -> int:
+        """Number of vectors the manifest believes are in the index."""
+        return sum(len(page.get("chunks", {})) for page in self.pages.values())
+
+    def reset(self):
+        """Forget every page (e.g. after the index was cleared)."""
+        self.pages = {}
+
+    def _track_legacy_vectors(self):
+        """
+        Add each page's page-level vector ID (from before chunk-level
+        indexing) as a stale chunk and force a re-plan, so the next ingest
+        deletes it without re-embedding unchanged chunks.
+        """
+        for url, page in self.pages.items():
+            page.setdefault("chunks", {}).setdefault(document_vector_id({"url": url}, 0), "")
+            page["content_hash"] = ""
+
+    def invalidate(self):
+        """
+        Force every page to be re-embedded on the next ingest (a rebuild).
+
+        Vector IDs are kept, so chunks that are not rewritten are still
+        deleted as stale (and pruned pages are still removed).
+        """
+        for page in self.pages.values():
+            page["content_hash"] = ""
+            page["chunks"] = {vector_id: "" for vector_id in page.get("chunks", {})}
+
+    def save(self):
+        """Persist the manifest atomically."""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "pages": self.pages}, f)
+        os.replace(tmp_path, self.path)
+
+    def plan_page(
+        self,
+        doc: Dict[str, Any],
+        chunk_size: int = 1000,
+        overlap: int = 100
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Diff a freshly scraped page against the manifest.
+
+        Args:
+            doc (Dict): Scraped document with 'url', 'title' and 'content'
+            chunk_size (int): Chunk size used by the embedder
+            overlap (int): Chunk overlap used by the embedder
+
+        Returns:
+            Optional[Dict]: None if the page is unchanged, otherwise a plan with
+                'url', 'content_hash', 'chunk_hashes' (vector_id -> hash),
+                'changed' (list of (vector_id, text, metadata)) and 'stale_ids'
+        """
+        url = (doc.get("url") or "").strip()
+        content = doc.get("content", "")
+        if not url or not content:
+            return None
+
+        page_hash = content_hash(doc.get("title", ""), content)
+        previous = self.pages.get(url)
+        if previous and previous.get("content_hash") == page_hash:
+            return None
+
+        chunks = GeminiEmbedder._chunk_text(content, chunk_size=chunk_size, overlap=overlap)
+        offsets = GeminiEmbedder._chunk_offsets(len(chunks), chunk_size=chunk_size, overlap=overlap)
+        if previous is None:
+            # First chunk-level ingest of this page: its page-level vector from
+            # before chunk-level indexing (if any) is deleted as stale
+            old_chunks = {document_vector_id(doc, 0): ""}
+        else:
+            old_chunks = previous.get("chunks", {})
+
+        chunk_hashes: Dict[str, str] = {}
+        changed = []
+        for n, (chunk, offset) in enumerate(zip(chunks, offsets)):
+            vector_id = chunk_vector_id(url, n)
+            metadata = chunk_metadata(doc, url, n, chunk, offset)
+            chunk_hash = content_hash(json.dumps(metadata, sort_keys=True))
+            chunk_hashes[vector_id] = chunk_hash
+            if old_chunks.get(vector_id) != chunk_hash:
+                changed.append((vector_id, chunk, metadata))
+
+        stale_ids = [vector_id for vector_id in old_chunks if vector_id not in chunk_hashes]
+        return {
+            "url": url,
+            "content_hash": page_hash,
+            "chunk_hashes": chunk_hashes,
+            "changed": changed,
+            "stale_ids": stale_ids
+        }
+
+    def commit_page(self, plan: Dict[str, Any]):
+        """Record a plan whose vectors were upserted (and stale ones deleted)."""
+        self.pages[plan["url"]] = {
+            "content_hash": plan["content_hash"],
+            "chunks": plan["chunk_hashes"]
+        }
+
+    def remove_page(self, url: str) -> List[str]:
+        """Forget a page and return its vector IDs."""
+        page = self.pages.pop(url, None) or {}
+        return list(page.get("chunks", {}))
+
+
+def index_vector_count(vector_store) -> Optional[int]:
+    """Best-effort total vector count from get_index_stats (None if unknown)."""
+    try:
+        stats = vector_store.get_index_stats() or {}
+    except Exception:
+        return None
+    count = stats.get("total_vector_count", stats.get("totalVectorCount"))
+    if count is None:
+        return None
+    try:
+        return int(count)
+    except (TypeError, ValueError):
+        return None
+
+
+# Marks the end of a stage's output
+_END = object()
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    """Blocking get that returns _END once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def stream_ingest(
+    pages: Iterable[Dict[str, Any]],
+    embedder,
+    vector_store,
+    manifest: IngestManifest,
+    prune_missing: bool = False,
+    job=None,
+    queue_size: int = 8,
+    batch_texts: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Plan, embed and upsert pages as they arrive from `pages`.
+
+    The plan stage (which also drives the page iterator, e.g. a streaming
+    scraper) and the embed stage run on their own threads; upserts happen on
+    the calling thread. At most `queue_size` pages wait between two stages.
+    Chunks of consecutive pages are embedded together until a batch holds
+    `batch_texts` texts, so API batches stay full without waiting for the
+    whole crawl.
+
+    New and changed chunks are upserted before stale chunks are deleted, so
+    the index always holds a complete copy of every page.
+
+    Args:
+        pages (Iterable[Dict]): Scraped documents (a list or a generator)
+        embedder: GeminiEmbedder instance
+        vector_store: Vector store (Pinecone or local)
+        manifest (IngestManifest): Manifest from the previous ingest
+        prune_missing (bool): Also delete pages that were not scraped this time
+        job (IngestJob): Optional job for progress reporting and cancellation;
+            job.stats holds the counters, including after a failure
+        queue_size (int): Max pages buffered between two stages
+        batch_texts (int): Texts per embed call (defaults to one full API
+            batch per concurrent request)
+
+    Returns:
+        Dict: Counters for pages and chunks processed
+    """
+    stats = {
+        "pages_seen": 0,
+        "pages_unchanged": 0,
+        "pages_changed": 0,
+        "pages_removed": 0,
+        "chunks_embedded": 0,
+        "chunks_fallback": 0,
+        "vectors_upserted": 0,
+        "vectors_deleted": 0,
+        "failed_pages": 0
+    }
+    if job:
+        # Live view of the counters, still available if the run raises
+        job.stats = stats
+    if batch_texts is None:
+        batch_texts = embedder.BATCH_LIMIT * embedder.max_concurrency
+
+    # A manifest is only trustworthy if the index still holds its vectors
+    if len(manifest) and index_vector_count(vector_store) == 0:
+        logger.warning("Index is empty but manifest is not; re-ingesting every page")
+        manifest.reset()
+
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    plan_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    embed_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    seen_urls = set()
+
+    def plan_stage():
+        try:
+            for doc in pages:
+                if stop.is_set():
+                    break
+                if job:
+                    job.check_cancelled()
+                url = (doc.get("url") or "").strip()
+                if not url or url in seen_urls or not doc.get("content"):
+                    continue
+                seen_urls.add(url)
+                stats["pages_seen"] += 1
+                plan = manifest.plan_page(
+                    doc,
+                    chunk_size=embedder.CHUNK_SIZE,
+                    overlap=embedder.CHUNK_OVERLAP
+                )
+                if plan is None:
+                    stats["pages_unchanged"] += 1
+                    continue
+                if job:
+                    job.add_total("embed", len(plan["changed"]))
+                    job.add_total("upsert", len(plan["changed"]))
+                if not _put(plan_queue, plan, stop):
+                    break
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(plan_queue, _END, stop)
+
+    def embed_stage():
+        try:
+            finished = False
+            while not finished:
+                plan = _get(plan_queue, stop)
+                if plan is _END:
+                    break
+                # Top up the batch with pages that are already waiting
+                group = [plan]
+                count = len(plan["changed"])
+                while count < batch_texts:
+                    try:
+                        more = plan_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if more is _END:
+                        finished = True
+                        break
+                    group.append(more)
+                    count += len(more["changed"])
+
+                texts = [text for p in group for _, text, _ in p["changed"]]
+                on_progress = (lambda n: job.advance("embed", n)) if job else None
+                embeddings = embedder.embed_texts(texts, on_progress=on_progress) if texts else []
+                stats["chunks_embedded"] += len(texts)
+
+                offset = 0
+                for p in group:
+                    count = len(p["changed"])
+                    if not _put(embed_queue, (p, embeddings[offset:offset + count]), stop):
+                        return
+                    offset += count
+                if job:
+                    job.check_cancelled()
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(embed_queue, _END, stop)
+
+    workers = [
+        threading.Thread(target=plan_stage, name="ingest-plan", daemon=True),
+        threading.Thread(target=embed_stage, name="ingest-embed", daemon=True)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        while True:
+            item = _get(embed_queue, stop)
+            if item is _END:
+                break
+            if job:
+                job.check_cancelled()
+            plan, embeddings = item
+            vectors = [
+                (vector_id, embedding, metadata)
+                for (vector_id, _, metadata), embedding in zip(plan["changed"], embeddings)
+            ]
+
+            if vectors and not vector_store.upsert_embeddings(vectors):
+                logger.error(f"Upsert failed for {plan['url']}; keeping previous vectors")
+                stats["failed_pages"] += 1
+                continue
+            stats["vectors_upserted"] += len(vectors)
+            if job:
+                job.advance("upsert", len(vectors))
+
+            # Hash-fallback vectors (embedding outage) stay searchable but are
+            # not recorded as current, so the next ingest re-embeds them
+            fallback_ids = [vector_id for vector_id, embedding, _ in vectors if is_fallback_embedding(embedding)]
+            if fallback_ids:
+                stats["chunks_fallback"] += len(fallback_ids)
+                for vector_id in fallback_ids:
+                    plan["chunk_hashes"][vector_id] = ""
+                plan["content_hash"] = ""
+
+            if plan["stale_ids"]:
+                if vector_store.delete_vectors(plan["stale_ids"]):
+                    stats["vectors_deleted"] += len(plan["stale_ids"])
+                else:
+                    # Keep them in the manifest and force a re-plan so the next
+                    # ingest retries the delete
+                    for vector_id in plan["stale_ids"]:
+                        plan["chunk_hashes"][vector_id] = ""
+                    plan["content_hash"] = ""
+
+            manifest.commit_page(plan)
+            stats["pages_changed"] += 1
+
+        if errors:
+            raise errors[0]
+
+        if job:
+            job.finish_stage("embed")
+
+        if prune_missing:
+            for url in [u for u in manifest.pages if u not in seen_urls]:
+                stale_ids = list(manifest.pages[url].get("chunks", {}))
+                if stale_ids and not vector_store.delete_vectors(stale_ids):
+                    continue
+                manifest.remove_page(url)
+                stats["vectors_deleted"] += len(stale_ids)
+                stats["pages_removed"] += 1
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+        # Persist progress even if the run is cancelled part-way
+        manifest.save()
+
+    if job:
+        job.finish_stage("upsert")
+    logger.info(
+        f"Incremental ingest: {stats['pages_changed']} changed, "
+        f"{stats['pages_unchanged']} unchanged, {stats['vectors_upserted']} upserted, "
+        f"{stats['vectors_deleted']} deleted"
+    )
+    return stats
+
+
+def incremental_ingest(
+    documents: List[Dict[str, Any]],
+    embedder,
+    vector_store,
+    manifest: IngestManifest,
+    prune_missing: bool = False,
+    job=None
+) -> Dict[str, Any]:
+    """
+    Embed and upsert only the chunks that changed since the last ingest.
+
+    Convenience wrapper around stream_ingest for an already scraped list.
+
+    Args:
+        documents (List[Dict]): Freshly scraped documents
+        embedder: GeminiEmbedder instance
+        vector_store: Vector store (Pinecone or local)
+        manifest (IngestManifest): Manifest from the previous ingest
+        prune_missing (bool): Also delete pages that were not scraped this time
+        job (IngestJob): Optional job for progress reporting and cancellation
+
+    Returns:
+        Dict: Counters for pages and chunks processed
+    """
+    return stream_ingest(
+        documents,
+        embedder,
+        vector_store,
+        manifest,
+        prune_missing=prune_missing,
+        job=job
+    )
@@ -0,0 +1,399 @@
+"""
+Lexical (BM25) index module.
+In-memory inverted index over chunk text, built as vectors are upserted.
+Matches product names, SKUs and spec numbers ("OLED", "256GB") that
+embeddings blur, and keeps retrieval useful when only hash fallback
+embeddings are available. Results are fused with vector results by
+reciprocal-rank fusion (see rrf_fuse).
+"""
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+
+_WORD = re.compile(r"[a-z0-9]+")
+_ALNUM_PARTS = re.compile(r"[a-z]+|[0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it its my "
+    "of on or so than that the their there these this to was what when where which "
+    "who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into index terms.
+
+    Lowercased alphanumeric words minus stopwords. Mixed tokens are also
+    split into their letter and digit parts ("256gb" -> 256gb, 256, gb), so
+    "256GB" and "256 GB" match; plural "s" is dropped from longer words.
+    """
+    terms = []
+    for word in _WORD.findall((text or "").lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss") and word.isalpha():
+            word = word[:-1]
+        terms.append(word)
+        if not word.isalpha() and not word.isdigit():
+            terms.extend(_ALNUM_PARTS.findall(word))
+    return terms
+
+
+def document_text(metadata: Dict[str, Any]) -> str:
+    """Text indexed for a vector: its page title plus its chunk content."""
+    return f"{metadata.get('title') or ''}\n{metadata.get('content') or ''}"
+
+
+class LexicalIndex:
+    """BM25-scored inverted index keyed by vector ID."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize lexical index.
+
+        Args:
+            k1 (float): BM25 term-frequency saturation
+            b (float): BM25 document-length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        # Documents are numbered in insertion order; removed ones become None
+        self._ids: List[Optional[str]] = []
+        self._metadata: List[Optional[Dict[str, Any]]] = []
+        self._lengths = array("I")
+        self._positions: Dict[str, int] = {}
+        # term -> parallel arrays of document numbers and term frequencies
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_terms: List[Tuple[str, ...]] = []
+        self._doc_freq: Dict[str, int] = {}
+        self._total_length = 0
+        self._removed = 0
+        self._norms: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def add(self, doc_id: str, metadata: Dict[str, Any]):
+        """
+        Index (or re-index) one vector's text.
+
+        Args:
+            doc_id (str): Vector ID
+            metadata (Dict): Vector metadata ('title' and 'content' are indexed)
+        """
+        counts: Dict[str, int] = {}
+        terms = tokenize(document_text(metadata))
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+
+        with self._lock:
+            self._remove_locked(doc_id)
+            pos = len(self._ids)
+            self._ids.append(doc_id)
+            self._metadata.append(dict(metadata))
+            self._lengths.append(len(terms))
+            self._doc_terms.append(tuple(counts))
+            self._positions[doc_id] = pos
+            self._total_length += len(terms)
+            self._norms = None
+            for term, tf in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("I"), array("I"))
+                postings[0].append(pos)
+                postings[1].append(tf)
+                self._doc_freq[term] = self._doc_freq.get(term, 0) + 1
+
+    def add_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]):
+        """Index (id, metadata) pairs."""
+        for doc_id, metadata in items:
+            self.add(doc_id, metadata)
+
+    def _remove_locked(self, doc_id: str) -> bool:
+        pos = self._positions.pop(doc_id, None)
+        if pos is None:
+            return False
+        for term in self._doc_terms[pos]:
+            self._doc_freq[term] -= 1
+            if not self._doc_freq[term]:
+                del self._doc_freq[term]
+        self._total_length -= self._lengths[pos]
+        self._norms = None
+        self._ids[pos] = None
+        self._metadata[pos] = None
+        self._doc_terms[pos] = ()
+        self._removed += 1
+        return True
+
+    def remove(self, doc_ids: Sequence[str]):
+        """Drop vectors from the index (postings are compacted lazily)."""
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove_locked(doc_id)
+            if self._removed > max(64, len(self._ids) // 4):
+                self._compact_locked()
+
+    def clear(self):
+        """Remove every document."""
+        with self._lock:
+            self._reset()
+
+    def _compact_locked(self):
+        """Renumber live documents and rebuild postings without removed ones."""
+        live = [pos for pos, doc_id in enumerate(self._ids) if doc_id is not None]
+        renumber = {old: new for new, old in enumerate(live)}
+        postings: Dict[str, Tuple[array, array]] = {}
+        for term, (docs, freqs) in self._postings.items():
+            new_docs, new_freqs = array("I"), array("I")
+            for pos, tf in zip(docs, freqs):
+                new_pos = renumber.get(pos)
+                if new_pos is not None:
+                    new_docs.append(new_pos)
+                    new_freqs.append(tf)
+            if new_docs:
+                postings[term] = (new_docs, new_freqs)
+        self._postings = postings
+        self._ids = [self._ids[pos] for pos in live]
+        self._metadata = [self._metadata[pos] for pos in live]
+        self._lengths = array("I", (self._lengths[pos] for pos in live))
+        self._doc_terms = [self._doc_terms[pos] for pos in live]
+        self._positions = {doc_id: pos for pos, doc_id in enumerate(self._ids)}
+        self._removed = 0
+        self._norms = None
+
+    def _norms_locked(self) -> np.ndarray:
+        """Per-document BM25 length normalization, recomputed after changes."""
+        if self._norms is None or len(self._norms) != len(self._lengths):
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+            avg_length = (self._total_length / len(self._positions)) or 1.0
+            self._norms = self.k1 * (1.0 - self.b + self.b * lengths / avg_length)
+        return self._norms
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Rank documents against a query with BM25.
+
+        Args:
+            query (str): Query text
+            top_k (int): Number of results to return
+
+        Returns:
+            List[Dict]: Matches shaped like vector_store.query_similar results
+                ({"id", "score", "metadata"}), best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._positions)
+            if not terms or not count or top_k <= 0:
+                return []
+            norms = self._norms_locked()
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            for term in terms:
+                postings = self._postings.get(term)
+                df = self._doc_freq.get(term)
+                if not postings or not df:
+                    continue
+                idf = math.log(1.0 + (count - df + 0.5) / (df + 0.5))
+                docs = np.frombuffer(postings[0], dtype=np.uint32)
+                tf = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+                scores[docs] += idf * (self.k1 + 1.0) * tf / (tf + norms[docs])
+
+            # Removed documents may still have postings until the next compaction
+            candidates = min(len(scores), top_k + self._removed)
+            best = np.argpartition(-scores, candidates - 1)[:candidates]
+            results = []
+            for pos in best[np.argsort(-scores[best], kind="stable")]:
+                if scores[pos] <= 0 or len(results) == top_k:
+                    break
+                if self._ids[pos] is None:
+                    continue
+                results.append({
+                    "id": self._ids[pos],
+                    "score": float(scores[pos]),
+                    "metadata": dict(self._metadata[pos])
+                })
+            return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Document, term and posting counts."""
+        with self._lock:
+            return {
+                "documents": len(self._positions),
+                "terms": len(self._doc_freq),
+                "postings": sum(len(docs) for docs, _ in self._postings.values()),
+                "avg_document_terms": (self._total_length / len(self._positions)) if self._positions else 0.0
+            }
+
+    def save(self, path: str):
+        """
+        Write the index to `path` (atomically replaced).
+
+        Args:
+            path (str): Output file
+        """
+        with self._lock:
+            self._compact_locked()
+            payload = {
+                "version": INDEX_FORMAT_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "ids": self._ids,
+                "metadata": self._metadata,
+                "lengths": self._lengths.tolist(),
+                "postings": {
+                    term: [docs.tolist(), freqs.tolist()]
+                    for term, (docs, freqs) in self._postings.items()
+                }
+            }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LexicalIndex"]:
+        """
+        Read an index written by save().
+
+        Args:
+            path (str): Index file
+
+        Returns:
+            Optional[LexicalIndex]: Loaded index, or None if missing or unusable
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unable to read lexical index {path}: {e}")
+            return None
+        if payload.get("version") != INDEX_FORMAT_VERSION:
+            logger.warning(f"Unsupported lexical index version in {path}: {payload.get('version')}")
+            return None
+
+        index = cls(k1=payload["k1"], b=payload["b"])
+        index._ids = payload["ids"]
+        index._metadata = payload["metadata"]
+        index._lengths = array("I", payload["lengths"])
+        index._positions = {doc_id: pos for pos, doc_id in enumerate(index._ids)}
+        index._total_length = sum(index._lengths)
+        doc_terms: List[List[str]] = [[] for _ in index._ids]
+        for term, (docs, freqs) in payload["postings"].items():
+            index._postings[term] = (array("I", docs), array("I", freqs))
+            index._doc_freq[term] = len(docs)
+            for pos in docs:
+                doc_terms[pos].append(term)
+        index._doc_terms = [tuple(terms) for terms in doc_terms]
+        logger.info(f"Loaded lexical index with {len(index)} documents from {path}")
+        return index
+
+
+class LexicalIndexedStore:
+    """
+    Vector store wrapper that mirrors upserts and deletions into a
+    LexicalIndex, so the lexical index is built by the same ingest code.
+    Everything else is delegated to the wrapped store.
+    """
+
+    def __init__(self, store, lexical: LexicalIndex):
+        """
+        Args:
+            store: Vector store (Pinecone or local)
+            lexical (LexicalIndex): Index kept in sync with the store
+        """
+        self.store = store
+        self.lexical = lexical
+
+    def upsert_embeddings(
+        self,
+        vectors: List[Tuple[str, List[float], Dict[str, Any]]],
+        batch_size: int = 100
+    ) -> bool:
+        """Upsert into the wrapped store, then index the metadata text of the upserted vectors."""
+        success = self.store.upsert_embeddings(vectors, batch_size=batch_size)
+        if success:
+            self.lexical.add_many((vector_id, metadata or {}) for vector_id, _, metadata in vectors)
+        return success
+
+    def delete_vectors(self, ids: List[str]) -> bool:
+        """Delete from the wrapped store, then drop the IDs from the lexical index."""
+        success = self.store.delete_vectors(ids)
+        if success:
+            self.lexical.remove(ids)
+        return success
+
+    def clear_namespace(self) -> bool:
+        """Clear the wrapped store's namespace and the lexical index."""
+        success = self.store.clear_namespace()
+        if success:
+            self.lexical.clear()
+        return success
+
+    def get_index_stats(self) -> Dict[str, Any]:
+        """Wrapped store's stats plus the lexical index stats under "lexical"."""
+        stats = dict(self.store.get_index_stats())
+        stats["lexical"] = self.lexical.stats()
+        return stats
+
+    def __getattr__(self, name: str):
+        return getattr(self.store, name)
+
+
+def rrf_fuse(
+    result_lists: Dict[str, List[Dict[str, Any]]],
+    k: int = 60,
+    top_k: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists with reciprocal-rank fusion.
+
+    Each document scores sum(1 / (k + rank)) over the lists it appears in,
+    so agreement between retrievers wins without calibrating their scores.
+    Metadata comes from the first list a document appears in.
+
+    Args:
+        result_lists (Dict[str, List[Dict]]): Retriever name -> ranked
+            {"id", "score", "metadata"} results
+        k (int): Rank offset; larger values flatten the rank weighting
+        top_k (int): Number of fused results to return (all if None)
+
+    Returns:
+        List[Dict]: Fused results with the RRF score as "score" and each
+            retriever's own score as "<name>_score"
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for name, results in result_lists.items():
+        for rank, match in enumerate(results, start=1):
+            entry = fused.get(match["id"])
+            if entry is None:
+                entry = fused[match["id"]] = {
+                    "id": match["id"],
+                    "score": 0.0,
+                    "metadata": match.get("metadata", {})
+                }
+            entry["score"] += 1.0 / (k + rank)
+            entry[f"{name}_score"] = match.get("score", 0.0)
+
+    ranked = sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+    return ranked[:top_k] if top_k is not None else ranked
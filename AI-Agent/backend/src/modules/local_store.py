@@ -0,0 +1,512 @@
+"""
+In-process vector store module.
+Drop-in replacement for PineconeVectorStore that keeps every vector in a
+contiguous NumPy matrix and answers queries with a single matmul.
+
+Vectors can be stored compactly:
+    truncation    keep only the leading dimensions of each embedding
+                  (Matryoshka-style; Gemini embeddings are trained for it),
+                  renormalized to unit length
+    int8          scalar-quantize each vector with its own scale, a quarter
+                  of the float32 size
+    search prefix find candidates on the leading search_dimension columns
+                  only (stored as their own contiguous block), then rescore
+                  the best top_k x rescore_multiplier in float32 on the
+                  whole stored vector
+"""
+
+from typing import List, Dict, Any, Optional, Tuple, Sequence
+import logging
+import threading
+
+import numpy as np
+
+from src.config.settings import (
+    EMBEDDING_DIMENSION,
+    LOCAL_INDEX_DIMENSION,
+    LOCAL_INDEX_QUANTIZATION,
+    LOCAL_INDEX_RESCORE_MULTIPLIER,
+    LOCAL_INDEX_SEARCH_DIMENSION
+)
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = ("none", "int8")
+
+# Rows of an int8 block converted to float32 at a time while scanning (fits in cache)
+SCAN_BLOCK_ROWS = 4096
+
+
+class LocalVectorStore:
+    """Manages vector storage and brute-force cosine retrieval in memory."""
+
+    def __init__(
+        self,
+        dimension: int = EMBEDDING_DIMENSION,
+        namespace: str = "default",
+        index_name: str = "local",
+        truncate_dimension: int = LOCAL_INDEX_DIMENSION,
+        quantization: str = LOCAL_INDEX_QUANTIZATION,
+        search_dimension: int = LOCAL_INDEX_SEARCH_DIMENSION,
+        rescore_multiplier: int = LOCAL_INDEX_RESCORE_MULTIPLIER
+    ):
+        """
+        Initialize local vector store.
+
+        Args:
+            dimension (int): Embedding dimension (of upserted vectors and queries)
+            namespace (str): Namespace label reported in stats
+            index_name (str): Index label reported in stats
+            truncate_dimension (int): Leading dimensions kept per vector
+                (0 or >= dimension keeps them all)
+            quantization (str): "none" (float32) or "int8"
+            search_dimension (int): Leading dimensions scanned for candidates
+                (0 or >= the stored dimension scores every vector in full)
+            rescore_multiplier (int): Candidates rescored per requested result
+                when searching on a prefix
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization!r} (expected one of {QUANTIZATIONS})")
+
+        self.dimension = dimension
+        self.namespace = namespace
+        self.index_name = index_name
+        self.stored_dimension = min(truncate_dimension or dimension, dimension)
+        self.quantization = quantization
+        self.search_dimension = min(search_dimension or self.stored_dimension, self.stored_dimension)
+        self.rescore_multiplier = max(1, rescore_multiplier)
+
+        self._lock = threading.RLock()
+        self._reset_arrays()
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+
+    @property
+    def _dtype(self):
+        return np.int8 if self.quantization == "int8" else np.float32
+
+    @property
+    def _two_stage(self) -> bool:
+        return self.search_dimension < self.stored_dimension
+
+    def _reset_arrays(self, capacity: int = 0):
+        # Leading search_dimension columns, then the rest of each stored vector
+        self._vectors = np.zeros((capacity, self.search_dimension), dtype=self._dtype)
+        self._tail = np.zeros((capacity, self.stored_dimension - self.search_dimension), dtype=self._dtype)
+        self._norms = np.zeros(capacity, dtype=np.float32)
+        self._scales = np.ones(capacity, dtype=np.float32) if self.quantization == "int8" else None
+        self._search_norms = np.zeros(capacity, dtype=np.float32) if self._two_stage else None
+
+    def _arrays(self) -> Dict[str, Optional[np.ndarray]]:
+        return {
+            "vectors": self._vectors,
+            "tail": self._tail,
+            "norms": self._norms,
+            "scales": self._scales,
+            "search_norms": self._search_norms
+        }
+
+    def _encode(self, matrix: np.ndarray) -> Dict[str, Optional[np.ndarray]]:
+        """
+        Convert float32 rows (at least stored_dimension wide) to the stored layout.
+
+        Returns:
+            Dict: vectors, tail, norms, scales and search_norms rows
+        """
+        if matrix.shape[1] > self.stored_dimension:
+            # Matryoshka truncation: keep the leading dims, back to unit length
+            matrix = matrix[:, :self.stored_dimension]
+            matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+        scales = None
+        if self.quantization == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+            decoded = codes * scales[:, None]
+        else:
+            codes = decoded = np.asarray(matrix, dtype=np.float32)
+
+        split = self.search_dimension
+        return {
+            "vectors": codes[:, :split],
+            "tail": codes[:, split:],
+            "norms": np.linalg.norm(decoded, axis=1),
+            "scales": scales,
+            "search_norms": np.linalg.norm(decoded[:, :split], axis=1) if self._two_stage else None
+        }
+
+    @staticmethod
+    def _decode(
+        vectors: np.ndarray,
+        tail: Optional[np.ndarray],
+        scales: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """Whole stored rows as float32."""
+        rows = vectors if tail is None or tail.shape[1] == 0 else np.hstack([vectors, tail])
+        rows = rows.astype(np.float32)
+        if scales is not None:
+            rows *= scales[:, None]
+        return rows
+
+    @classmethod
+    def from_arrays(
+        cls,
+        vectors: np.ndarray,
+        norms: np.ndarray,
+        ids: List[str],
+        metadata: Sequence[Dict[str, Any]],
+        namespace: str = "default",
+        index_name: str = "local",
+        tail: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None,
+        search_norms: Optional[np.ndarray] = None,
+        dimension: Optional[int] = None,
+        **layout
+    ) -> "LocalVectorStore":
+        """
+        Build a store around existing arrays without copying them.
+
+        Read-only inputs (e.g. memory-mapped snapshot files) are only copied
+        the first time the store is modified. Arrays in a different layout
+        than the store's (see __init__) are converted, which copies them.
+
+        Args:
+            vectors (np.ndarray): (n, search dims) float32 or int8 matrix
+            norms (np.ndarray): (n,) float32 vector norms
+            ids (List[str]): Vector IDs in row order
+            metadata (Sequence[Dict]): Metadata in row order
+            namespace (str): Namespace label reported in stats
+            index_name (str): Index label reported in stats
+            tail (np.ndarray): (n, remaining dims) rest of each vector, if split
+            scales (np.ndarray): (n,) dequantization scales for int8 vectors
+            search_norms (np.ndarray): (n,) norms of the `vectors` columns, if split
+            dimension (int): Embedding dimension (defaults to the stored width)
+            **layout: truncate_dimension, quantization, search_dimension,
+                rescore_multiplier (defaults from settings)
+
+        Returns:
+            LocalVectorStore: Store backed by the given arrays
+
+        Raises:
+            ValueError: If the arrays hold fewer dimensions than the store keeps
+        """
+        width = vectors.shape[1] + (tail.shape[1] if tail is not None else 0)
+        store = cls(dimension=dimension or width, namespace=namespace, index_name=index_name, **layout)
+        count = len(ids)
+
+        same_layout = (
+            vectors.dtype == store._dtype
+            and width == store.stored_dimension
+            and vectors.shape[1] == store.search_dimension
+            and (scales is not None) == (store.quantization == "int8")
+        )
+        if same_layout:
+            store._vectors = vectors
+            store._tail = tail if tail is not None else np.zeros((count, 0), dtype=store._dtype)
+            store._norms = norms
+            store._scales = scales
+            if store._two_stage and search_norms is None:
+                search_norms = np.linalg.norm(cls._decode(vectors, None, scales), axis=1)
+            store._search_norms = search_norms if store._two_stage else None
+        else:
+            if width < store.stored_dimension:
+                raise ValueError(f"Arrays hold {width} dimensions; the store keeps {store.stored_dimension}")
+            logger.info(
+                f"Converting {count} vectors to {store.quantization}, "
+                f"{store.stored_dimension} dims (search {store.search_dimension})"
+            )
+            store._reset_arrays(count)
+            for start in range(0, count, SCAN_BLOCK_ROWS):
+                end = min(start + SCAN_BLOCK_ROWS, count)
+                block = cls._decode(
+                    vectors[start:end],
+                    tail[start:end] if tail is not None else None,
+                    scales[start:end] if scales is not None else None
+                )
+                store._write_rows(slice(start, end), store._encode(block))
+
+        store._ids = list(ids)
+        store._metadata = metadata
+        store._positions = {vector_id: pos for pos, vector_id in enumerate(store._ids)}
+        return store
+
+    def export_arrays(self) -> Dict[str, Any]:
+        """
+        Copy out the live rows for persistence.
+
+        Returns:
+            Dict: vectors, tail, norms, scales (int8 only), search_norms
+                (prefix search only), ids and metadata for the current
+                contents, plus the layout (dimension, stored_dimension,
+                search_dimension, quantization)
+        """
+        with self._lock:
+            count = len(self._ids)
+            exported = {
+                name: (np.array(array[:count]) if array is not None else None)
+                for name, array in self._arrays().items()
+            }
+            exported.update(
+                ids=list(self._ids),
+                metadata=[self._metadata[pos] for pos in range(count)],
+                dimension=self.dimension,
+                stored_dimension=self.stored_dimension,
+                search_dimension=self.search_dimension,
+                quantization=self.quantization
+            )
+            return exported
+
+    def metadata_items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """(id, metadata) of every stored vector, e.g. to rebuild a lexical index."""
+        with self._lock:
+            return [(vector_id, self._metadata[pos]) for pos, vector_id in enumerate(self._ids)]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _make_writable(self):
+        """Copy read-only (memory-mapped) backing storage before the first write."""
+        for name, array in self._arrays().items():
+            if array is not None and not array.flags.writeable:
+                setattr(self, f"_{name}", np.array(array))
+        if not isinstance(self._metadata, list):
+            self._metadata = list(self._metadata)
+
+    def _ensure_capacity(self, rows: int):
+        """Grow the backing arrays geometrically so appends stay amortized O(1)."""
+        capacity = self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        old = self._arrays()
+        self._reset_arrays(max(rows, capacity * 2, 64))
+        count = len(self._ids)
+        for name, array in self._arrays().items():
+            if array is not None:
+                array[:count] = old[name][:count]
+
+    def _write_rows(self, rows, encoded: Dict[str, Optional[np.ndarray]]):
+        """Store encoded rows at `rows` (positions or a slice)."""
+        for name, array in self._arrays().items():
+            if array is not None:
+                array[rows] = encoded[name]
+
+    def _move_row(self, source: int, target: int):
+        for array in self._arrays().values():
+            if array is not None:
+                array[target] = array[source]
+
+    def upsert_embeddings(
+        self,
+        vectors: List[Tuple[str, List[float], Dict[str, Any]]],
+        batch_size: int = 100
+    ) -> bool:
+        """
+        Store or update embeddings.
+
+        Args:
+            vectors (List[Tuple]): List of (id, embedding, metadata) tuples
+            batch_size (int): Unused; kept for PineconeVectorStore compatibility
+
+        Returns:
+            bool: Success status
+        """
+        if not vectors:
+            return True
+
+        try:
+            matrix = np.asarray([vector[1] for vector in vectors], dtype=np.float32)
+            if matrix.ndim != 2 or matrix.shape[1] != self.dimension:
+                logger.error(
+                    f"Embedding dimension mismatch: expected {self.dimension}, got {matrix.shape[-1]}"
+                )
+                return False
+            encoded = self._encode(matrix)
+
+            with self._lock:
+                self._make_writable()
+                self._ensure_capacity(len(self._ids) + len(vectors))
+                rows = []
+                for vector_id, _, metadata in vectors:
+                    pos = self._positions.get(vector_id)
+                    if pos is None:
+                        pos = len(self._ids)
+                        self._positions[vector_id] = pos
+                        self._ids.append(vector_id)
+                        self._metadata.append(metadata or {})
+                    else:
+                        self._metadata[pos] = metadata or {}
+                    rows.append(pos)
+                # A repeated ID keeps its last vector, as with one-by-one writes
+                self._write_rows(rows, encoded)
+
+            logger.info(f"Upserted {len(vectors)} vectors to local store")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error upserting vectors: {e}")
+            return False
+
+    def _scan(self, count: int, query: np.ndarray) -> np.ndarray:
+        """Dot products of `query` with the leading (search) columns of every row."""
+        vectors = self._vectors
+        if vectors.dtype == np.float32:
+            scores = vectors[:count] @ query
+        else:
+            # int8 @ float32 has no BLAS path: convert cache-sized blocks instead
+            scores = np.empty(count, dtype=np.float32)
+            block = np.empty((min(SCAN_BLOCK_ROWS, count), vectors.shape[1]), dtype=np.float32)
+            for start in range(0, count, SCAN_BLOCK_ROWS):
+                end = min(start + SCAN_BLOCK_ROWS, count)
+                rows = block[:end - start]
+                np.copyto(rows, vectors[start:end])
+                np.dot(rows, query, out=scores[start:end])
+        if self._scales is not None:
+            scores *= self._scales[:count]
+        return scores
+
+    def query_similar(
+        self,
+        embedding: List[float],
+        top_k: int = 5,
+        include_metadata: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the most similar embeddings by cosine similarity.
+
+        Args:
+            embedding (List[float]): Query embedding
+            top_k (int): Number of results to return
+            include_metadata (bool): Include metadata in results
+
+        Returns:
+            List[Dict]: Similar documents with scores
+        """
+        try:
+            query = np.asarray(embedding, dtype=np.float32)
+            if query.shape != (self.dimension,):
+                logger.error(f"Query dimension mismatch: expected {self.dimension}, got {query.shape}")
+                return []
+            query = query[:self.stored_dimension]
+            query_norm = float(np.linalg.norm(query)) or 1.0
+
+            with self._lock:
+                count = len(self._ids)
+                if count == 0 or top_k <= 0:
+                    return []
+                k = min(top_k, count)
+                candidates = min(count, k * self.rescore_multiplier)
+
+                if self._two_stage and candidates < count:
+                    # Candidates from the leading dims, then float32 scores on whole vectors
+                    head = query[:self.search_dimension]
+                    coarse = self._scan(count, head)
+                    coarse /= np.maximum(self._search_norms[:count], 1e-12)
+                    positions = np.argpartition(-coarse, candidates - 1)[:candidates]
+                    rows = self._decode(
+                        self._vectors[positions],
+                        self._tail[positions],
+                        self._scales[positions] if self._scales is not None else None
+                    )
+                    candidate_scores = rows @ query
+                    candidate_scores /= np.maximum(self._norms[positions], 1e-12) * query_norm
+                elif self._two_stage:
+                    positions = np.arange(count)
+                    candidate_scores = self._decode(
+                        self._vectors[:count],
+                        self._tail[:count],
+                        self._scales[:count] if self._scales is not None else None
+                    ) @ query
+                    candidate_scores /= np.maximum(self._norms[:count], 1e-12) * query_norm
+                else:
+                    positions = None
+                    candidate_scores = self._scan(count, query)
+                    candidate_scores /= np.maximum(self._norms[:count], 1e-12) * query_norm
+
+                top = np.argpartition(-candidate_scores, k - 1)[:k]
+                top = top[np.argsort(-candidate_scores[top])]
+
+                matches = [
+                    {
+                        "id": self._ids[pos],
+                        "score": float(candidate_scores[i]),
+                        "metadata": dict(self._metadata[pos]) if include_metadata else {}
+                    }
+                    for i, pos in zip(top, positions[top] if positions is not None else top)
+                ]
+
+            logger.info(f"Retrieved {len(matches)} similar vectors")
+            return matches
+
+        except Exception as e:
+            logger.error(f"Error querying vectors: {e}")
+            return []
+
+    def delete_vectors(self, vector_ids: List[str]) -> bool:
+        """
+        Delete vectors by ID.
+
+        Args:
+            vector_ids (List[str]): IDs of vectors to delete
+
+        Returns:
+            bool: Success status
+        """
+        deleted = 0
+        with self._lock:
+            self._make_writable()
+            for vector_id in vector_ids:
+                pos = self._positions.pop(vector_id, None)
+                if pos is None:
+                    continue
+                # Move the last row into the hole to keep the matrix contiguous
+                last = len(self._ids) - 1
+                if pos != last:
+                    moved_id = self._ids[last]
+                    self._move_row(last, pos)
+                    self._ids[pos] = moved_id
+                    self._metadata[pos] = self._metadata[last]
+                    self._positions[moved_id] = pos
+                self._ids.pop()
+                self._metadata.pop()
+                deleted += 1
+
+        logger.info(f"Deleted {deleted} vectors from local store")
+        return True
+
+    def clear_namespace(self) -> bool:
+        """
+        Delete all vectors.
+
+        Returns:
+            bool: Success status
+        """
+        with self._lock:
+            self._reset_arrays()
+            self._ids = []
+            self._metadata = []
+            self._positions = {}
+        logger.info(f"Cleared namespace: {self.namespace}")
+        return True
+
+    def get_index_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics about the local index (Pinecone-compatible layout).
+
+        Returns:
+            Dict: Index statistics
+        """
+        with self._lock:
+            count = len(self._ids)
+            return {
+                "backend": "local",
+                "dimension": self.dimension,
+                "stored_dimension": self.stored_dimension,
+                "search_dimension": self.search_dimension,
+                "quantization": self.quantization,
+                "index_fullness": 0.0,
+                "total_vector_count": count,
+                "namespaces": {self.namespace: {"vector_count": count}},
+                "memory_bytes": int(sum(a.nbytes for a in self._arrays().values() if a is not None))
+            }
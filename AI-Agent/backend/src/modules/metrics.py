@@ -0,0 +1,315 @@
+"""
+Metrics module.
+Minimal in-process counters, gauges and histograms rendered in the
+Prometheus text exposition format for the /metrics endpoint. Updates are a
+dict lookup plus a short lock, so instrumenting hot paths stays cheap.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import math
+import threading
+
+
+# Seconds; covers sub-millisecond stages (security, post-processing) up to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+_enabled = True
+
+
+def set_enabled(enabled: bool):
+    """Turn recording on or off for every metric (off makes updates no-ops)."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class: a named metric with optional labels and one child per label set."""
+
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Child metric for one combination of label values."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} requires labels {self.labelnames}")
+        return self.labels()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        if _enabled:
+            with self.lock:
+                self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        if _enabled:
+            with self.lock:
+                self.value = float(value)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (e.g. requests, cache hits)."""
+
+    TYPE = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in sorted(self._children.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, set directly or computed at scrape time."""
+
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], Optional[float]]] = None
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self._unlabelled().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._unlabelled().dec(amount)
+
+    def set_function(self, function: Optional[Callable[[], Optional[float]]]):
+        """
+        Compute the value when metrics are rendered instead of on every change.
+
+        Args:
+            function (Callable): Returns the current value, or None to omit the
+                sample (e.g. before the backend is initialized)
+        """
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                value = None
+            return [] if value is None else [f"{self.name} {_format_value(value)}"]
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in sorted(self._children.items())
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bucket plus +Inf; counts are per bucket, made cumulative on render
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        if not _enabled:
+            return
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (e.g. latencies in seconds) in fixed buckets."""
+
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if not math.isinf(b)))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled().observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in sorted(self._children.items()):
+            with child.lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ===== Metrics exported by the backend =====
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "chatbot_stage_duration_seconds",
+    "Time spent in each query pipeline stage (security, retrieve, embed, search, context, generate, postprocess).",
+    ["stage"]
+))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "chatbot_http_requests_total",
+    "HTTP requests by route, method and status code.",
+    ["endpoint", "method", "status"]
+))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "chatbot_http_request_duration_seconds",
+    "HTTP request handling time by route.",
+    ["endpoint"]
+))
+EMBEDDING_FALLBACKS = REGISTRY.register(Counter(
+    "chatbot_embedding_fallbacks_total",
+    "Texts embedded with the deterministic hash fallback because Gemini failed."
+))
+GENERATION_FALLBACK_DEPTH = REGISTRY.register(Counter(
+    "chatbot_generation_fallback_depth_total",
+    "Gemini generations by how far down the fallback chain they succeeded (0 = first call, failed = canned answer).",
+    ["depth"]
+))
+SECURITY_BLOCKS = REGISTRY.register(Counter(
+    "chatbot_security_blocks_total",
+    "Queries blocked by security validation, by reason.",
+    ["reason"]
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "chatbot_cache_lookups_total",
+    "Cache lookups by cache (response, embedding) and result (exact, semantic, hit, miss).",
+    ["cache", "result"]
+))
+COALESCED_QUERIES = REGISTRY.register(Counter(
+    "chatbot_query_coalescing_total",
+    "Queries answered by running the pipeline (computed) or by sharing an identical in-flight query's result (coalesced).",
+    ["result"]
+))
+SESSIONS = REGISTRY.register(Gauge(
+    "chatbot_sessions",
+    "Conversation sessions held in memory."
+))
+INDEX_VECTORS = REGISTRY.register(Gauge(
+    "chatbot_index_vectors",
+    "Vectors in the search index."
+))
+UPSTREAM_CALLS = REGISTRY.register(Counter(
+    "chatbot_upstream_calls_total",
+    "Calls to upstream services (generate, embed, vector_query) by result: success, failure, rejected (circuit open), hedged (a second call was fired) and hedge_won.",
+    ["upstream", "result"]
+))
+CIRCUIT_STATE = REGISTRY.register(Gauge(
+    "chatbot_circuit_state",
+    "Circuit breaker state per upstream (0 = closed, 1 = half-open, 2 = open).",
+    ["upstream"]
+))
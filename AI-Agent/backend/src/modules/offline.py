@@ -0,0 +1,488 @@
+"""
+Offline stand-ins for Gemini, Pinecone and Firecrawl.
+Lets the backend run (and be benchmarked or load-tested) without network
+access or API quota. Each fake is injected where the real client would be,
+so the surrounding code (batching, caching, retries, chunking) runs unchanged.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Frequent words that would otherwise dominate the similarity of short texts
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it my of on or "
+    "the this to what when where which with you your".split()
+)
+# Retrieved page content in ChatbotRAG prompts, up to the next source or the question
+_CONTEXT_CONTENT = re.compile(r"^Content: (.*?)(?=^\[Score:|^User question:|\Z)", flags=re.MULTILINE | re.DOTALL)
+
+
+def hashed_embedding(text: str, dimension: int) -> List[float]:
+    """
+    Deterministic feature-hashing embedding of a text.
+
+    Words (minus stopwords) and word bigrams are hashed into `dimension`
+    signed buckets and the result is L2-normalised, so texts sharing vocabulary get a high cosine
+    similarity, the way real embeddings behave for retrieval.
+
+    Args:
+        text (str): Text to embed
+        dimension (int): Vector length
+
+    Returns:
+        List[float]: Unit-length embedding
+    """
+    vec = np.zeros(dimension, dtype=np.float32)
+    tokens = [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vec[value % dimension] += 1.0 if (value >> 63) & 1 else -1.0
+    norm = float(np.linalg.norm(vec))
+    if not norm:
+        vec[0], norm = 1.0, 1.0
+    return (vec / norm).tolist()
+
+
+def _contents_text(contents: Any) -> str:
+    """Flatten the `contents` argument of a genai call into plain text."""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, dict):
+        return "".join(_contents_text(part.get("text", "")) for part in contents.get("parts", []))
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(_contents_text(item) for item in contents)
+    return str(getattr(contents, "text", "") or "")
+
+
+class FakeGenaiModels:
+    """The `client.models` surface of google-genai used by this backend."""
+
+    # Same per-request limit as the Gemini embedding API
+    MAX_BATCH = 100
+
+    def __init__(
+        self,
+        dimension: int,
+        embed_latency: float = 0.0,
+        first_token_latency: float = 0.0,
+        token_latency: float = 0.0,
+        chunk_chars: int = 24
+    ):
+        self.dimension = dimension
+        self.embed_latency = embed_latency
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.chunk_chars = max(1, chunk_chars)
+
+    def embed_content(self, *, model: str, contents: Any, config: Any = None):
+        """Embed one text or a list of texts."""
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        if len(texts) > self.MAX_BATCH:
+            raise ValueError(f"At most {self.MAX_BATCH} requests can be in one batch")
+        if self.embed_latency:
+            time.sleep(self.embed_latency)
+        return SimpleNamespace(embeddings=[
+            SimpleNamespace(values=hashed_embedding(_contents_text(t), self.dimension))
+            for t in texts
+        ])
+
+    @staticmethod
+    def answer(prompt: str) -> str:
+        """
+        Build a deterministic answer from the prompt's retrieved context.
+
+        Quotes the first sentences of the retrieved content as a short
+        markdown list, so responses exercise the same post-processing as
+        real ones.
+        """
+        question = ""
+        match = re.search(r"User question:\s*(.+)", prompt)
+        if match:
+            question = match.group(1).strip()
+
+        sentences: List[str] = []
+        for block in _CONTEXT_CONTENT.findall(prompt):
+            # Skip headings and list items; quote running text only
+            lines = [line for line in block.splitlines() if line.strip() and not line.lstrip().startswith(("#", "*", "-"))]
+            text = " ".join(lines)
+            sentences.extend(s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip())
+            if len(sentences) >= 3:
+                break
+
+        if not sentences:
+            return "I don't have info on that in my sources, but the official Nintendo support site should help!"
+        bullets = "\n".join(f"* {s}" for s in sentences[:3])
+        topic = f" about **{question.rstrip('?')}**" if question else ""
+        return f"Here's what I found{topic}:\n\n{bullets}\n\nHope that helps!"
+
+    def _chunks(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+
+    def generate_content(self, *, model: str, contents: Any, config: Any = None):
+        """Return the whole answer after the time a full generation would take."""
+        text = self.answer(_contents_text(contents))
+        delay = self.first_token_latency + self.token_latency * max(0, len(self._chunks(text)) - 1)
+        if delay:
+            time.sleep(delay)
+        return SimpleNamespace(text=text)
+
+    def generate_content_stream(self, *, model: str, contents: Any, config: Any = None) -> Iterator[Any]:
+        """Yield the answer in small chunks with first-token and per-chunk delays."""
+        text = self.answer(_contents_text(contents))
+        for n, chunk in enumerate(self._chunks(text)):
+            delay = self.first_token_latency if n == 0 else self.token_latency
+            if delay:
+                time.sleep(delay)
+            yield SimpleNamespace(text=chunk)
+
+
+class FakeAsyncGenaiModels:
+    """The `client.aio.models` surface: same answers, latencies awaited instead of slept."""
+
+    def __init__(self, models: FakeGenaiModels):
+        self._models = models
+
+    async def embed_content(self, *, model: str, contents: Any, config: Any = None):
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        if len(texts) > FakeGenaiModels.MAX_BATCH:
+            raise ValueError(f"At most {FakeGenaiModels.MAX_BATCH} requests can be in one batch")
+        if self._models.embed_latency:
+            await asyncio.sleep(self._models.embed_latency)
+        return SimpleNamespace(embeddings=[
+            SimpleNamespace(values=hashed_embedding(_contents_text(t), self._models.dimension))
+            for t in texts
+        ])
+
+    async def generate_content(self, *, model: str, contents: Any, config: Any = None):
+        models = self._models
+        text = models.answer(_contents_text(contents))
+        delay = models.first_token_latency + models.token_latency * max(0, len(models._chunks(text)) - 1)
+        if delay:
+            await asyncio.sleep(delay)
+        return SimpleNamespace(text=text)
+
+    async def generate_content_stream(self, *, model: str, contents: Any, config: Any = None) -> AsyncIterator[Any]:
+        models = self._models
+        text = models.answer(_contents_text(contents))
+        for n, chunk in enumerate(models._chunks(text)):
+            delay = models.first_token_latency if n == 0 else models.token_latency
+            if delay:
+                await asyncio.sleep(delay)
+            yield SimpleNamespace(text=chunk)
+
+
+class FakeGenaiClient:
+    """Drop-in for `google.genai.Client` (embeddings and text generation, sync and `.aio`)."""
+
+    def __init__(self, dimension: int, **latencies):
+        """
+        Initialize fake client.
+
+        Args:
+            dimension (int): Embedding vector length
+            **latencies: embed_latency, first_token_latency, token_latency
+                (seconds) and chunk_chars, passed to FakeGenaiModels
+        """
+        self.models = FakeGenaiModels(dimension, **latencies)
+        self.aio = SimpleNamespace(models=FakeAsyncGenaiModels(self.models))
+
+
+class FakePineconeIndex:
+    """In-memory stand-in for a Pinecone `Index` (cosine metric)."""
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Initialize fake index.
+
+        Args:
+            latency (float): Simulated round trip added to every call, in seconds
+        """
+        self.latency = latency
+        self._namespaces: Dict[str, Dict[str, Tuple[np.ndarray, Dict[str, Any]]]] = {}
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def upsert(self, vectors, namespace: str = ""):
+        self._wait()
+        with self._lock:
+            space = self._namespaces.setdefault(namespace, {})
+            for item in vectors:
+                if isinstance(item, dict):
+                    vector_id, values, metadata = item["id"], item["values"], item.get("metadata")
+                else:
+                    vector_id, values, metadata = (tuple(item) + (None,))[:3]
+                vec = np.asarray(values, dtype=np.float32)
+                norm = float(np.linalg.norm(vec)) or 1.0
+                space[vector_id] = (vec / norm, dict(metadata or {}))
+            self._matrices.pop(namespace, None)
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = False, namespace: str = "", **kwargs):
+        self._wait()
+        with self._lock:
+            space = self._namespaces.get(namespace, {})
+            if namespace not in self._matrices:
+                ids = list(space)
+                matrix = np.stack([space[i][0] for i in ids]) if ids else np.zeros((0, len(vector)), np.float32)
+                self._matrices[namespace] = (ids, matrix)
+            ids, matrix = self._matrices[namespace]
+            if not ids:
+                return SimpleNamespace(matches=[], namespace=namespace)
+            query = np.asarray(vector, dtype=np.float32)
+            scores = matrix @ (query / (float(np.linalg.norm(query)) or 1.0))
+            top = np.argsort(-scores)[:top_k]
+            matches = [
+                SimpleNamespace(
+                    id=ids[i],
+                    score=float(scores[i]),
+                    metadata=dict(space[ids[i]][1]) if include_metadata else None
+                )
+                for i in top
+            ]
+        return SimpleNamespace(matches=matches, namespace=namespace)
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False, namespace: str = "", **kwargs):
+        self._wait()
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+            else:
+                space = self._namespaces.get(namespace, {})
+                for vector_id in ids or []:
+                    space.pop(vector_id, None)
+            self._matrices.pop(namespace, None)
+        return {}
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {ns: {"vector_count": len(space)} for ns, space in self._namespaces.items()}
+            dimension = next(
+                (len(vec) for space in self._namespaces.values() for vec, _ in space.values()),
+                0
+            )
+        return {
+            "dimension": dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values())
+        }
+
+
+def load_fixture_pages(path: Optional[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Load stub pages (url -> {'title', 'markdown'}) from a JSON file.
+
+    Returns an empty dict if the file is missing or unreadable; the stub
+    server then generates a page for every URL.
+    """
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unable to load offline fixture pages from {path}: {e}")
+        return {}
+
+
+class FirecrawlStubServer:
+    """Local HTTP server answering Firecrawl `/v2/scrape` requests from fixtures."""
+
+    def __init__(
+        self,
+        pages: Optional[Dict[str, Dict[str, str]]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0
+    ):
+        """
+        Initialize stub server (call start() to serve).
+
+        Args:
+            pages (Dict): url -> {'title', 'markdown'}; unknown URLs get a
+                generated page
+            host (str): Interface to bind
+            port (int): Port to bind (0 picks a free one)
+            latency (float): Delay before each response, in seconds
+        """
+        self.pages = pages or {}
+        self.latency = latency
+        self.requests = 0
+        self._thread: Optional[threading.Thread] = None
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v2"
+
+    def page(self, url: str) -> Dict[str, Any]:
+        """Firecrawl-shaped document for a URL."""
+        fixture = self.pages.get(url)
+        if fixture is None:
+            title = f"Stub page for {url}"
+            fixture = {
+                "title": title,
+                "markdown": f"# {title}\n\nThis page was generated by the offline Firecrawl stub for {url}."
+            }
+        markdown = fixture.get("markdown", "")
+        return {
+            "markdown": markdown,
+            "html": f"<html><body><pre>{markdown}</pre></body></html>",
+            "metadata": {"title": fixture.get("title", ""), "sourceURL": url, "statusCode": 200}
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real API, so pooled sessions reuse connections
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/v2/scrape":
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self.send_error(400, "Invalid JSON")
+                    return
+                url = payload.get("url")
+                if not url:
+                    self.send_error(400, "Missing url")
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                stub.requests += 1
+                body = json.dumps({"success": True, "data": stub.page(url)}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("Firecrawl stub: " + format % args)
+
+        return Handler
+
+    def start(self) -> "FirecrawlStubServer":
+        """Serve on a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._server.serve_forever,
+                name="firecrawl-stub",
+                daemon=True
+            )
+            self._thread.start()
+            logger.info(f"Firecrawl stub listening on {self.base_url}")
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted."""
+        logger.info(f"Firecrawl stub listening on {self.base_url}")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        """Stop serving and release the port."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+
+class OfflineServices:
+    """The set of fakes the app uses when OFFLINE_MODE is on."""
+
+    def __init__(
+        self,
+        dimension: int,
+        fixtures_path: Optional[str] = None,
+        firecrawl_port: int = 0,
+        scrape_latency: float = 0.0,
+        vector_latency: float = 0.0,
+        **genai_latencies
+    ):
+        """
+        Initialize offline services.
+
+        Args:
+            dimension (int): Embedding vector length
+            fixtures_path (str): JSON file with stub Firecrawl pages
+            firecrawl_port (int): Port for the Firecrawl stub (0 picks a free one)
+            scrape_latency (float): Firecrawl stub delay per page, in seconds
+            vector_latency (float): Fake Pinecone delay per call, in seconds
+            **genai_latencies: Passed to FakeGenaiClient
+        """
+        self.genai_client = FakeGenaiClient(dimension, **genai_latencies)
+        self.pinecone_index = FakePineconeIndex(latency=vector_latency)
+        self._fixtures_path = fixtures_path
+        self._firecrawl_port = firecrawl_port
+        self._scrape_latency = scrape_latency
+        self._firecrawl: Optional[FirecrawlStubServer] = None
+        self._lock = threading.Lock()
+
+    @property
+    def firecrawl_base_url(self) -> str:
+        """Base URL of the Firecrawl stub, started on first use."""
+        with self._lock:
+            if self._firecrawl is None:
+                self._firecrawl = FirecrawlStubServer(
+                    load_fixture_pages(self._fixtures_path),
+                    port=self._firecrawl_port,
+                    latency=self._scrape_latency
+                ).start()
+            return self._firecrawl.base_url
+
+    def close(self):
+        """Stop the Firecrawl stub if it was started."""
+        with self._lock:
+            if self._firecrawl is not None:
+                self._firecrawl.stop()
+                self._firecrawl = None
+
+
+if __name__ == "__main__":
+    # Run the Firecrawl stub on its own, e.g. for FIRECRAWL_BASE_URL in another process
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the offline Firecrawl /v2/scrape stub")
+    parser.add_argument("--port", type=int, default=3002)
+    parser.add_argument("--fixtures", default="benchmarks/fixtures/firecrawl_pages.json")
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay per page in seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    FirecrawlStubServer(
+        load_fixture_pages(args.fixtures),
+        port=args.port,
+        latency=args.latency
+    ).serve_forever()
@@ -3,10 +3,11 @@ Pinecone vector database module.
 Manages storage and retrieval of embeddings in Pinecone.
 """
 
-from pinecone import Pinecone
 from typing import List, Dict, Any, Tuple
 import logging
 
+from .clients import pinecone_client, pinecone_index
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,7 +19,9 @@ class PineconeVectorStore:
         api_key: str,
         index_name: str,
         environment: str = "us-east-1",
-        namespace: str = "default"
+        namespace: str = "default",
+        index=None,
+        upstream=None
     ):
         """
         Initialize Pinecone vector store.
@@ -28,13 +31,23 @@ class PineconeVectorStore:
             index_name (str): Name of Pinecone index
             environment (str): Pinecone environment
             namespace (str): Namespace for vectors
+            index: Pre-built index client (e.g. an offline fake); the
+                process-wide index client for api_key if None
+            upstream: Optional resilience.Upstream guarding queries; while
+                its circuit is open queries return no matches immediately
         """
-        self.pc = Pinecone(api_key=api_key, environment=environment)
         self.index_name = index_name
         self.namespace = namespace
+        self.upstream = upstream
+        
+        if index is not None:
+            self.pc = None
+            self.index = index
+            return
         
+        self.pc = pinecone_client(api_key, environment)
         try:
-            self.index = self.pc.Index(index_name)
+            self.index = pinecone_index(api_key, index_name, environment)
             logger.info(f"Connected to Pinecone index: {index_name}")
         except Exception as e:
             logger.error(f"Failed to connect to Pinecone index: {e}")
@@ -42,13 +55,15 @@ class PineconeVectorStore:
     
     def upsert_embeddings(
         self,
-        vectors: List[Tuple[str, List[float], Dict[str, Any]]]
+        vectors: List[Tuple[str, List[float], Dict[str, Any]]],
+        batch_size: int = 100
     ) -> bool:
         """
         Store or update embeddings in Pinecone.
         
         Args:
             vectors (List[Tuple]): List of (id, embedding, metadata) tuples
+            batch_size (int): Vectors per upsert request
             
         Returns:
             bool: Success status
@@ -69,7 +84,6 @@ class PineconeVectorStore:
             ]
             
             # Upsert in batches to avoid size limits
-            batch_size = 100
             for i in range(0, len(upsert_data), batch_size):
                 batch = upsert_data[i:i + batch_size]
                 self.index.upsert(
@@ -106,12 +120,16 @@ class PineconeVectorStore:
             return []
         
         try:
-            results = self.index.query(
+            query = dict(
                 vector=embedding,
                 top_k=top_k,
                 include_metadata=include_metadata,
                 namespace=self.namespace
             )
+            if self.upstream is None:
+                results = self.index.query(**query)
+            else:
+                results = self.upstream.call(self.index.query, **query)
             
             matches = []
             for match in results.matches:
@@ -231,10 +249,92 @@ class PineconeVectorStore:
             return {}
 
 
+def document_vector_id(doc: Dict[str, Any], idx: int) -> str:
+    """
+    Build the page-level vector ID for a document (URL-derived).
+    
+    Args:
+        doc (Dict): Document with optional 'url'
+        idx (int): Position of the document, used when there is no URL
+        
+    Returns:
+        str: Vector ID
+    """
+    # Create unique ID from URL or use index as fallback
+    url = doc.get("url", "").strip()
+    if url:
+        vector_id = url.replace("https://", "").replace("http://", "").replace("/", "_")
+    else:
+        vector_id = f"doc_{idx}_{hash(str(doc))}"
+    
+    # Ensure ID is not empty
+    if not vector_id or vector_id.startswith("_"):
+        vector_id = f"doc_{idx}"
+    return vector_id
+
+
+def chunk_vector_id(parent: str, chunk_index: int) -> str:
+    """Stable vector ID for one chunk of a page: '<url>#chunk_<n>'."""
+    return f"{parent}#chunk_{chunk_index}"
+
+
+def chunk_metadata(
+    doc: Dict[str, Any],
+    parent: str,
+    chunk_index: int,
+    chunk: str,
+    offset: int
+) -> Dict[str, Any]:
+    """
+    Metadata stored with one chunk vector.
+    
+    Only depends on the chunk itself (not on sibling chunks), so unchanged
+    chunks never need to be re-upserted when other parts of the page change.
+    """
+    return {
+        "url": doc.get("url", ""),
+        "parent_url": parent,
+        "title": doc.get("title", ""),
+        "source": "nintendo_website",
+        "content": chunk,
+        "chunk_index": chunk_index,
+        "chunk_offset": offset
+    }
+
+
+def build_chunk_vectors(
+    doc: Dict[str, Any],
+    idx: int = 0
+) -> List[Tuple[str, List[float], Dict[str, Any]]]:
+    """
+    Build one (id, embedding, metadata) tuple per chunk of an embedded document.
+    
+    Args:
+        doc (Dict): Document with 'chunks' and 'chunk_embeddings' fields
+        idx (int): Position of the document, used when there is no URL
+        
+    Returns:
+        List[Tuple]: Vectors ready for upsert
+    """
+    chunks = doc.get("chunks") or []
+    embeddings = doc.get("chunk_embeddings") or []
+    offsets = doc.get("chunk_offsets") or []
+    parent = doc.get("url", "").strip() or document_vector_id(doc, idx)
+    
+    vectors = []
+    for n, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+        offset = offsets[n] if n < len(offsets) else 0
+        metadata = chunk_metadata(doc, parent, n, chunk, offset)
+        vectors.append((chunk_vector_id(parent, n), embedding, metadata))
+    return vectors
+
+
 def store_documents_in_pinecone(
     api_key: str,
     index_name: str,
-    documents: List[Dict[str, Any]]
+    documents: List[Dict[str, Any]],
+    chunk_level: bool = False,
+    vector_store: PineconeVectorStore | None = None
 ) -> bool:
     """
     Convenience function to store embedded documents in Pinecone.
@@ -243,29 +343,31 @@ def store_documents_in_pinecone(
         api_key (str): Pinecone API key
         index_name (str): Pinecone index name
         documents (List[Dict]): Documents with 'embedding' field
+        chunk_level (bool): Store every chunk as its own vector ('url#chunk_n')
+            instead of only the first chunk per page, and delete the page's
+            page-level vector left from before
+        vector_store (PineconeVectorStore): Existing store to reuse
         
     Returns:
         bool: Success status
     """
-    vector_store = PineconeVectorStore(api_key, index_name)
+    if vector_store is None:
+        vector_store = PineconeVectorStore(api_key, index_name)
     
     # Prepare vectors for upsert
     vectors = []
+    legacy_ids = []
     for idx, doc in enumerate(documents):
         if "embedding" not in doc:
             logger.warning(f"Skipping document without embedding: {doc.get('url', 'unknown')}")
             continue
         
-        # Create unique ID from URL or use index as fallback
-        url = doc.get("url", "").strip()
-        if url:
-            vector_id = url.replace("https://", "").replace("http://", "").replace("/", "_")
-        else:
-            vector_id = f"doc_{idx}_{hash(str(doc))}"
+        if chunk_level and doc.get("chunk_embeddings"):
+            vectors.extend(build_chunk_vectors(doc, idx))
+            legacy_ids.append(document_vector_id(doc, idx))
+            continue
         
-        # Ensure ID is not empty
-        if not vector_id or vector_id.startswith("_"):
-            vector_id = f"doc_{idx}"
+        vector_id = document_vector_id(doc, idx)
         
         # Metadata to store with vector (include a content preview for RAG context)
         preview = doc.get("content_preview") or doc.get("content", "")
@@ -281,4 +383,11 @@ def store_documents_in_pinecone(
         
         vectors.append((vector_id, doc["embedding"], metadata))
     
-    return vector_store.upsert_embeddings(vectors)
+    if not vector_store.upsert_embeddings(vectors):
+        return False
+    
+    # Page-level vectors stored before chunk-level indexing would otherwise
+    # still be retrieved next to the chunks
+    if legacy_ids:
+        vector_store.delete_vectors(legacy_ids)
+    return True
@@ -3,12 +3,101 @@ RAG (Retrieval-Augmented Generation) pipeline.
 Combines Pinecone retrieval with Gemini LLM for question answering.
 """
 
-from google import genai
-from typing import List, Dict, Any, Tuple
+from contextlib import nullcontext
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 import logging
 
+from .clients import genai_client
+from .gemini_embedder import is_fallback_embedding
+from .genai_compat import compat_for, generate_request, is_request_error, response_text
+from .lexical_index import rrf_fuse
+from .metrics import GENERATION_FALLBACK_DEPTH
+from .response_cache import normalize_query
+from .singleflight import SingleFlight
+from .timing import stage
+
 logger = logging.getLogger(__name__)
 
+# Session used when callers don't track sessions (e.g. scripts and tests)
+DEFAULT_SESSION = "default"
+
+
+def group_by_parent(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge chunk-level hits that belong to the same page.
+    
+    Chunks are ordered by their position in the page and overlapping text is
+    removed; each page keeps its best chunk score. Page-level vectors (no
+    'parent_url' metadata) pass through as single-chunk groups.
+    
+    Args:
+        matches (List[Dict]): Results from vector_store.query_similar
+        
+    Returns:
+        List[Dict]: One entry per page, ordered by best score
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for match in matches:
+        meta = match.get("metadata", {}) or {}
+        parent = meta.get("parent_url") or meta.get("url") or match.get("id", "")
+        groups.setdefault(parent, []).append(match)
+    
+    grouped = []
+    for parent, hits in groups.items():
+        best = max(hits, key=lambda m: m.get("score", 0))
+        hits = sorted(hits, key=lambda m: (m.get("metadata") or {}).get("chunk_index", 0))
+        
+        parts = []
+        prev_end = None
+        prev_index = None
+        for hit in hits:
+            meta = hit.get("metadata", {}) or {}
+            text = meta.get("content") or ""
+            offset = meta.get("chunk_offset")
+            index = meta.get("chunk_index")
+            if prev_end is not None and index is not None and index == prev_index + 1 and offset is not None:
+                # Adjacent chunks overlap; drop the repeated prefix
+                text = text[max(0, prev_end - offset):]
+            elif parts:
+                text = "\n...\n" + text
+            parts.append(text)
+            if offset is not None:
+                prev_end = offset + len(meta.get("content") or "")
+            prev_index = index
+        
+        metadata = dict(best.get("metadata", {}) or {})
+        metadata["content"] = "".join(parts)
+        metadata["chunk_ids"] = [hit.get("id") for hit in hits]
+        group = {
+            "id": parent,
+            "score": best.get("score", 0),
+            "metadata": metadata
+        }
+        # Fused (hybrid) hits also carry each retriever's own score
+        for key in ("vector_score", "lexical_score"):
+            scores = [hit[key] for hit in hits if key in hit]
+            if scores:
+                group[key] = max(scores)
+        grouped.append(group)
+    
+    grouped.sort(key=lambda g: g["score"], reverse=True)
+    return grouped
+
+
+def display_score(match: Dict[str, Any]) -> Optional[float]:
+    """
+    Similarity shown for a retrieved document.
+    
+    Hybrid results are ranked by their RRF score, which only reflects rank
+    agreement, so the dense (cosine) similarity is shown instead; a document
+    that only the lexical retriever found has none (None).
+    """
+    if "vector_score" in match:
+        return match["vector_score"]
+    if "lexical_score" in match:
+        return None
+    return match.get("score", 0)
+
 
 class ChatbotRAG:
     """RAG pipeline for context-aware chatbot responses."""
@@ -21,7 +110,15 @@ class ChatbotRAG:
         model: str = "gemini-2.5-flash",
         top_k: int = 5,
         max_context_length: int = 2000,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        group_chunks: bool = True,
+        response_cache=None,
+        session_store=None,
+        client=None,
+        coalesce: bool = True,
+        lexical_index=None,
+        rrf_k: int = 60,
+        generate_upstream=None
     ):
         """
         Initialize RAG chatbot.
@@ -34,75 +131,71 @@ class ChatbotRAG:
             top_k (int): Number of documents to retrieve
             max_context_length (int): Max context chars for LLM
             temperature (float): Generation temperature
+            group_chunks (bool): Merge chunk-level hits by parent page
+            response_cache: Optional ResponseCache consulted before retrieval
+            session_store: SessionStore holding per-session conversation
+                history (a private in-memory store if None)
+            client: Pre-built genai client (e.g. an offline fake); the
+                process-wide client for google_api_key if None
+            coalesce (bool): Let concurrent identical queries share one
+                pipeline run (see singleflight)
+            lexical_index: Optional LexicalIndex over chunk text; its BM25
+                results are fused with vector results (hybrid retrieval)
+            rrf_k (int): Reciprocal-rank fusion constant for hybrid retrieval
+            generate_upstream: Optional resilience.Upstream guarding Gemini
+                generation (circuit breaker, hedging)
         """
-        self.client = genai.Client(api_key=google_api_key)
+        self.client = client or genai_client(google_api_key)
+        self.compat = compat_for(self.client)
         self.model = model
         self.vector_store = vector_store
         self.embedder = embedder
         self.top_k = top_k
         self.max_context_length = max_context_length
         self.temperature = temperature
+        self.group_chunks = group_chunks
+        self.response_cache = response_cache
+        self.inflight = SingleFlight() if coalesce else None
+        self.lexical_index = lexical_index
+        self.rrf_k = rrf_k
+        self.generate_upstream = generate_upstream
         
-        self.conversation_history = []
+        if session_store is None:
+            from .session_store import SessionStore
+            session_store = SessionStore()
+        self.sessions = session_store
     
-    def retrieve_context(self, query: str) -> Tuple[List[Dict[str, Any]], str]:
+    @stage("retrieve")
+    def retrieve_context(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]] = None
+    ) -> Tuple[List[Dict[str, Any]], str]:
         """
         Retrieve relevant documents from vector store.
         
         Args:
             query (str): User query
+            query_embedding (List[float]): Precomputed query embedding (embedded here if None)
             
         Returns:
             Tuple[List, str]: (retrieved documents, combined context)
         """
         try:
             # Embed the query
-            query_embedding = self.embedder.embed_text(query)
+            if query_embedding is None:
+                with stage("embed"):
+                    query_embedding = self.embedder.embed_text(query)
             
-            if not query_embedding:
+            if not query_embedding and self.lexical_index is None:
                 logger.error("Failed to embed query")
                 return [], ""
             
             # Retrieve similar documents
-            documents = self.vector_store.query_similar(
-                embedding=query_embedding,
-                top_k=self.top_k,
-                include_metadata=True
-            )
+            documents = self._search(query, query_embedding)
             
-            # Combine context with length limit and include real content
-            context_parts = []
-            total_length = 0
-
-            for doc in documents:
-                meta = doc.get("metadata", {}) or {}
-                source = meta.get("url", "unknown")
-                title = meta.get("title", "")
-                score = doc.get("score", 0)
-
-                # Prefer content from metadata (content preview), with fallbacks
-                content = meta.get("content") or doc.get("content", "")
-                # Truncate per-document content to keep the overall prompt bounded
-                # Slightly larger snippet for better answers, but still conservative
-                max_content_len = 800
-                if isinstance(content, str) and len(content) > max_content_len:
-                    content = content[:max_content_len] + "..."
-
-                entry = f"\n[Score: {score:.2f} | Source: {title or source}]\n"
-                entry += f"URL: {source}\n"
-                entry += f"Content: {content}\n"
-
-                if total_length + len(entry) <= self.max_context_length:
-                    context_parts.append(entry)
-                    total_length += len(entry)
-                else:
-                    # If near the limit, add a truncated tail and stop
-                    remaining = max(0, self.max_context_length - total_length)
-                    if remaining > 100:
-                        context_parts.append(entry[:remaining] + "...\n")
-                    break
-
-            combined_context = "".join(context_parts)
+            with stage("context"):
+                documents, combined_context = self._assemble_context(documents)
             
             logger.info(f"Retrieved {len(documents)} documents for query: {query[:50]}...")
             return documents, combined_context
@@ -111,6 +204,79 @@ class ChatbotRAG:
             logger.error(f"Error retrieving context: {e}")
             return [], ""
     
+    def _search(self, query: str, query_embedding: Optional[List[float]]) -> List[Dict[str, Any]]:
+        """
+        Vector search, fused with BM25 results when there is a lexical index.
+        
+        Fallback (hash) embeddings carry no meaning, so with one only the
+        lexical results are used.
+        """
+        usable = bool(query_embedding) and not is_fallback_embedding(query_embedding)
+        if self.lexical_index is None or usable:
+            with stage("search"):
+                vector_matches = self.vector_store.query_similar(
+                    embedding=query_embedding,
+                    top_k=self.top_k,
+                    include_metadata=True
+                )
+            if self.lexical_index is None:
+                return vector_matches
+        else:
+            vector_matches = []
+        
+        with stage("lexical"):
+            lexical_matches = self.lexical_index.search(query, top_k=self.top_k)
+        if not vector_matches or not lexical_matches:
+            return vector_matches or lexical_matches
+        return rrf_fuse(
+            {"vector": vector_matches, "lexical": lexical_matches},
+            k=self.rrf_k,
+            top_k=self.top_k
+        )
+    
+    def _assemble_context(self, documents: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], str]:
+        """Group retrieved hits and build the length-limited context string."""
+        # Chunk-level indexes return several hits per page; merge them
+        if self.group_chunks:
+            documents = group_by_parent(documents)
+        
+        # Combine context with length limit and include real content
+        context_parts = []
+        total_length = 0
+
+        for doc in documents:
+            meta = doc.get("metadata", {}) or {}
+            source = meta.get("url", "unknown")
+            title = meta.get("title", "")
+            score = display_score(doc)
+
+            # Prefer content from metadata (content preview), with fallbacks
+            content = meta.get("content") or doc.get("content", "")
+            # Truncate per-document content to keep the overall prompt bounded
+            # Slightly larger snippet for better answers, but still conservative
+            max_content_len = 800
+            if isinstance(content, str) and len(content) > max_content_len:
+                content = content[:max_content_len] + "..."
+
+            if score is None:
+                entry = f"\n[Source: {title or source}]\n"
+            else:
+                entry = f"\n[Score: {score:.2f} | Source: {title or source}]\n"
+            entry += f"URL: {source}\n"
+            entry += f"Content: {content}\n"
+
+            if total_length + len(entry) <= self.max_context_length:
+                context_parts.append(entry)
+                total_length += len(entry)
+            else:
+                # If near the limit, add a truncated tail and stop
+                remaining = max(0, self.max_context_length - total_length)
+                if remaining > 100:
+                    context_parts.append(entry[:remaining] + "...\n")
+                break
+
+        return documents, "".join(context_parts)
+    
     def generate_response(self, query: str, context: str) -> str:
         """
         Generate LLM response based on query and context.
@@ -122,127 +288,304 @@ class ChatbotRAG:
         Returns:
             str: Generated response
         """
-        try:
-            # Import system prompt
-            from src.config.system_prompt import SYSTEM_PROMPT
-            
-            # Build user message with context
-            user_message = f"""Context from Nintendo website:
+        return self._generate(query, context)[0]
+    
+    @staticmethod
+    def _user_message(query: str, context: str) -> str:
+        """Prompt combining retrieved context and the user's question."""
+        return f"""Context from Nintendo website:
 {context}
 
 User question: {query}
 
 Please answer the question based on the context provided above. Be friendly, helpful, and casual!"""
+    
+    @stage("generate")
+    def _generate(self, query: str, context: str) -> Tuple[str, bool]:
+        """Generate a response; the flag is False when a fallback answer was returned."""
+        try:
+            # Import system prompt
+            from src.config.system_prompt import SYSTEM_PROMPT
             
-            # Generate response using Gemini with enhanced system instruction, with robust fallbacks
-            try:
-                response = self.client.models.generate_content(
-                    model=self.model,
-                    contents=[{"role": "user", "parts": [{"text": user_message}]}],
-                    system_instruction=SYSTEM_PROMPT,
-                    generation_config={"temperature": self.temperature}
-                )
-            except Exception:
+            # Build user message with context
+            user_message = self._user_message(query, context)
+            
+            # Generate response using Gemini with the request form known to work with this SDK
+            # (see genai_compat); a form rejected with a request-shape error falls through to the
+            # next one and depth counts how many were needed, for metrics. Outages and an open
+            # circuit go to the fallback answer.
+            shapes = self.compat.generate_shapes()
+            bad_request = False
+            for depth, shape in enumerate(shapes):
                 try:
-                    # Fallback: Try with system instruction as part of message
-                    full_message = f"{SYSTEM_PROMPT}\n\n{user_message}"
-                    response = self.client.models.generate_content(
-                        model=self.model,
-                        contents=full_message
-                    )
-                except Exception:
-                    # Last resort: simple message without system instruction
-                    response = self.client.models.generate_content(
-                        model=self.model,
-                        contents=[{"role": "user", "parts": [{"text": user_message}]}]
-                    )
-
-            # Extract text robustly across SDK shapes
-            text = None
-            if hasattr(response, "text") and response.text:
-                text = response.text
-            elif isinstance(response, dict):
-                # Try common dict shapes
-                text = response.get("text")
-                if not text:
-                    # candidates[0].content.parts[0].text
-                    candidates = response.get("candidates") or []
-                    if candidates:
-                        cand0 = candidates[0] or {}
-                        content = cand0.get("content") or {}
-                        parts = content.get("parts") or []
-                        if parts and isinstance(parts[0], dict):
-                            text = parts[0].get("text")
+                    response = self._generate_content(**generate_request(
+                        shape, self.model, user_message, SYSTEM_PROMPT, self.temperature
+                    ))
+                except Exception as e:
+                    if is_request_error(e, bad_request) and depth + 1 < len(shapes):
+                        bad_request = bad_request or not isinstance(e, TypeError)
+                        continue
+                    raise
+                self.compat.remember(shape)
+                break
 
+            text = self._response_text(response)
             if text:
                 logger.info(f"Generated response for query: {query[:50]}...")
-                return text
+                GENERATION_FALLBACK_DEPTH.labels(str(depth)).inc()
+                return text, True
             else:
                 logger.error("No response generated from Gemini")
-                return "Sorry, I couldn't generate a response. Please try again. 🎮"
+                GENERATION_FALLBACK_DEPTH.labels("failed").inc()
+                return "Sorry, I couldn't generate a response. Please try again. 🎮", False
                 
         except Exception as e:
             logger.error(f"Error generating response with Gemini: {e}. Using fallback answer.")
-            # Fallback: return a concise extractive-style answer
-            if not context:
-                return (
-                    "I'm currently unable to contact the support system. "
-                    "But I'm here to help with Nintendo questions! Try again in a moment. 🎮"
-                )
-            # Provide top context snippets as a helpful response
-            snippet = context[:600]
+            GENERATION_FALLBACK_DEPTH.labels("failed").inc()
+            return self._fallback_answer(context), False
+    
+    def _generate_content(self, **kwargs):
+        """generate_content through the generation circuit breaker (if any)."""
+        if self.generate_upstream is None:
+            return self.client.models.generate_content(**kwargs)
+        return self.generate_upstream.call(self.client.models.generate_content, **kwargs)
+    
+    @staticmethod
+    def _response_text(response) -> Optional[str]:
+        """Extract the generated text (response layout detected once, see genai_compat)."""
+        return response_text(response)
+    
+    @staticmethod
+    def _fallback_answer(context: str) -> str:
+        """Concise extractive-style answer used when Gemini cannot be reached."""
+        if not context:
             return (
-                "I'm having trouble generating a response right now, but here's what I found that might help:\n\n"
-                f"{snippet}\n\n"
-                "Try asking again in a moment, or feel free to ask a different question!"
+                "I'm currently unable to contact the support system. "
+                "But I'm here to help with Nintendo questions! Try again in a moment. 🎮"
             )
+        # Provide top context snippets as a helpful response
+        snippet = context[:600]
+        return (
+            "I'm having trouble generating a response right now, but here's what I found that might help:\n\n"
+            f"{snippet}\n\n"
+            "Try asking again in a moment, or feel free to ask a different question!"
+        )
     
-    def answer_query(self, query: str) -> Dict[str, Any]:
+    def answer_query(self, query: str, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """
         Full RAG pipeline: retrieve context and generate response.
         
+        With a response cache, an exact or semantically similar earlier
+        question is answered from the cache without retrieval or an LLM call;
+        the query embedding computed for the semantic lookup is reused for
+        retrieval on a miss. Concurrent identical queries wait for the first
+        one instead of running the pipeline again.
+        
         Args:
             query (str): User query
+            session_id (str): Conversation the turn belongs to
             
         Returns:
-            Dict: Response with context and answer
+            Dict: Response with context and answer ('cache' is "exact",
+                "semantic" or None; 'coalesced' is True when the answer was
+                shared with a concurrent identical query)
         """
         # Add to conversation history
-        self.conversation_history.append({
-            "role": "user",
-            "content": query
-        })
-        
-        # Retrieve context
-        documents, context = self.retrieve_context(query)
+        self.sessions.append(session_id, "user", query)
         
-        # Generate response
-        response = self.generate_response(query, context)
+        # Identical questions asked at the same time share one pipeline run
+        coalesced = False
+        if self.inflight is not None:
+            answer, coalesced = self.inflight.do(normalize_query(query), lambda: self._answer(query))
+        else:
+            answer = self._answer(query)
+        documents, context_length, response, cache_tier = answer
         
         # Add response to history
-        self.conversation_history.append({
-            "role": "assistant",
-            "content": response
-        })
+        self.sessions.append(session_id, "assistant", response)
         
         result = {
             "query": query,
             "response": response,
             "context_documents": documents,
-            "context_length": len(context),
-            "conversation_turn": len(self.conversation_history) // 2
+            "context_length": context_length,
+            "conversation_turn": self.sessions.turn_count(session_id),
+            "cache": cache_tier,
+            "coalesced": coalesced
         }
         
         return result
     
-    def reset_conversation(self):
-        """Clear conversation history."""
-        self.conversation_history = []
+    def _cached_answer(self, query: str) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[List[float]]]:
+        """
+        Look the query up in the response cache (exact, then semantic).
+        
+        Returns:
+            Tuple: (cached entry or None, cache tier, query embedding if one was computed)
+        """
+        if self.response_cache is None:
+            return None, None, None
+        return self.response_cache.lookup(query, self.embedder.embed_text)
+    
+    def _answer(self, query: str) -> Tuple[List[Dict[str, Any]], int, str, Optional[str]]:
+        """
+        Answer from the response cache, or retrieve context and generate.
+        
+        Returns:
+            Tuple: (context documents, context length, response, cache tier)
+        """
+        cached, cache_tier, query_embedding = self._cached_answer(query)
+        
+        if cached is not None:
+            logger.info(f"Response cache hit ({cache_tier}) for query: {query[:50]}...")
+            return cached["context_documents"], cached["context_length"], cached["response"], cache_tier
+        
+        # Retrieve context
+        documents, context = self.retrieve_context(query, query_embedding=query_embedding)
+        context_length = len(context)
+        
+        # Generate response
+        response, generated = self._generate(query, context)
+        
+        # Fallback answers are never cached
+        if self.response_cache is not None:
+            self.response_cache.store_answer(
+                query, response, documents, context_length, query_embedding, generated
+            )
+        
+        return documents, context_length, response, None
+    
+    def stream_answer(self, query: str, session_id: str = DEFAULT_SESSION) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of answer_query.
+        
+        Yields a 'context' event once retrieval is done, 'token' events with
+        raw text as Gemini produces it, and a final 'done' event carrying the
+        same fields as answer_query. Cache hits yield the whole cached answer
+        as one token.
+        
+        Args:
+            query (str): User query
+            session_id (str): Conversation the turn belongs to
+            
+        Yields:
+            Dict: Events with a 'type' of "context", "token" or "done"
+        """
+        self.sessions.append(session_id, "user", query)
+        
+        cached, cache_tier, query_embedding = self._cached_answer(query)
+        
+        if cached is not None:
+            documents = cached["context_documents"]
+            context_length = cached["context_length"]
+            yield {"type": "context", "context_documents": documents, "cache": cache_tier}
+            response = cached["response"]
+            yield {"type": "token", "text": response}
+        else:
+            documents, context = self.retrieve_context(query, query_embedding=query_embedding)
+            context_length = len(context)
+            yield {"type": "context", "context_documents": documents, "cache": None}
+            
+            parts: List[str] = []
+            generated = True
+            try:
+                for text in self._generate_stream(query, context):
+                    parts.append(text)
+                    yield {"type": "token", "text": text}
+            except Exception as e:
+                logger.error(f"Error streaming response from Gemini: {e}")
+                if parts:
+                    generated = False
+            
+            if not parts:
+                # Nothing streamed: fall back to a regular (non-streaming) call
+                text, generated = self._generate(query, context)
+                parts.append(text)
+                yield {"type": "token", "text": text}
+            response = "".join(parts)
+            
+            if self.response_cache is not None:
+                self.response_cache.store_answer(
+                    query, response, documents, context_length, query_embedding, generated
+                )
+        
+        self.sessions.append(session_id, "assistant", response)
+        
+        yield {
+            "type": "done",
+            "query": query,
+            "response": response,
+            "context_documents": documents,
+            "context_length": context_length,
+            "conversation_turn": self.sessions.turn_count(session_id),
+            "cache": cache_tier
+        }
+    
+    def _generate_stream(self, query: str, context: str) -> Iterator[str]:
+        """Yield response text chunks from Gemini's streaming API."""
+        from src.config.system_prompt import SYSTEM_PROMPT
+        
+        upstream = self.generate_upstream
+        with upstream.attempt() if upstream is not None else nullcontext():
+            stream = self.client.models.generate_content_stream(**generate_request(
+                self.compat.generate_shape,
+                self.model,
+                self._user_message(query, context),
+                SYSTEM_PROMPT,
+                self.temperature
+            ))
+            for chunk in stream:
+                text = getattr(chunk, "text", None)
+                if text:
+                    yield text
+    
+    def reset_conversation(self, session_id: str = DEFAULT_SESSION):
+        """Clear a session's conversation history."""
+        self.sessions.reset(session_id)
         logger.info("Conversation history cleared")
     
-    def get_conversation_history(self) -> List[Dict[str, str]]:
-        """Get full conversation history."""
-        return self.conversation_history
+    def get_conversation_history(self, session_id: str = DEFAULT_SESSION) -> List[Dict[str, str]]:
+        """Get a session's recent conversation history."""
+        return self.sessions.history(session_id)
+
+
+def create_vector_store(
+    backend: str = "pinecone",
+    pinecone_api_key: str | None = None,
+    pinecone_index_name: str | None = None,
+    pinecone_index=None,
+    upstream=None
+):
+    """
+    Convenience function to create the configured vector store backend.
+    
+    Args:
+        backend (str): "pinecone" or "local" (in-process NumPy index)
+        pinecone_api_key (str): Pinecone API key (pinecone backend only)
+        pinecone_index_name (str): Pinecone index name (pinecone backend only)
+        pinecone_index: Pre-built index client, e.g. an offline fake
+            (pinecone backend only)
+        upstream: Optional resilience.Upstream guarding queries (pinecone
+            backend only)
+        
+    Returns:
+        Vector store exposing upsert_embeddings/query_similar/delete_vectors/
+        clear_namespace/get_index_stats
+    """
+    if backend == "local":
+        from .local_store import LocalVectorStore
+        return LocalVectorStore()
+    
+    if backend != "pinecone":
+        raise ValueError(f"Unknown vector store backend: {backend}")
+    
+    from .pinecone_store import PineconeVectorStore
+    return PineconeVectorStore(
+        api_key=pinecone_api_key,
+        index_name=pinecone_index_name,
+        index=pinecone_index,
+        upstream=upstream
+    )
 
 
 def create_rag_chatbot(
@@ -251,7 +594,17 @@ def create_rag_chatbot(
     pinecone_index_name: str,
     embedder_instance,
     top_k: int = 5,
-    temperature: float = 0.3
+    temperature: float = 0.3,
+    vector_store=None,
+    backend: str = "pinecone",
+    response_cache=None,
+    session_store=None,
+    client=None,
+    coalesce: bool = True,
+    lexical_index=None,
+    rrf_k: int = 60,
+    generate_upstream=None,
+    vector_upstream=None
 ):
     """
     Convenience function to create a RAG chatbot instance.
@@ -263,23 +616,42 @@ def create_rag_chatbot(
         embedder_instance: Gemini embedder instance
         top_k (int): Number of documents to retrieve
         temperature (float): Generation temperature
+        vector_store: Existing vector store to share (built from `backend` if None)
+        backend (str): Vector store backend, "pinecone" or "local"
+        response_cache: Optional ResponseCache for repeated questions
+        session_store: Optional SessionStore for per-session history
+        client: Pre-built genai client (the shared one for google_api_key if None)
+        coalesce (bool): Share one pipeline run between concurrent identical queries
+        lexical_index: Optional LexicalIndex for hybrid (BM25 + vector) retrieval
+        rrf_k (int): Reciprocal-rank fusion constant for hybrid retrieval
+        generate_upstream: Optional resilience.Upstream guarding generation
+        vector_upstream: Optional resilience.Upstream guarding Pinecone
+            queries (only used when the vector store is built here)
         
     Returns:
         ChatbotRAG: Initialized RAG chatbot
     """
-    from .pinecone_store import PineconeVectorStore
-    
-    vector_store = PineconeVectorStore(
-        api_key=pinecone_api_key,
-        index_name=pinecone_index_name
-    )
+    if vector_store is None:
+        vector_store = create_vector_store(
+            backend,
+            pinecone_api_key=pinecone_api_key,
+            pinecone_index_name=pinecone_index_name,
+            upstream=vector_upstream
+        )
     
     chatbot = ChatbotRAG(
         google_api_key=google_api_key,
         vector_store=vector_store,
         embedder=embedder_instance,
         top_k=top_k,
-        temperature=temperature
+        temperature=temperature,
+        response_cache=response_cache,
+        session_store=session_store,
+        client=client,
+        coalesce=coalesce,
+        lexical_index=lexical_index,
+        rrf_k=rrf_k,
+        generate_upstream=generate_upstream
     )
     
     return chatbot
@@ -0,0 +1,121 @@
+"""
+Rate limiting helpers for calls to external APIs.
+Provides an adaptive token bucket that slows down when the API signals throttling.
+"""
+
+from typing import Optional
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Substrings that identify quota / throttling errors across SDK versions
+RATE_LIMIT_MARKERS = ("429", "resource_exhausted", "resource exhausted", "quota", "rate limit")
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Check whether an exception signals API throttling (HTTP 429 / quota exhausted).
+
+    Args:
+        error (Exception): Exception raised by an API call
+
+    Returns:
+        bool: True if the call should be retried after backing off
+    """
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code == 429:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with additive-increase / multiplicative-decrease.
+
+    Callers take one token per request. When the API throttles, `throttle()`
+    halves the refill rate; every successful call nudges it back up towards
+    the configured maximum.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        min_rate: float = 0.2
+    ):
+        """
+        Initialize token bucket.
+
+        Args:
+            rate (float): Maximum sustained requests per second
+            capacity (float): Burst size (defaults to max(1, rate))
+            min_rate (float): Floor for the adaptive rate when throttled
+        """
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Block until `tokens` are available.
+
+        Args:
+            tokens (float): Tokens to take
+            timeout (float): Give up after this many seconds (None waits forever)
+
+        Returns:
+            bool: True if tokens were taken, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill_locked()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """Like acquire(), but waits with asyncio.sleep so the event loop keeps running."""
+        while True:
+            with self._lock:
+                self._refill_locked()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def throttle(self, factor: float = 0.5):
+        """Multiplicatively reduce the rate and drain the bucket after a 429."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * factor)
+            self._tokens = 0.0
+            self._last = time.monotonic()
+        logger.warning(f"Rate limited by API; reducing request rate to {self.rate:.2f}/s")
+
+    def reward(self, step: float = 0.1):
+        """Additively restore the rate after a successful call."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + step * self.max_rate)
@@ -0,0 +1,388 @@
+"""
+Upstream resilience module.
+Circuit breakers and hedged requests for the services a query depends on
+(Gemini generation, Gemini embedding, Pinecone queries). Once an upstream's
+recent error rate crosses a threshold its breaker opens and calls fail fast,
+so callers go straight to their fallback (extractive answer, hash embedding,
+lexical search) instead of every query waiting out timeouts; after a
+cool-down a probe call is let through (half-open) to detect recovery.
+Hedging fires a duplicate call when the first is slower than the upstream's
+recent p95 and uses whichever answers first.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+
+from .metrics import CIRCUIT_STATE, UPSTREAM_CALLS
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Threads running hedged synchronous calls (both the original and the hedge)
+HEDGE_MAX_THREADS = 32
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker (closed -> open -> half-open -> closed)."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 10,
+        window_seconds: float = 30.0,
+        open_seconds: float = 15.0,
+        half_open_probes: int = 1,
+        ignore: Tuple[type, ...] = (TypeError,),
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize circuit breaker.
+
+        Args:
+            name (str): Upstream name (metrics label)
+            failure_rate (float): Failed fraction of recent calls that opens the circuit
+            min_calls (int): Calls needed in the window before the rate is trusted
+            window_seconds (float): Age of the oldest outcome counted
+            open_seconds (float): Time spent open before probing
+            half_open_probes (int): Concurrent probe calls allowed while half-open
+            ignore (Tuple[type]): Exceptions that say nothing about upstream
+                health (e.g. a TypeError from an SDK signature mismatch)
+            clock (Callable): Monotonic time source (tests)
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = max(1, min_calls)
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.ignore = ignore
+        self._clock = clock
+        self._outcomes: deque = deque()  # (timestamp, failed)
+        self._failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(0)
+
+    @property
+    def state(self) -> str:
+        """Current state ("closed", "half_open" or "open")."""
+        with self._lock:
+            self._refresh_locked(self._clock())
+            return self._state
+
+    def _set_state_locked(self, state: str, now: float):
+        if state == self._state:
+            return
+        logger.warning(f"Circuit breaker {self.name}: {self._state} -> {state}")
+        self._state = state
+        if state == OPEN:
+            self._opened_at = now
+            self.times_opened += 1
+        if state != HALF_OPEN:
+            self._probes = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+            self._failures = 0
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+    def _refresh_locked(self, now: float):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._set_state_locked(HALF_OPEN, now)
+
+    def allow(self) -> bool:
+        """
+        Ask to make a call; every allowed call must be followed by
+        record_success, record_failure or release.
+
+        Returns:
+            bool: False if the call should fail fast
+        """
+        with self._lock:
+            self._refresh_locked(self._clock())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            return False
+
+    def _record_locked(self, failed: bool, now: float):
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            _, old_failed = self._outcomes.popleft()
+            self._failures -= old_failed
+
+    def record_success(self):
+        """Record a successful call (closes a half-open circuit)."""
+        with self._lock:
+            now = self._clock()
+            if self._state == HALF_OPEN:
+                self._set_state_locked(CLOSED, now)
+            elif self._state == CLOSED:
+                self._record_locked(False, now)
+
+    def record_failure(self):
+        """Record a failed call; opens the circuit past the failure rate."""
+        with self._lock:
+            now = self._clock()
+            if self._state == HALF_OPEN:
+                self._set_state_locked(OPEN, now)
+                return
+            if self._state != CLOSED:
+                return
+            self._record_locked(True, now)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+                self._set_state_locked(OPEN, now)
+
+    def release(self):
+        """Give back an allowed call whose outcome says nothing about health."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """State, recent calls and failures, and how often the circuit opened."""
+        with self._lock:
+            self._refresh_locked(self._clock())
+            calls = len(self._outcomes)
+            return {
+                "state": self._state,
+                "recent_calls": calls,
+                "recent_failures": self._failures,
+                "failure_rate": (self._failures / calls) if calls else 0.0,
+                "times_opened": self.times_opened
+            }
+
+
+class LatencyTracker:
+    """Latencies of an upstream's most recent successful calls."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """q-quantile of the recorded latencies in seconds (None if empty)."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(HEDGE_MAX_THREADS, thread_name_prefix="hedge")
+        return _hedge_pool
+
+
+class Upstream:
+    """Circuit breaker, latency tracking and optional hedging for one upstream operation."""
+
+    def __init__(
+        self,
+        name: str,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.05,
+        hedge_min_samples: int = 20
+    ):
+        """
+        Initialize upstream guard.
+
+        Args:
+            name (str): Upstream name ("generate", "embed", "vector_query")
+            breaker (CircuitBreaker): Breaker consulted before every call (None disables it)
+            hedge (bool): Fire a second call when the first is slower than
+                the hedge_quantile of recent latencies
+            hedge_quantile (float): Latency quantile used as the hedge delay
+            hedge_min_delay (float): Lower bound on the hedge delay in seconds
+            hedge_min_samples (int): Latencies needed before hedging starts
+        """
+        self.name = name
+        self.breaker = breaker
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        self.hedges = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging a call, or None if it should not be hedged."""
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latency.quantile(self.hedge_quantile))
+
+    @contextmanager
+    def attempt(self) -> Iterator[None]:
+        """
+        Guard a block that calls the upstream (e.g. iterating a stream).
+
+        Raises:
+            CircuitOpenError: The circuit is open; the block does not run
+        """
+        if self.breaker is not None and not self.breaker.allow():
+            UPSTREAM_CALLS.labels(self.name, "rejected").inc()
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            yield
+        except BaseException as e:
+            breaker = self.breaker
+            if isinstance(e, Exception) and not (breaker is not None and isinstance(e, breaker.ignore)):
+                UPSTREAM_CALLS.labels(self.name, "failure").inc()
+                if breaker is not None:
+                    breaker.record_failure()
+            elif breaker is not None:
+                # Cancelled, or an error on our side rather than the upstream's
+                breaker.release()
+            raise
+        UPSTREAM_CALLS.labels(self.name, "success").inc()
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def _timed(self, fn: Callable[..., Any], args, kwargs) -> Any:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.latency.record(time.perf_counter() - start)
+        return result
+
+    def _hedged(self, fn: Callable[..., Any], args, kwargs, delay: float) -> Any:
+        pool = _pool()
+        first = pool.submit(self._timed, fn, args, kwargs)
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+
+        self.hedges += 1
+        UPSTREAM_CALLS.labels(self.name, "hedged").inc()
+        second = pool.submit(self._timed, fn, args, kwargs)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self.hedges_won += 1
+                        UPSTREAM_CALLS.labels(self.name, "hedge_won").inc()
+                    # The slower call cannot be interrupted; it finishes in the background
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, fn: Callable[..., Any], *args, hedge: bool = True, **kwargs) -> Any:
+        """
+        Call `fn(*args, **kwargs)` through the breaker, hedging it when enabled.
+
+        Args:
+            fn (Callable): Upstream call
+            hedge (bool): Allow hedging and record the latency (pass False for
+                calls unlike the usual ones, e.g. large ingest batches)
+
+        Raises:
+            CircuitOpenError: The circuit is open
+        """
+        with self.attempt():
+            delay = self.hedge_delay() if hedge else None
+            if delay is not None:
+                return self._hedged(fn, args, kwargs, delay)
+            if not hedge:
+                return fn(*args, **kwargs)
+            return self._timed(fn, args, kwargs)
+
+    async def _atimed(self, fn: Callable[..., Awaitable[Any]], args, kwargs) -> Any:
+        start = time.perf_counter()
+        result = await fn(*args, **kwargs)
+        self.latency.record(time.perf_counter() - start)
+        return result
+
+    async def _ahedged(self, fn: Callable[..., Awaitable[Any]], args, kwargs, delay: float) -> Any:
+        pending = {asyncio.ensure_future(self._atimed(fn, args, kwargs))}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return done.pop().result()
+
+            self.hedges += 1
+            UPSTREAM_CALLS.labels(self.name, "hedged").inc()
+            second = asyncio.ensure_future(self._atimed(fn, args, kwargs))
+            pending.add(second)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedges_won += 1
+                            UPSTREAM_CALLS.labels(self.name, "hedge_won").inc()
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, fn: Callable[..., Awaitable[Any]], *args, hedge: bool = True, **kwargs) -> Any:
+        """
+        Async variant of call for coroutine functions; the losing hedged
+        call is cancelled.
+
+        Raises:
+            CircuitOpenError: The circuit is open
+        """
+        with self.attempt():
+            delay = self.hedge_delay() if hedge else None
+            if delay is not None:
+                return await self._ahedged(fn, args, kwargs, delay)
+            if not hedge:
+                return await fn(*args, **kwargs)
+            return await self._atimed(fn, args, kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state, hedge delay and hedge counters."""
+        delay = self.hedge_delay()
+        return {
+            "circuit": self.breaker.stats() if self.breaker is not None else None,
+            "hedging": self.hedge,
+            "hedge_delay_ms": round(delay * 1000, 2) if delay is not None else None,
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won
+        }
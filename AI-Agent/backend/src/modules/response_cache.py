@@ -0,0 +1,287 @@
+"""
+Response cache module.
+Serves repeated questions without an LLM call: an exact tier keyed by the
+normalized query and a semantic tier that reuses an answer whose query
+embedding is close enough to the new query's embedding.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+from .gemini_embedder import is_fallback_embedding
+from .metrics import CACHE_LOOKUPS
+from .timing import stage
+
+logger = logging.getLogger(__name__)
+
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing ?!. so trivial variants share a key."""
+    text = _WHITESPACE.sub(" ", (query or "").strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+class ResponseCache:
+    """In-memory LRU cache of RAG answers with TTL expiry."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.95
+    ):
+        """
+        Initialize response cache.
+
+        Args:
+            max_entries (int): Cached answers kept before the least recently
+                used one is evicted
+            ttl_seconds (float): Lifetime of a cached answer
+            similarity_threshold (float): Minimum cosine similarity between
+                query embeddings for a semantic hit (> 1 disables the tier)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Stacked unit query embeddings, rebuilt lazily after changes
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now >= entry["expires_at"]
+
+    def _touch_locked(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a live entry and mark it most recently used (drops expired entries)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry, time.monotonic()):
+            del self._entries[key]
+            self._matrix = None
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Exact-tier lookup.
+
+        Args:
+            query (str): Sanitized user query
+
+        Returns:
+            Optional[Dict]: Cached result, or None on a miss
+        """
+        with self._lock:
+            entry = self._touch_locked(normalize_query(query))
+            if entry is None:
+                return None
+            self.exact_hits += 1
+            return entry["result"]
+
+    def get_similar(self, embedding: Sequence[float]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Semantic-tier lookup.
+
+        Args:
+            embedding (Sequence[float]): Embedding of the new query
+
+        Returns:
+            Optional[Tuple[Dict, float]]: (cached result, similarity), or None on a miss
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        with self._lock:
+            if self.similarity_threshold > 1 or norm == 0 or not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._rebuild_matrix_locked()
+            if self._matrix is None or self._matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+
+            scores = self._matrix @ (query / norm)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry = self._touch_locked(self._matrix_keys[best])
+            if entry is None:
+                self.misses += 1
+                return None
+            self.semantic_hits += 1
+            return entry["result"], similarity
+
+    def _rebuild_matrix_locked(self):
+        now = time.monotonic()
+        keys = [
+            key for key, entry in self._entries.items()
+            if entry["embedding"] is not None and not self._expired(entry, now)
+        ]
+        if not keys:
+            self._matrix, self._matrix_keys = None, []
+            return
+        self._matrix = np.stack([self._entries[key]["embedding"] for key in keys])
+        self._matrix_keys = keys
+
+    def put(
+        self,
+        query: str,
+        result: Dict[str, Any],
+        embedding: Optional[Sequence[float]] = None
+    ):
+        """
+        Cache an answer.
+
+        Args:
+            query (str): Sanitized user query
+            result (Dict): answer_query result to serve on later hits
+            embedding (Sequence[float]): Query embedding for the semantic tier
+        """
+        unit = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = float(np.linalg.norm(vector))
+            if norm > 0:
+                unit = vector / norm
+
+        with self._lock:
+            key = normalize_query(query)
+            self._entries[key] = {
+                "result": result,
+                "embedding": unit,
+                "expires_at": time.monotonic() + self.ttl_seconds
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    # ----- answer pipeline helpers (sync and async RAG paths) -----
+
+    def lookup_exact(self, query: str) -> Optional[Dict[str, Any]]:
+        """Exact-tier lookup timed as the "cache" stage; only a hit is counted in metrics."""
+        with stage("cache"):
+            cached = self.get(query)
+        if cached is not None:
+            CACHE_LOOKUPS.labels("response", "exact").inc()
+        return cached
+
+    def lookup_similar(self, embedding: Optional[Sequence[float]]) -> Optional[Dict[str, Any]]:
+        """
+        Semantic-tier lookup after an exact miss; counts the semantic hit or miss.
+
+        Hash fallback embeddings (embedding outage) carry no meaning and would
+        match unrelated queries, so they always miss.
+        """
+        similar = None
+        if embedding is not None and len(embedding) and not is_fallback_embedding(embedding):
+            with stage("cache"):
+                similar = self.get_similar(embedding)
+        else:
+            with self._lock:
+                self.misses += 1
+        CACHE_LOOKUPS.labels("response", "semantic" if similar else "miss").inc()
+        return similar[0] if similar else None
+
+    def lookup(
+        self,
+        query: str,
+        embed: Callable[[str], Sequence[float]]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[Sequence[float]]]:
+        """
+        Exact lookup, then (embedding the query only on a miss) semantic lookup.
+
+        Args:
+            query (str): Sanitized user query
+            embed (Callable): Query text -> embedding
+
+        Returns:
+            Tuple: (cached result or None, cache tier, query embedding or None)
+        """
+        cached = self.lookup_exact(query)
+        if cached is not None:
+            return cached, "exact", None
+        with stage("embed"):
+            embedding = embed(query)
+        cached = self.lookup_similar(embedding)
+        return cached, ("semantic" if cached is not None else None), embedding
+
+    def store_answer(
+        self,
+        query: str,
+        response: str,
+        documents: List[Dict[str, Any]],
+        context_length: int,
+        embedding: Optional[Sequence[float]] = None,
+        generated: bool = True
+    ):
+        """
+        Cache a generated answer. Fallback answers (generated=False) and
+        answers without context are skipped, and fallback query embeddings
+        are not used as semantic keys.
+        """
+        if not generated or not documents:
+            return
+        if embedding is not None and is_fallback_embedding(embedding):
+            embedding = None
+        self.put(query, {
+            "response": response,
+            "context_documents": documents,
+            "context_length": context_length
+        }, embedding=embedding)
+
+    def invalidate(self):
+        """Drop every cached answer (e.g. after the index was rebuilt)."""
+        with self._lock:
+            self._entries.clear()
+            self._matrix, self._matrix_keys = None, []
+            self.invalidations += 1
+        logger.info("Response cache invalidated")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dict: entries, exact/semantic hits, misses, hit_rate, evictions
+        """
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
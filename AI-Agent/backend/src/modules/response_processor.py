@@ -5,12 +5,25 @@ Enhances formatting, tone, and overall helpfulness of responses.
 
 import re
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from src.config.system_prompt import RESPONSE_TEMPLATES
 
 logger = logging.getLogger(__name__)
 
 
+# Patterns are compiled once; each pass is skipped when its marker is absent
+_CODE_BLOCK = re.compile(r'```.*?```', flags=re.DOTALL)
+_EXTRA_NEWLINES = re.compile(r'\n\n\n+')
+_BOLD_STARS = re.compile(r'\*\*(.*?)\*\*')
+_BOLD_UNDERSCORES = re.compile(r'__(.*?)__')
+_BULLET = re.compile(r'^\s*[\*\-]\s+', flags=re.MULTILINE)
+_NUMBERED = re.compile(r'^\s*(\d+)\.\s+', flags=re.MULTILINE)
+_PERSONALITY_WORDS = re.compile(r'switch|game|play|nintendo|pokemon', flags=re.IGNORECASE | re.ASCII)
+_REPEATED_PUNCTUATION = re.compile(r'([.!?])\1+')
+_SPACE_BEFORE_PUNCTUATION = re.compile(r'\s+([.,!?])')
+_NO_SPACE_AFTER_PUNCTUATION = re.compile(r'([.,!?])([^ ])')
+
+
 class ResponseProcessor:
     """Processes and enhances chatbot responses for better quality."""
     
@@ -60,10 +73,12 @@ class ResponseProcessor:
     def _clean_response(self, response: str) -> str:
         """Remove artifacts and clean up response text."""
         # Remove markdown code blocks if present
-        response = re.sub(r'```.*?```', '', response, flags=re.DOTALL)
+        if "```" in response:
+            response = _CODE_BLOCK.sub('', response)
         
         # Remove excessive newlines
-        response = re.sub(r'\n\n\n+', '\n\n', response)
+        if "\n\n\n" in response:
+            response = _EXTRA_NEWLINES.sub('\n\n', response)
         
         # Remove leading/trailing whitespace
         response = response.strip()
@@ -98,17 +113,17 @@ class ResponseProcessor:
     def _improve_formatting(self, response: str) -> str:
         """Improve response formatting and readability."""
         # Convert markdown bold to more casual style
-        response = re.sub(r'\*\*(.*?)\*\*', r'\1', response)
-        response = re.sub(r'__(.*?)__', r'\1', response)
+        if "**" in response:
+            response = _BOLD_STARS.sub(r'\1', response)
+        if "__" in response:
+            response = _BOLD_UNDERSCORES.sub(r'\1', response)
         
         # Ensure bullet points are clean
-        response = re.sub(r'^\s*[\*\-]\s+', '• ', response, flags=re.MULTILINE)
-        
-        # Add proper spacing around lists
-        response = re.sub(r'(\n•.*?)\n(?!\n|•)', r'\1\n', response)
+        if "*" in response or "-" in response:
+            response = _BULLET.sub('• ', response)
         
         # Ensure numbers in lists are formatted properly
-        response = re.sub(r'^\s*(\d+)\.\s+', r'\1. ', response, flags=re.MULTILINE)
+        response = _NUMBERED.sub(r'\1. ', response)
         
         return response
     
@@ -116,9 +131,8 @@ class ResponseProcessor:
         """Add friendly personality to response."""
         # Keep responses short and snappy
         # Only add emoji if it contains Nintendo-related words
-        if any(word in response.lower() for word in ["switch", "game", "play", "nintendo", "pokemon"]):
-            if "🎮" not in response:
-                response += " 🎮"
+        if "🎮" not in response and _PERSONALITY_WORDS.search(response):
+            response += " 🎮"
         
         return response
     
@@ -140,11 +154,11 @@ class ResponseProcessor:
             return response
         
         # Fix double punctuation
-        response = re.sub(r'([.!?])\1+', r'\1', response)
+        response = _REPEATED_PUNCTUATION.sub(r'\1', response)
         
         # Fix spacing around punctuation
-        response = re.sub(r'\s+([.,!?])', r'\1', response)
-        response = re.sub(r'([.,!?])([^ ])', r'\1 \2', response)
+        response = _SPACE_BEFORE_PUNCTUATION.sub(r'\1', response)
+        response = _NO_SPACE_AFTER_PUNCTUATION.sub(r'\1 \2', response)
         
         return response
     
@@ -171,6 +185,99 @@ class ResponseProcessor:
         }
 
 
+# Stateless, so one instance is shared by every request
+_DEFAULT_PROCESSOR = ResponseProcessor()
+
+
+class StreamingResponseProcessor:
+    """
+    Applies ResponseProcessor to a response that arrives in pieces.
+    
+    Text is released only up to the last line or sentence boundary, outside
+    open code blocks and bold markers, so cleanup and formatting see complete
+    units. finish() runs the full processor on the whole text; its result is
+    authoritative and may differ from the streamed prefix (e.g. truncation).
+    """
+    
+    # Sentence or line endings after which already-streamed text is stable
+    BOUNDARY = re.compile(r'(?:[.!?](?=\s)|\n)')
+    
+    def __init__(self, processor: Optional[ResponseProcessor] = None, max_length: int = 500):
+        """
+        Initialize streaming processor.
+        
+        Args:
+            processor (ResponseProcessor): Processor to apply (new one if None)
+            max_length (int): Stop streaming once the cleaned text reaches this length
+        """
+        self.processor = processor or _DEFAULT_PROCESSOR
+        self.max_length = max_length
+        self.raw = ""
+        self.emitted = ""
+        self._stable = 0
+        self._capped = False
+    
+    def _stable_end(self) -> int:
+        """Index in the raw text up to which processing will not change."""
+        end = 0
+        for match in self.BOUNDARY.finditer(self.raw):
+            end = match.end()
+        prefix = self.raw[:end]
+        if prefix.count("```") % 2 or prefix.count("**") % 2:
+            return 0
+        return end
+    
+    def feed(self, text: str) -> str:
+        """
+        Add a chunk of raw LLM output.
+        
+        Args:
+            text (str): Newly received text
+            
+        Returns:
+            str: Processed text to send to the client now (may be empty)
+        """
+        self.raw += text
+        if self._capped:
+            return ""
+        end = self._stable_end()
+        # Only reprocess once another sentence or line has completed
+        if end <= self._stable:
+            return ""
+        self._stable = end
+        
+        processed = self.processor._improve_formatting(
+            self.processor._clean_response(self.raw[:end])
+        )
+        if len(processed) > self.max_length:
+            # Truncation happens in finish(); nothing more is streamed
+            self._capped = True
+            return ""
+        if not processed.startswith(self.emitted):
+            return ""
+        delta = processed[len(self.emitted):]
+        self.emitted = processed
+        return delta
+    
+    def finish(
+        self,
+        query: str = "",
+        context_docs: int = 0,
+        conversation_turn: int = 1
+    ) -> Tuple[str, str, bool]:
+        """
+        Process the complete response.
+        
+        Returns:
+            Tuple[str, str, bool]: (remaining text to send, final response,
+                whether the client must replace what it has shown)
+        """
+        final = self.processor.process_response(self.raw, query, context_docs, conversation_turn)
+        if final.startswith(self.emitted):
+            return final[len(self.emitted):], final, False
+        return "", final, True
+
+
 def enhance_response(
     response: str,
     query: str = "",
@@ -189,8 +296,7 @@ def enhance_response(
     Returns:
         str: Enhanced response
     """
-    processor = ResponseProcessor()
-    return processor.process_response(response, query, context_docs, turn)
+    return _DEFAULT_PROCESSOR.process_response(response, query, context_docs, turn)
 
 
 def is_response_quality_good(response: str) -> bool:
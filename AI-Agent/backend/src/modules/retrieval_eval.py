@@ -0,0 +1,93 @@
+"""
+Retrieval quality module.
+Scores a vector store against a golden query set (questions with the pages
+that should answer them) and against an exact reference index, so a
+compact index layout (truncation, int8, prefix search) can be checked
+before it is switched on.
+"""
+
+from typing import Any, Callable, Dict, List, Sequence
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def load_golden_queries(path: str) -> List[Dict[str, Any]]:
+    """
+    Load a golden query set.
+
+    Args:
+        path (str): JSON file with a list of {"query", "expected_urls"} records
+
+    Returns:
+        List[Dict]: Golden queries
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    return [item for item in golden if item.get("query") and item.get("expected_urls")]
+
+
+def _page_url(match: Dict[str, Any]) -> str:
+    metadata = match.get("metadata") or {}
+    return metadata.get("parent_url") or metadata.get("url") or match.get("id", "")
+
+
+def golden_hit_rate(
+    store,
+    embed: Callable[[str], Sequence[float]],
+    golden: List[Dict[str, Any]],
+    top_k: int = 3
+) -> Dict[str, float]:
+    """
+    Share of golden queries that retrieve an expected page.
+
+    Args:
+        store: Vector store (query_similar)
+        embed (Callable): Query text -> embedding
+        golden (List[Dict]): Golden queries (see load_golden_queries)
+        top_k (int): Results considered per query
+
+    Returns:
+        Dict: hit_rate (an expected page in the top_k) and mrr (mean
+            reciprocal rank of the first expected page) over the queries
+    """
+    hits = 0
+    reciprocal_ranks = 0.0
+    for item in golden:
+        expected = set(item["expected_urls"])
+        urls = [_page_url(match) for match in store.query_similar(embed(item["query"]), top_k=top_k)]
+        rank = next((n for n, url in enumerate(urls, 1) if url in expected), None)
+        if rank is not None:
+            hits += 1
+            reciprocal_ranks += 1.0 / rank
+    count = len(golden) or 1
+    return {"queries": len(golden), "hit_rate": hits / count, "mrr": reciprocal_ranks / count}
+
+
+def recall_at_k(
+    store,
+    reference,
+    query_embeddings: Sequence[Sequence[float]],
+    top_k: int = 10
+) -> float:
+    """
+    Mean share of the reference store's top_k IDs that `store` also returns.
+
+    Args:
+        store: Vector store under test (query_similar)
+        reference: Exact store holding the same vectors (e.g. float32, full dimension)
+        query_embeddings (Sequence): Query embeddings
+        top_k (int): Results compared per query
+
+    Returns:
+        float: Recall in [0, 1] (1.0 for no queries)
+    """
+    recalls = []
+    for embedding in query_embeddings:
+        expected = {match["id"] for match in reference.query_similar(embedding, top_k=top_k)}
+        if not expected:
+            continue
+        found = {match["id"] for match in store.query_similar(embedding, top_k=top_k)}
+        recalls.append(len(expected & found) / len(expected))
+    return sum(recalls) / len(recalls) if recalls else 1.0
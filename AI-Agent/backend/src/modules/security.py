@@ -5,25 +5,65 @@ Validates user input and protects the chatbot from exploitation.
 
 import re
 import logging
-from typing import Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from src.config.system_prompt import (
     JAILBREAK_KEYWORDS,
     SUSPICIOUS_PATTERNS,
     OUTSIDE_SCOPE_TOPICS,
     SAFETY_RESPONSES
 )
+from src.modules.text_matcher import KeywordPatternMatcher
+from src.modules.metrics import SECURITY_BLOCKS
 
 logger = logging.getLogger(__name__)
 
 
+def build_threat_matcher(
+    jailbreak_keywords=JAILBREAK_KEYWORDS,
+    suspicious_patterns=SUSPICIOUS_PATTERNS,
+    outside_scope_topics=OUTSIDE_SCOPE_TOPICS
+) -> KeywordPatternMatcher:
+    """Compile the keyword lists and patterns into one matcher."""
+    return KeywordPatternMatcher(
+        keywords={
+            "jailbreak_detected": jailbreak_keywords,
+            "outside_scope": outside_scope_topics
+        },
+        patterns={"suspicious_pattern_detected": suspicious_patterns}
+    )
+
+
+# Compiled once at import; shared by every validator
+THREAT_MATCHER = build_threat_matcher()
+
+_WHITESPACE = re.compile(r'\s+')
+_UNSAFE_CHARS = re.compile(r'[^a-zA-Z0-9\s\?\!\.\,\-\(\)&]')
+
+
 class SecurityValidator:
     """Validates queries for security threats and jailbreak attempts."""
     
-    def __init__(self):
-        """Initialize security validator with compiled regex patterns."""
-        self.jailbreak_keywords = [kw.lower() for kw in JAILBREAK_KEYWORDS]
-        self.suspicious_patterns = [re.compile(pattern) for pattern in SUSPICIOUS_PATTERNS]
-        self.outside_scope_topics = [topic.lower() for topic in OUTSIDE_SCOPE_TOPICS]
+    def __init__(self, matcher: Optional[KeywordPatternMatcher] = None):
+        """
+        Initialize security validator.
+        
+        Args:
+            matcher (KeywordPatternMatcher): Precompiled matcher (the shared
+                module-level THREAT_MATCHER if None)
+        """
+        self.matcher = matcher or THREAT_MATCHER
+    
+    def scan(self, query: str) -> Dict[str, List[str]]:
+        """
+        Find every threat category in a query in one pass.
+        
+        Args:
+            query (str): User query
+            
+        Returns:
+            Dict[str, List[str]]: Threat type -> matched keywords/patterns
+        """
+        return self.matcher.scan(query)
     
     def validate_query(self, query: str) -> Tuple[bool, Optional[str]]:
         """
@@ -46,41 +86,35 @@ class SecurityValidator:
         if len(query_lower) < 2:
             return False, "Query too short"
         
-        # Check for jailbreak keywords
-        for keyword in self.jailbreak_keywords:
-            if keyword in query_lower:
-                logger.warning(f"Jailbreak attempt detected: keyword '{keyword}' found in query")
-                return False, "jailbreak_detected"
+        # One pass finds keyword, pattern and topic hits together
+        hits = self.scan(query)
+        
+        if "jailbreak_detected" in hits:
+            logger.warning(f"Jailbreak attempt detected: keyword '{hits['jailbreak_detected'][0]}' found in query")
+            return False, "jailbreak_detected"
         
-        # Check for suspicious patterns
-        for pattern in self.suspicious_patterns:
-            if pattern.search(query):
-                logger.warning(f"Suspicious pattern detected in query: {pattern.pattern}")
-                return False, "suspicious_pattern_detected"
+        if "suspicious_pattern_detected" in hits:
+            logger.warning(f"Suspicious pattern detected in query: {hits['suspicious_pattern_detected'][0]}")
+            return False, "suspicious_pattern_detected"
         
-        # Check for outside scope topics
-        for topic in self.outside_scope_topics:
-            if topic in query_lower:
-                logger.info(f"Query about outside scope topic: {topic}")
-                return False, "outside_scope"
+        if "outside_scope" in hits:
+            logger.info(f"Query about outside scope topic: {hits['outside_scope'][0]}")
+            return False, "outside_scope"
         
         # If all checks pass, query is valid
         return True, None
     
     def is_jailbreak_attempt(self, query: str) -> bool:
-        """Quick check if query is a jailbreak attempt."""
-        is_valid, threat_type = self.validate_query(query)
-        return not is_valid and threat_type == "jailbreak_detected"
+        """Quick check if query contains a jailbreak keyword."""
+        return isinstance(query, str) and "jailbreak_detected" in self.scan(query)
     
     def is_suspicious(self, query: str) -> bool:
         """Quick check if query has suspicious patterns."""
-        is_valid, threat_type = self.validate_query(query)
-        return not is_valid and threat_type == "suspicious_pattern_detected"
+        return isinstance(query, str) and "suspicious_pattern_detected" in self.scan(query)
     
     def is_outside_scope(self, query: str) -> bool:
         """Quick check if query is outside chatbot's scope."""
-        is_valid, threat_type = self.validate_query(query)
-        return not is_valid and threat_type == "outside_scope"
+        return isinstance(query, str) and "outside_scope" in self.scan(query)
     
     def get_safety_response(self, threat_type: Optional[str]) -> str:
         """
@@ -108,14 +142,17 @@ class SecurityValidator:
             str: Sanitized query
         """
         # Remove excessive whitespace
-        query = re.sub(r'\s+', ' ', query).strip()
+        query = _WHITESPACE.sub(' ', query).strip()
         
         # Remove any dangerous characters but keep safe punctuation
-        safe_chars = re.sub(r'[^a-zA-Z0-9\s\?\!\.\,\-\(\)&]', '', query)
+        safe_chars = _UNSAFE_CHARS.sub('', query)
         
         return safe_chars.strip()
 
 
+_VALIDATOR = SecurityValidator()
+
+
 def validate_and_sanitize(query: str) -> Tuple[bool, str]:
     """
     Convenience function to validate and sanitize a query.
@@ -128,12 +165,13 @@ def validate_and_sanitize(query: str) -> Tuple[bool, str]:
             - is_valid: True if query passed security validation
             - processed_query: Sanitized query if valid, or safety response if invalid
     """
-    validator = SecurityValidator()
+    validator = _VALIDATOR
     is_valid, threat_type = validator.validate_query(query)
     
     if not is_valid:
         safety_response = validator.get_safety_response(threat_type)
         logger.warning(f"Query blocked due to: {threat_type}")
+        SECURITY_BLOCKS.labels(threat_type).inc()
         return False, safety_response
     
     sanitized_query = validator.sanitize_query(query)
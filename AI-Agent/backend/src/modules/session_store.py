@@ -0,0 +1,238 @@
+"""
+Conversation session store module.
+Keeps each client's conversation separately, in a ring buffer of recent
+messages, and evicts sessions that have been idle too long. Sessions can
+optionally be written through to SQLite so they survive restarts.
+"""
+
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Any, List, Optional
+import json
+import logging
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Client-supplied session IDs must look like the ones we hand out
+_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,128}$")
+
+
+def is_valid_session_id(session_id: Optional[str]) -> bool:
+    """Check that a client-supplied session ID is safe to use as a key."""
+    return bool(session_id) and bool(_SESSION_ID_PATTERN.match(session_id))
+
+
+def new_session_id() -> str:
+    """Generate a random, URL-safe session ID."""
+    return secrets.token_urlsafe(16)
+
+
+class _Session:
+    """Recent messages of one conversation plus bookkeeping."""
+
+    __slots__ = ("messages", "turns", "last_access", "size_bytes")
+
+    def __init__(self, max_messages: int):
+        self.messages: Deque[Dict[str, str]] = deque(maxlen=max_messages)
+        self.turns = 0
+        self.last_access = time.time()
+        self.size_bytes = 0
+
+    @staticmethod
+    def _message_size(message: Dict[str, str]) -> int:
+        return len(message["role"]) + len(message["content"].encode("utf-8"))
+
+    def append(self, message: Dict[str, str]):
+        if len(self.messages) == self.messages.maxlen:
+            self.size_bytes -= self._message_size(self.messages[0])
+        self.messages.append(message)
+        self.size_bytes += self._message_size(message)
+
+
+class SessionStore:
+    """Per-session conversation history with bounded memory."""
+
+    def __init__(
+        self,
+        max_turns: int = 20,
+        idle_ttl_seconds: float = 1800,
+        max_sessions: int = 10000,
+        path: Optional[str] = None,
+        read_through: bool = False
+    ):
+        """
+        Initialize session store.
+
+        Args:
+            max_turns (int): Question/answer pairs kept per session (older
+                ones are dropped)
+            idle_ttl_seconds (float): Sessions idle for longer are evicted
+            max_sessions (int): Sessions kept in memory; the least recently
+                used are dropped from memory (but stay on disk, if persisted)
+            path (str): Optional SQLite file that sessions are written to
+            read_through (bool): Always read sessions from the SQLite file
+                instead of memory, for several processes sharing one file
+        """
+        self.max_messages = max(2, max_turns * 2)
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_sessions = max_sessions
+        self.path = path
+        self.read_through = read_through and bool(path)
+        self.evictions = 0
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if path:
+            directory = os.path.dirname(path)
+            if path != ":memory:" and directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, messages TEXT NOT NULL, "
+                "turns INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _expired(self, session: _Session, now: float) -> bool:
+        return now - session.last_access > self.idle_ttl_seconds
+
+    def _load_locked(self, session_id: str) -> Optional[_Session]:
+        """Fetch a session from memory, falling back to disk."""
+        session = None if self.read_through else self._sessions.get(session_id)
+        if session is None and self._conn is not None:
+            row = self._conn.execute(
+                "SELECT messages, turns, last_access FROM sessions WHERE id = ?",
+                (session_id,)
+            ).fetchone()
+            if row:
+                session = _Session(self.max_messages)
+                for message in json.loads(row[0]):
+                    session.append(message)
+                session.turns = row[1]
+                session.last_access = row[2]
+                self._sessions[session_id] = session
+
+        if session is not None and self._expired(session, time.time()):
+            self._drop_locked(session_id)
+            return None
+        return session
+
+    def _drop_locked(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._conn.commit()
+        self.evictions += 1
+
+    def _save_locked(self, session_id: str, session: _Session):
+        if self._conn is None:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, messages, turns, last_access) VALUES (?, ?, ?, ?)",
+            (session_id, json.dumps(list(session.messages)), session.turns, session.last_access)
+        )
+        self._conn.commit()
+
+    def _sweep_locked(self):
+        """Evict idle sessions (at most once a minute) and enforce max_sessions."""
+        now = time.monotonic()
+        if now - self._last_sweep >= min(60.0, self.idle_ttl_seconds):
+            self._last_sweep = now
+            wall = time.time()
+            for session_id in [sid for sid, s in self._sessions.items() if self._expired(s, wall)]:
+                self._drop_locked(session_id)
+            if self._conn is not None:
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE last_access < ?",
+                    (wall - self.idle_ttl_seconds,)
+                )
+                self._conn.commit()
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def append(self, session_id: str, role: str, content: str):
+        """
+        Add a message to a session (created on first use).
+
+        Args:
+            session_id (str): Session ID
+            role (str): "user" or "assistant"
+            content (str): Message text
+        """
+        with self._lock:
+            session = self._load_locked(session_id)
+            if session is None:
+                session = _Session(self.max_messages)
+                self._sessions[session_id] = session
+            session.append({"role": role, "content": content})
+            if role == "assistant":
+                session.turns += 1
+            session.last_access = time.time()
+            self._sessions.move_to_end(session_id)
+            self._save_locked(session_id, session)
+            self._sweep_locked()
+
+    def __len__(self) -> int:
+        """Number of sessions held in memory."""
+        return len(self._sessions)
+    
+    def history(self, session_id: str) -> List[Dict[str, str]]:
+        """Recent messages of a session, oldest first (empty if unknown)."""
+        with self._lock:
+            session = self._load_locked(session_id)
+            return list(session.messages) if session else []
+
+    def turn_count(self, session_id: str) -> int:
+        """Number of answered turns in a session, including dropped ones."""
+        with self._lock:
+            session = self._load_locked(session_id)
+            return session.turns if session else 0
+
+    def reset(self, session_id: str):
+        """Forget a session's conversation."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get session counters.
+
+        Returns:
+            Dict: session count, total/average/max bytes of message text held
+                in memory, limits and evictions
+        """
+        with self._lock:
+            sizes = [s.size_bytes for s in self._sessions.values()]
+            return {
+                "sessions": len(sizes),
+                "memory_bytes": sum(sizes),
+                "avg_session_bytes": (sum(sizes) / len(sizes)) if sizes else 0.0,
+                "max_session_bytes": max(sizes) if sizes else 0,
+                "max_turns": self.max_messages // 2,
+                "max_sessions": self.max_sessions,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "persistent": self._conn is not None,
+                "read_through": self.read_through,
+                "evictions": self.evictions
+            }
+
+    def close(self):
+        """Close the underlying database connection, if any."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,126 @@
+"""
+Cross-worker backend state module.
+When the API runs under a pre-fork server (several worker processes), each
+worker has its own chatbot, embedder and vector store. This module keeps the
+state they must agree on in a small directory on disk: whether the backend
+has been initialized, a generation number bumped after every ingest (so
+workers know to reload the index snapshot) and an exclusive ingest lock.
+"""
+
+from datetime import datetime
+from typing import Dict, Any, Optional
+import json
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process serving only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "backend_state.json"
+INGEST_LOCK_FILE = "ingest.lock"
+
+
+class SharedState:
+    """Initialization state and ingest lock shared by all worker processes."""
+
+    def __init__(self, directory: str):
+        """
+        Initialize shared state.
+
+        Args:
+            directory (str): Directory visible to every worker (created if missing)
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, STATE_FILE)
+        self._lock_path = os.path.join(directory, INGEST_LOCK_FILE)
+        self._lock_fd: Optional[int] = None
+        self._thread_lock = threading.Lock()
+        self._cached_version: Optional[tuple] = None
+        self._cached: Dict[str, Any] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def read(self) -> Dict[str, Any]:
+        """
+        Current shared state; re-read from disk only when the file changed.
+
+        Returns:
+            Dict: initialized (bool), generation (int), backend, updated_at
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return {"initialized": False, "generation": 0}
+
+        # publish() replaces the file, so a new inode or mtime means new contents
+        version = (st.st_ino, st.st_mtime_ns)
+        if version != self._cached_version:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._cached = json.load(f)
+                self._cached_version = version
+            except (OSError, ValueError) as e:
+                # A replace raced with the read; keep the last good state
+                logger.debug(f"Unable to read shared state: {e}")
+        return self._cached or {"initialized": False, "generation": 0}
+
+    def publish(self, backend: str) -> int:
+        """
+        Record that the index changed (or was first built), so other workers
+        initialize or reload.
+
+        Args:
+            backend (str): Vector store backend the index lives in
+
+        Returns:
+            int: New generation number
+        """
+        generation = int(self.read().get("generation", 0)) + 1
+        state = {
+            "initialized": True,
+            "generation": generation,
+            "backend": backend,
+            "pid": os.getpid(),
+            "updated_at": datetime.now().isoformat()
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+        return generation
+
+    def try_lock_ingest(self) -> bool:
+        """
+        Take the ingest lock without blocking.
+
+        Returns:
+            bool: True if this process now holds the lock (release with
+                unlock_ingest), False if another worker is ingesting
+        """
+        with self._thread_lock:
+            if self._lock_fd is not None:
+                return False
+            fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    return False
+            self._lock_fd = fd
+            return True
+
+    def unlock_ingest(self):
+        """Release the ingest lock taken by try_lock_ingest."""
+        with self._thread_lock:
+            if self._lock_fd is None:
+                return
+            if fcntl is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
@@ -0,0 +1,138 @@
+"""
+Request coalescing module.
+When identical questions arrive at the same time (e.g. right after an
+announcement), only the first runs the embed -> retrieve -> generate
+pipeline; the others wait for it and share its result. Keys are normalized
+queries, so trivial variants ("Price?" / "price") coalesce too.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Tuple
+import asyncio
+import threading
+
+from .metrics import COALESCED_QUERIES
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key across threads."""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run `fn` unless a call with the same key is already in flight, in
+        which case wait for that call instead.
+
+        Args:
+            key (str): Coalescing key
+            fn (Callable): Computation to run (its exceptions propagate to
+                every caller sharing it)
+
+        Returns:
+            Tuple[Any, bool]: (result, shared) - shared is True when another
+                caller's result was reused
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.followers += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            COALESCED_QUERIES.labels("coalesced").inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        COALESCED_QUERIES.labels("computed").inc()
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Coalescing counters.
+
+        Returns:
+            Dict: computed (leader) calls, coalesced (follower) calls, ratio
+                of coalesced to all calls and keys in flight
+        """
+        with self._lock:
+            total = self.leaders + self.followers
+            return {
+                "computed": self.leaders,
+                "coalesced": self.followers,
+                "coalesced_ratio": (self.followers / total) if total else 0.0,
+                "in_flight": len(self._calls)
+            }
+
+
+class AsyncSingleFlight:
+    """asyncio variant of SingleFlight for coroutines on one event loop."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await `fn()` unless a call with the same key is in flight.
+
+        The computation runs as its own task, so a caller that is cancelled
+        (e.g. the client disconnected) does not cancel it for the others.
+
+        Returns:
+            Tuple[Any, bool]: (result, shared)
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.followers += 1
+            COALESCED_QUERIES.labels("coalesced").inc()
+        else:
+            self.leaders += 1
+            COALESCED_QUERIES.labels("computed").inc()
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+
+            def forget(done: asyncio.Task):
+                if self._calls.get(key) is done:
+                    del self._calls[key]
+            task.add_done_callback(forget)
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing counters (same fields as SingleFlight.stats)."""
+        total = self.leaders + self.followers
+        return {
+            "computed": self.leaders,
+            "coalesced": self.followers,
+            "coalesced_ratio": (self.followers / total) if total else 0.0,
+            "in_flight": len(self._calls)
+        }
@@ -0,0 +1,164 @@
+"""
+Multi-pattern text matching module.
+Finds every keyword and regex hit in a text in one linear pass, using an
+Aho-Corasick automaton for literal keywords and a single alternation regex
+(one named group per pattern) for regular expressions. The cost per text
+depends on its length, not on how many keywords are configured.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+import re
+
+
+# Global inline flags such as "(?i)" at the start of a pattern; they are only
+# allowed at the start of the whole expression, so they are scoped per group
+_GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton over a fixed set of literal keywords."""
+
+    def __init__(self, words: Iterable[str]):
+        """
+        Build the automaton.
+
+        Args:
+            words (Iterable[str]): Keywords to search for (matched as given;
+                lower-case both keywords and text for case-insensitive search)
+        """
+        self.words: List[str] = list(dict.fromkeys(w for w in words if w))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Keyword indices ending at each node, including those reached via fail links
+        self._out: List[Tuple[int, ...]] = [()]
+
+        for index, word in enumerate(self.words):
+            node = 0
+            for char in word:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = nxt
+            self._out[node] = self._out[node] + (index,)
+
+        # Breadth-first construction of failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """
+        Yield every keyword occurrence, including overlapping ones.
+
+        Args:
+            text (str): Text to scan
+
+        Yields:
+            Tuple[int, str]: (start offset, keyword)
+        """
+        goto, fail, out, words = self._goto, self._fail, self._out, self.words
+        node = 0
+        for pos, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in out[node]:
+                word = words[index]
+                yield pos - len(word) + 1, word
+
+
+def _scope_flags(pattern: str) -> str:
+    """Rewrite a leading "(?i)" style flag group as a scoped "(?i:...)" group."""
+    match = _GLOBAL_FLAGS.match(pattern)
+    if not match:
+        return f"(?:{pattern})"
+    return f"(?{match.group(1)}:{pattern[match.end():]})"
+
+
+class KeywordPatternMatcher:
+    """Matches categorised keywords and regex patterns in a single pass each."""
+
+    def __init__(
+        self,
+        keywords: Dict[str, Iterable[str]],
+        patterns: Dict[str, Iterable[str]] | None = None
+    ):
+        """
+        Compile keyword and pattern lists.
+
+        Args:
+            keywords (Dict[str, Iterable[str]]): Category -> literal keywords,
+                matched case-insensitively as substrings
+            patterns (Dict[str, Iterable[str]]): Category -> regular expressions,
+                matched against the original text
+        """
+        self._keyword_categories: Dict[str, Set[str]] = {}
+        for category, words in keywords.items():
+            for word in words:
+                if word:
+                    self._keyword_categories.setdefault(word.lower(), set()).add(category)
+        self._automaton = AhoCorasick(self._keyword_categories)
+
+        self._pattern_groups: Dict[str, Tuple[str, str]] = {}
+        alternatives = []
+        for category, sources in (patterns or {}).items():
+            for source in sources:
+                group = f"p{len(self._pattern_groups)}"
+                self._pattern_groups[group] = (category, source)
+                alternatives.append(f"(?P<{group}>{_scope_flags(source)})")
+        self._regex = re.compile("|".join(alternatives)) if alternatives else None
+
+    @property
+    def keyword_count(self) -> int:
+        return len(self._automaton)
+
+    @property
+    def pattern_count(self) -> int:
+        return len(self._pattern_groups)
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        """
+        Find every category that has a hit in `text`.
+
+        Every keyword occurrence is reported. For patterns, the regex engine
+        reports the first alternative matching at each position, which is
+        enough to flag every category that occurs.
+
+        Args:
+            text (str): Text to scan
+
+        Returns:
+            Dict[str, List[str]]: Category -> matched keywords / pattern
+                sources, in order of appearance (categories without hits are
+                omitted)
+        """
+        hits: Dict[str, List[str]] = {}
+        for _, word in self._automaton.iter_matches(text.lower()):
+            for category in self._keyword_categories[word]:
+                found = hits.setdefault(category, [])
+                if word not in found:
+                    found.append(word)
+
+        if self._regex is not None:
+            for match in self._regex.finditer(text):
+                category, source = self._pattern_groups[match.lastgroup]
+                found = hits.setdefault(category, [])
+                if source not in found:
+                    found.append(source)
+        return hits
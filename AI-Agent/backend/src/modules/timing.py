@@ -0,0 +1,91 @@
+"""
+Per-request stage timing module.
+Records how long each pipeline stage (security validation, embedding, vector
+search, ...) takes within the current request. Timings live in a context
+variable, so concurrent requests on other threads never mix. Every stage is
+also observed in the chatbot_stage_duration_seconds histogram, whether or
+not a request is collecting timings.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, Optional, Tuple
+import time
+
+from .metrics import STAGE_SECONDS
+
+
+# Stage name -> accumulated milliseconds for the request being handled
+_TIMINGS: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+def begin() -> Tuple[Dict[str, float], Token]:
+    """
+    Start collecting stage timings in the current context.
+
+    Returns:
+        Tuple[Dict, Token]: (timings filled in by stage(), token for end())
+    """
+    timings: Dict[str, float] = {}
+    return timings, _TIMINGS.set(timings)
+
+
+def end(token: Token):
+    """Stop collecting timings started by begin()."""
+    _TIMINGS.reset(token)
+
+
+@contextmanager
+def collect() -> Iterator[Dict[str, float]]:
+    """Collect stage timings for the duration of a with-block."""
+    timings, token = begin()
+    try:
+        yield timings
+    finally:
+        end(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a block (or, used as a decorator, a function) as pipeline stage `name`.
+
+    Repeated stages within one request are summed.
+    """
+    timings = _TIMINGS.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed * 1000
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """
+    Format timings as a Server-Timing header value.
+
+    Args:
+        timings (Dict[str, float]): Stage name -> milliseconds
+
+    Returns:
+        str: e.g. "security;dur=0.12, embed;dur=104.50"
+    """
+    return ", ".join(f"{name};dur={ms:.2f}" for name, ms in timings.items())
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """Parse a Server-Timing header value back into stage -> milliseconds."""
+    timings: Dict[str, float] = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
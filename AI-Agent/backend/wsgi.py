@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production serving.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Re-exports the app built when app.py is imported, so importing this module
+does not build a second one. Each worker process initializes backend
+components lazily on its first request.
+"""
+
+from app import app  # noqa: F401
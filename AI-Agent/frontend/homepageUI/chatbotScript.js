@@ -67,13 +67,24 @@ function closeForm() {
 
 //let isBotResponding = false; // global flag to track bot response state
 
+// Keep one conversation per browser tab
+function getSessionId() {
+  let sessionId = sessionStorage.getItem('chatSessionId');
+  if (!sessionId) {
+    sessionId = crypto.randomUUID().replace(/-/g, '');
+    sessionStorage.setItem('chatSessionId', sessionId);
+  }
+  return sessionId;
+}
+
 async function getMessage(message) {
   //await initializeAI();
   try {
     const response = await fetch('http://127.0.0.1:5002/api/query', {
       method: 'POST',
       headers: {
-        'Content-Type': "application/json"
+        'Content-Type': "application/json",
+        'X-Session-ID': getSessionId()
       },
       body: JSON.stringify({
         query: message